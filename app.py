@@ -1,42 +1,68 @@
+import time
+_import_started = time.perf_counter()
+
+import hashlib
+import io
+import itertools
+import json
 import os
 import random
 import secrets
-import struct
 import uuid
 import threading
-import time
 import logging
 import re
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
 from functools import wraps
 
 from dotenv import load_dotenv
 load_dotenv()
 
 from flask import Flask, request, jsonify, render_template, send_file, session, redirect, url_for, g
+from werkzeug.exceptions import NotFound, RequestedRangeNotSatisfiable
 from werkzeug.middleware.proxy_fix import ProxyFix
 from werkzeug.security import check_password_hash, generate_password_hash
 from bson import ObjectId
 
 from config import Config
-from models import init_db, get_db, utcnow
+from models import init_db, get_db, utcnow, ensure_indexes, explain_query_shapes
 import click
 import requests as http_requests
 
 from datetime import datetime
+from urllib.parse import quote as url_quote
 from voice_registry import (
     VOICES, VOICE_CATEGORIES, DEFAULT_VOICE, VALID_TIERS, VALID_MOOD_IDS,
-    get_voices_for_tier, get_allowed_voice_names_for_tier,
+    get_allowed_voice_names_for_tier,
     get_tier_config, calculate_char_cost, map_patreon_amount_to_tier,
-    get_chunk_delay, get_voice_engine,
-    get_moods_for_tier, validate_mood_for_tier, get_mood_by_id,
+    get_chunk_delay, get_voice_engine, get_voice_category,
+    validate_mood_for_tier, get_mood_by_id,
+    get_tier_catalog, CATEGORY_RATE_LIMITS,
 )
 from services.markdown_processor import MarkdownProcessor
-from services.text_chunker import TextChunker
+from services.text_chunker import TextChunker, chunk_hash
 from services.ssml_builder import SSMLBuilder
-from services.tts_client import TTSClient
+from services.tts_client import TTSClient, is_size_or_timeout_error
 from services.gemini_tts_client import GeminiTTSClient, prepare_text_for_gemini
-from services.wav_concatenator import WavConcatenator
+from services.wav_concatenator import read_wav_header, wav_header
+from services.chapter_index import build_chapter_index, wav_segment_samples
+from services.audio_formats import AUDIO_FORMATS, get_concatenator, mimetype_for_filename
+from services.audio_encoder import AudioEncoder
+from services.audio_urls import AudioUrlSigner
+from services.audio_storage import LocalAudioStorage, StorageError, get_audio_storage, storage_key
+from services.zip_stream import stream_zip
+from services.waveform_peaks import (
+    PEAKS_EXTENSION, peaks_from_file, peaks_from_segments, peaks_path_for, read_peaks,
+)
+from services.response_compressor import ResponseCompressor
+from services.static_assets import AssetManifest
+from services.job_store import MemoryJobStore, SqliteJobQueue
+from services.job_executor import BoundedJobExecutor, ExecutorSaturated
+from services.chunk_scheduler import ChunkScheduler
+from services.concurrency_controller import AimdController
+from services.credential_pool import CredentialPool
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -47,13 +73,21 @@ app.config.from_object(Config)
 # Trust one level of proxy headers (Render, nginx, etc.)
 app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_proto=1, x_host=1)
 
-# Regex for validating UUID-based WAV filenames (path traversal prevention)
-UUID_WAV_RE = re.compile(
-    r'^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\.wav$'
+# Regex for validating UUID-based audio filenames (path traversal prevention)
+UUID_AUDIO_RE = re.compile(
+    r'^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\.(wav|mp3|ogg|flac)$'
 )
 
-# Initialize MongoDB
-mongo_db = init_db(app.config['MONGO_URI'], app.config['MONGO_DB_NAME'])
+OBJECT_ID_RE = re.compile(r'^[0-9a-f]{24}$')
+
+# Audio files: local AUDIO_DIR or an S3-compatible bucket
+audio_storage = get_audio_storage(app.config)
+
+# Signed, expiring URLs let <audio> Range requests skip login and Mongo
+audio_url_signer = AudioUrlSigner(app.config['SECRET_KEY'], ttl=app.config['AUDIO_URL_TTL_SECONDS'])
+
+# Configure MongoDB (connects lazily on first query, after any fork)
+init_db(app.config['MONGO_URI'], app.config['MONGO_DB_NAME'])
 
 # Email validation regex
 EMAIL_RE = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
@@ -65,10 +99,6 @@ DEFAULT_DISPLAY_NAMES = [
     'Saga Spinner', 'Page Turner', 'Quill Master', 'Tome Walker',
 ]
 
-# Ensure data directories exist
-os.makedirs(app.config['DATA_DIR'], exist_ok=True)
-os.makedirs(app.config['AUDIO_DIR'], exist_ok=True)
-
 
 # ── Security Headers ────────────────────────────────────────────
 
@@ -90,6 +120,70 @@ def set_security_headers(response):
     return response
 
 
+# ── Response Compression ────────────────────────────────────────
+
+compressor = ResponseCompressor(
+    min_size=app.config['COMPRESS_MIN_SIZE'],
+    level=app.config['COMPRESS_LEVEL'],
+)
+
+
+@app.after_request
+def compress_response(response):
+    return compressor.compress(
+        response,
+        request.accept_encodings,
+        cache_key=g.get('compress_cache_key'),
+    )
+
+
+# ── Static Assets ───────────────────────────────────────────────
+#
+# CSS/JS are content-hashed at startup.  url_for('static', ...) emits the
+# fingerprinted name, which is served from memory (precompressed) with an
+# immutable Cache-Control, so browsers and any CDN never revalidate.
+
+STATIC_IMMUTABLE_MAX_AGE = 31536000  # one year
+SAMPLE_MAX_AGE = 86400  # voice previews change only when regenerated
+
+assets = AssetManifest(app.static_folder)
+
+
+@app.url_defaults
+def fingerprint_static_urls(endpoint, values):
+    if endpoint == 'static' and 'filename' in values:
+        values['filename'] = assets.fingerprint(values['filename'])
+
+
+def serve_static(filename):
+    asset = assets.resolve(filename)
+    if asset is None:
+        # Unfingerprinted request (samples, direct links): default handling
+        response = app.send_static_file(filename)
+        if filename.startswith('samples/'):
+            response.cache_control.no_cache = None
+            response.cache_control.public = True
+            response.cache_control.max_age = SAMPLE_MAX_AGE
+        return response
+
+    if request.if_none_match.contains_weak(asset.etag):
+        response = app.response_class(status=304)
+    else:
+        encoding, body = assets.choose_variant(asset, request.accept_encodings)
+        response = app.response_class(body, mimetype=asset.mimetype)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.set_etag(asset.etag)
+    response.headers['Cache-Control'] = (
+        f'public, max-age={STATIC_IMMUTABLE_MAX_AGE}, immutable'
+    )
+    return response
+
+
+app.view_functions['static'] = serve_static
+
+
 # ── Authentication ──────────────────────────────────────────────
 
 def login_required(f):
@@ -101,7 +195,7 @@ def login_required(f):
                 return jsonify({'error': 'Authentication required'}), 401
             return redirect(url_for('login'))
         try:
-            user = mongo_db.users.find_one({'_id': ObjectId(user_id)})
+            user = get_db().users.find_one({'_id': ObjectId(user_id)})
         except Exception:
             user = None
         if not user:
@@ -118,6 +212,47 @@ def get_user_tier(user):
     return user.get('tier', 'free')
 
 
+# ── Conditional GET ─────────────────────────────────────────────
+#
+# Each user document carries a `collection_versions` counter per list
+# endpoint ('texts', 'presets', 'library').  Every write bumps the counter,
+# so the ETag can be derived from the user doc that login_required already
+# loaded — a 304 costs no extra database round-trip.
+
+def bump_collection_version(user_id, name):
+    """Invalidate cached list responses for one of the user's collections."""
+    get_db().users.update_one(
+        {'_id': ObjectId(user_id)},
+        {'$inc': {f'collection_versions.{name}': 1}},
+    )
+
+
+def collection_etag(name):
+    """Return the current ETag for the logged-in user's collection."""
+    version = g.current_user.get('collection_versions', {}).get(name, 0)
+    return f'{name}-{g.current_user_id}-{version}'
+
+
+def etag_response(etag, build_payload):
+    """Answer with 304 if the client already holds `etag`, else build the JSON.
+
+    `build_payload` is only called on a cache miss, so the full result set
+    is never queried or serialized for a matching If-None-Match.  It may
+    return a dict or already-serialized JSON bytes.
+    """
+    if request.if_none_match.contains_weak(etag):
+        response = app.response_class(status=304)
+    else:
+        payload = build_payload()
+        if isinstance(payload, bytes):
+            response = app.response_class(payload, mimetype='application/json')
+        else:
+            response = jsonify(payload)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
 @app.route('/login', methods=['GET', 'POST'])
 def login():
     if session.get('user_id'):
@@ -128,7 +263,7 @@ def login():
         email = request.form.get('email', '').strip().lower()
         password = request.form.get('password', '')
 
-        user = mongo_db.users.find_one({'email': email})
+        user = get_db().users.find_one({'email': email})
         if user:
             valid = check_password_hash(user['password_hash'], password)
         else:
@@ -166,7 +301,7 @@ def register():
             error = 'Please enter a valid email address'
         elif len(email) > 254:
             error = 'Email address is too long'
-        elif mongo_db.users.find_one({'email': email}):
+        elif get_db().users.find_one({'email': email}):
             error = 'Email already registered'
         elif len(password) < 8:
             error = 'Password must be at least 8 characters'
@@ -178,7 +313,7 @@ def register():
                 error = 'Too many attempts. Please wait and try again.'
             else:
                 display_name = random.choice(DEFAULT_DISPLAY_NAMES)
-                result = mongo_db.users.insert_one({
+                result = get_db().users.insert_one({
                     'email': email,
                     'display_name': display_name,
                     'password_hash': generate_password_hash(password),
@@ -201,12 +336,21 @@ def logout():
 
 # ── CLI Commands ────────────────────────────────────────────────
 
+@app.cli.command('init-db')
+def init_db_cmd():
+    """Create indexes and data directories. Run once per deployment."""
+    started = time.perf_counter()
+    ensure_indexes()
+    os.makedirs(app.config['AUDIO_DIR'], exist_ok=True)
+    print(f"Indexes ensured in {(time.perf_counter() - started) * 1000:.0f} ms.")
+
+
 @app.cli.command('set-tier')
 @click.argument('email')
 @click.argument('tier', type=click.Choice(sorted(VALID_TIERS)))
 def set_tier_cmd(email, tier):
     """Set a user's subscription tier. Usage: flask set-tier <email> <tier>"""
-    result = mongo_db.users.update_one(
+    result = get_db().users.update_one(
         {'email': email}, {'$set': {'tier': tier}}
     )
     if result.matched_count:
@@ -224,13 +368,165 @@ def purge_users_cmd(confirm):
         print("   Run with --confirm to proceed.")
         return
 
-    u = mongo_db.users.delete_many({}).deleted_count
-    a = mongo_db.audio_files.delete_many({}).deleted_count
-    s = mongo_db.source_texts.delete_many({}).deleted_count
-    p = mongo_db.voice_presets.delete_many({}).deleted_count
+    u = get_db().users.delete_many({}).deleted_count
+    a = get_db().audio_files.delete_many({}).deleted_count
+    s = get_db().source_texts.delete_many({}).deleted_count
+    p = get_db().voice_presets.delete_many({}).deleted_count
     print(f"Purged: {u} users, {a} audio files, {s} source texts, {p} presets.")
 
 
+@app.cli.command('db-explain')
+def db_explain_cmd():
+    """Explain every registered query shape; fail if any uses a COLLSCAN."""
+    failures = []
+    for name, stages in explain_query_shapes():
+        plan = ' <- '.join(stages) or '(empty)'
+        if 'COLLSCAN' in stages:
+            failures.append(name)
+            print(f"  FAIL  {name}: {plan}")
+        else:
+            print(f"  OK    {name}: {plan}")
+
+    if failures:
+        raise click.ClickException(
+            f"{len(failures)} query shape(s) fall back to COLLSCAN: {', '.join(failures)}"
+        )
+    print("All query shapes are index-backed.")
+
+
+@app.cli.command('disk-usage')
+def disk_usage_cmd():
+    """Report library storage by audio format, and the audio directory's size."""
+    rows = get_db().audio_files.aggregate([
+        {'$group': {
+            '_id': {'$ifNull': ['$audio_format', 'wav']},
+            'files': {'$sum': 1},
+            'bytes': {'$sum': '$file_size_bytes'},
+            'seconds': {'$sum': '$duration_seconds'},
+        }},
+        {'$sort': {'bytes': -1}},
+    ])
+    for row in rows:
+        hours = row['seconds'] / 3600
+        per_hour = row['bytes'] / hours / 1e6 if hours else 0
+        print(f"  {row['_id']:<6} {row['files']:>7} files  {row['bytes'] / 1e9:8.2f} GB  "
+              f"{hours:8.1f} h  ({per_hour:.0f} MB/h)")
+
+    if isinstance(audio_storage, LocalAudioStorage):
+        on_disk = 0
+        for root, _dirs, files in os.walk(app.config['AUDIO_DIR']):
+            on_disk += sum(os.path.getsize(os.path.join(root, f)) for f in files)
+        print(f"{app.config['AUDIO_DIR']}: {on_disk / 1e9:.2f} GB on disk")
+
+
+@app.cli.command('backfill-peaks')
+def backfill_peaks_cmd():
+    """Compute waveform peaks for stored WAV files that have none yet."""
+    if not isinstance(audio_storage, LocalAudioStorage):
+        raise click.ClickException("backfill-peaks memory-maps files and needs AUDIO_STORAGE=local")
+    built = skipped = failed = 0
+    cursor = get_db().audio_files.find(
+        {'audio_format': {'$in': ['wav', None]}},
+        {'user_id': 1, 'filename': 1},
+    )
+    for doc in cursor:
+        if not UUID_AUDIO_RE.match(doc.get('filename', '')):
+            continue
+        key = storage_key(doc['user_id'], doc['filename'])
+        path = audio_storage.local_path(key)
+        if audio_storage.exists(peaks_path_for(key)) or not os.path.exists(path):
+            skipped += 1
+            continue
+        try:
+            builder = peaks_from_file(path)
+            with audio_storage.writer(peaks_path_for(key)) as f:
+                builder.write(f)
+            built += 1
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not build peaks for {path}: {e}")
+            failed += 1
+    print(f"Peaks built: {built}, skipped: {skipped}, failed: {failed}.")
+
+
+@app.cli.command('run-worker')
+@click.option('--processes', type=int, default=None,
+              help='Jobs to run in parallel (default: JOB_WORKER_PROCESSES).')
+@click.option('--poll-interval', type=float, default=1.0,
+              help='Seconds between queue polls when idle.')
+def run_worker_cmd(processes, poll_interval):
+    """Execute queued TTS jobs in a process pool (JOB_BACKEND=queue)."""
+    if not isinstance(job_store, SqliteJobQueue):
+        raise click.ClickException("run-worker requires JOB_BACKEND=queue")
+
+    processes = processes or app.config['JOB_WORKER_PROCESSES']
+    requeued = job_store.requeue_abandoned()
+    if requeued:
+        logger.info(f"Re-queued {requeued} job(s) abandoned by a previous worker")
+    logger.info(f"Worker {os.getpid()} running {processes} process(es) on {job_store.path}")
+
+    running = {}
+    isolated = None   # a job that was in a broken pool runs alone next time
+    last_purge = time.time()
+    pool = ProcessPoolExecutor(max_workers=processes)
+    try:
+        while True:
+            broken = False
+            while len(running) < processes and isolated is None:
+                job_id = job_store.claim(os.getpid(), include_crashed=not running)
+                if job_id is None:
+                    break
+                if job_store.get(job_id).get('crashed'):
+                    isolated = job_id
+                try:
+                    running[pool.submit(run_queued_job, job_id)] = job_id
+                except BrokenProcessPool:
+                    job_store.requeue(job_id)
+                    broken = True
+                    break
+
+            if running:
+                done, _ = wait(running, timeout=poll_interval, return_when=FIRST_COMPLETED)
+            else:
+                done = set()
+                time.sleep(poll_interval)
+
+            if any(isinstance(f.exception(), BrokenProcessPool) for f in done):
+                # A job process died (e.g. OOM) and took the pool down with
+                # it; every job still running in it fails at the same time.
+                broken = True
+                wait(running)
+                done = set(running)
+            for future in done:
+                job_id = running.pop(future)
+                error = future.exception()
+                if isinstance(error, BrokenProcessPool):
+                    handle_crashed_job(job_id, ran_alone=job_id == isolated)
+                elif error is not None:
+                    logger.error(f"Job {job_id} crashed: {error}")
+                    job_store.update(
+                        job_id, status='error',
+                        error='Audio generation failed. Please try again.',
+                    )
+                if job_id == isolated:
+                    isolated = None
+
+            if broken:
+                pool.shutdown(wait=False)
+                pool = ProcessPoolExecutor(max_workers=processes)
+                logger.warning("Worker process pool broke; started a new one")
+
+            if time.time() - last_purge > 600:
+                job_store.purge(JOB_RETENTION_SECONDS)
+                last_purge = time.time()
+    except KeyboardInterrupt:
+        logger.info(
+            f"Worker stopping; waiting for {len(running)} in-flight job(s) to finish "
+            "(interrupt again to leave them for the next worker to re-queue)"
+        )
+    finally:
+        pool.shutdown(wait=True)
+
+
 # ── Patreon OAuth ──────────────────────────────────────────────
 
 @app.route('/api/patreon/link')
@@ -348,7 +644,7 @@ def patreon_callback():
             break
 
     if is_owner:
-        mongo_db.users.update_one(
+        get_db().users.update_one(
             {'_id': g.current_user_id},
             {'$set': {'tier': 'owner', 'patreon_id': patreon_user_id}},
         )
@@ -356,14 +652,14 @@ def patreon_callback():
         session['flash_message'] = 'Welcome back, my liege. All voices are at your command.'
     elif patron_tier != 'free':
         tier_cfg = get_tier_config(patron_tier)
-        mongo_db.users.update_one(
+        get_db().users.update_one(
             {'_id': g.current_user_id},
             {'$set': {'tier': patron_tier, 'patreon_id': patreon_user_id}},
         )
         logger.info(f"User {g.current_user['email']} set to tier '{patron_tier}' (Patreon ID: {patreon_user_id})")
         session['flash_message'] = f"Patreon linked! You are now {tier_cfg['label']}."
     else:
-        mongo_db.users.update_one(
+        get_db().users.update_one(
             {'_id': g.current_user_id},
             {'$set': {'patreon_id': patreon_user_id}},
         )
@@ -373,9 +669,55 @@ def patreon_callback():
     return redirect(url_for('profile_page'))
 
 
-# ── In-memory job tracking ──────────────────────────────────────
+# ── Job tracking ────────────────────────────────────────────────
+#
+# JOB_BACKEND='thread' runs each job on a thread inside the web worker and
+# keeps its state in memory.  JOB_BACKEND='queue' only enqueues jobs in a
+# durable local SQLite queue; `flask run-worker` executes them in a process
+# pool, so web and synthesis capacity scale independently.
+
+if app.config['JOB_BACKEND'] == 'queue':
+    job_store = SqliteJobQueue(app.config['JOB_QUEUE_PATH'])
+else:
+    job_store = MemoryJobStore()
+
+# Thread backend: a fixed pool with a FIFO queue, admitting jobs against a
+# memory budget instead of starting one thread per request.
+job_executor = BoundedJobExecutor(
+    max_workers=app.config['JOB_WORKER_THREADS'],
+    memory_budget=app.config['JOB_MEMORY_BUDGET_MB'] * 1024 * 1024,
+    max_queued=app.config['JOB_MAX_QUEUED'],
+)
 
-jobs = {}
+# Chunk requests from every job in this process share one scheduler, which
+# paces each voice category and interleaves jobs fairly by tier.
+chunk_scheduler = ChunkScheduler(
+    max_workers=app.config['CHUNK_SCHEDULER_THREADS'],
+    hedge_ratio=app.config['CHUNK_HEDGE_PERCENT'] / 100,
+    controller=(
+        AimdController(max_limit=app.config['CHUNK_CONCURRENCY_MAX'])
+        if app.config['ADAPTIVE_CONCURRENCY'] else None
+    ),
+)
+# Static pacing leaves 20% of quota spare; the adaptive controller backs
+# off on its own, so it may pace at the full nominal quota.
+CHUNK_QUOTA_FRACTION = 1.0 if chunk_scheduler.controller else 0.8
+
+# API keys per engine; each key is a separate project quota
+credential_pools = {
+    'cloud_tts': CredentialPool.from_env('GOOGLE_API_KEY', CATEGORY_RATE_LIMITS),
+    'gemini': CredentialPool.from_env('GEMINI_API_KEY', CATEGORY_RATE_LIMITS),
+}
+
+JOB_RETENTION_SECONDS = 3600
+QUEUE_RETRY_AFTER = 30  # seconds, when the durable queue is full
+
+# Memory estimate inputs: narration averages ~15 characters per second at
+# rate 1.0, and 16-bit mono PCM costs 2 bytes per sample.  Segments and the
+# concatenated output are both held in memory, hence the factor of 2.
+NARRATION_CHARS_PER_SECOND = 15
+PCM_BYTES_PER_SECOND = Config.TTS_SAMPLE_RATE_HERTZ * 2
+JOB_MEMORY_OVERHEAD_FACTOR = 2
 
 MAX_TEXT_LENGTH = 500_000
 MAX_CHUNKS_PER_JOB = 200
@@ -385,7 +727,6 @@ RATE_LIMIT_MAX_REQUESTS = 5
 
 rate_limit_lock = threading.Lock()
 ip_request_log = defaultdict(list)
-ip_active_jobs = defaultdict(int)
 
 
 def get_client_ip():
@@ -408,18 +749,7 @@ def check_rate_limit(ip):
 
 
 def check_concurrent_limit(ip):
-    with rate_limit_lock:
-        return ip_active_jobs[ip] < MAX_CONCURRENT_JOBS_PER_IP
-
-
-def increment_active_jobs(ip):
-    with rate_limit_lock:
-        ip_active_jobs[ip] += 1
-
-
-def decrement_active_jobs(ip):
-    with rate_limit_lock:
-        ip_active_jobs[ip] = max(0, ip_active_jobs[ip] - 1)
+    return job_store.count_active(ip) < MAX_CONCURRENT_JOBS_PER_IP
 
 
 ALLOWED_EXTENSIONS = {'.md', '.txt', '.markdown'}
@@ -446,77 +776,173 @@ def validate_upload(file):
     return text, ext
 
 
-def wav_duration_seconds(wav_bytes):
-    """Extract duration in seconds from WAV file bytes."""
-    try:
-        if len(wav_bytes) < 44:
-            return 0.0
-        byte_rate = struct.unpack_from('<I', wav_bytes, 28)[0]
-        if byte_rate == 0:
-            return 0.0
-        pos = 12
-        while pos < len(wav_bytes) - 8:
-            chunk_id = wav_bytes[pos:pos + 4]
-            chunk_size = struct.unpack_from('<I', wav_bytes, pos + 4)[0]
-            if chunk_id == b'data':
-                return chunk_size / byte_rate
-            pos += 8 + chunk_size
-        return 0.0
-    except Exception:
-        return 0.0
+def segment_sample_counts(segments, format_name):
+    """Return (sample count per segment, sample rate) for a job's audio.
+
+    Counts are each segment's span in the joined file, so chapter marks
+    stay aligned with playback however many segments came before.
+    """
+    if format_name == 'wav':
+        counts = [wav_segment_samples(seg) for seg in segments]
+        return [samples for samples, _rate in counts], counts[0][1]
+    rate = Config.TTS_SAMPLE_RATE_HERTZ
+    concatenator = get_concatenator(format_name)
+    return [round(seconds * rate) for seconds in concatenator.joined_durations(segments)], rate
 
 
 # ── TTS Background Job ─────────────────────────────────────────
 
-def process_tts_job(job_id, prepared_chunks, voice_params):
-    """Background worker that runs TTS synthesis and concatenation."""
-    client_ip = jobs[job_id].get('client_ip', '')
-    user_id = jobs[job_id].get('user_id')
-    audio_title = jobs[job_id].get('audio_title', 'Untitled')
-    source_text_id = jobs[job_id].get('source_text_id')
+# Transcodes finished WAVs for formats Cloud TTS cannot return directly
+audio_encoder = AudioEncoder()
+
+# How many times one failing chunk may be halved before the job gives up
+MAX_RESPLIT_DEPTH = 3
+
+
+def resplit_failed_chunk(chunker, text, error, depth):
+    """Pieces to retry a chunk as after a size rejection or timeout, or None.
+
+    Pieces are cut at sentence (or finer) boundaries; the scheduler sends
+    them as separate requests and joins their audio into the chunk's.
+    """
+    if depth >= MAX_RESPLIT_DEPTH or not is_size_or_timeout_error(error):
+        return None
+    return chunker.resplit(text) or None
+
+
+def process_tts_job(job_id, text_chunks, voice_params, prepared=False):
+    """Background worker that runs TTS synthesis and concatenation.
+
+    `prepared` chunks are already SSML or Gemini text and are sent as they
+    are, without re-splitting.
+    """
+    job = job_store.get(job_id)
+    user_id = job.get('user_id')
+    audio_title = job.get('audio_title', 'Untitled')
+    source_text_id = job.get('source_text_id')
+    tier_cfg = get_tier_config(job.get('tier', 'free'))
+    job_store.update(job_id, status='processing')
 
     try:
         engine = get_voice_engine(voice_params['voice_name'])
-        chunk_delay = get_chunk_delay(voice_params['voice_name'])
+        category = get_voice_category(voice_params['voice_name'])
+        credentials = credential_pools[engine]
+        requested_format = AUDIO_FORMATS[voice_params.get('audio_format', 'wav')]
+        audio_format = synthesis_format(engine, requested_format)
+        # Every usable key adds a project's worth of quota for this category
+        chunk_delay = (
+            get_chunk_delay(voice_params['voice_name'], CHUNK_QUOTA_FRACTION)
+            / max(1, credentials.available(category))
+        )
 
         if engine == 'gemini':
             tts = GeminiTTSClient(
                 voice_name=voice_params['voice_name'],
                 chunk_delay=chunk_delay,
                 system_instruction=voice_params.get('system_instruction'),
+                credentials=credentials,
+                category=category,
             )
+            prepare = prepare_text_for_gemini
         else:
             tts = TTSClient(
                 voice_name=voice_params['voice_name'],
                 speaking_rate=voice_params['speaking_rate'],
                 pitch=voice_params['pitch'],
                 chunk_delay=chunk_delay,
+                credentials=credentials,
+                category=category,
+                audio_encoding=audio_format.cloud_encoding,
             )
+            prepare = SSMLBuilder().build
 
-        concatenator = WavConcatenator()
+        chunker = TextChunker(max_bytes=Config.TTS_MAX_BYTES_PER_REQUEST)
+        concatenator = get_concatenator(audio_format.name)
+        split = lambda text, error, depth: resplit_failed_chunk(chunker, text, error, depth)
+        if prepared:
+            prepare, split = (lambda text: text), None
+
+        # Chunks the request was not charged for are spliced from the
+        # previous render; any that cannot be read any more are charged now
+        reuse = voice_params.get('reuse_chunks') or []
+        wav_segments = {}
+        if reuse:
+            wav_segments = load_reusable_segments(
+                job_id, user_id, voice_params.get('previous_audio_id'), text_chunks, reuse,
+            )
+            lost = [text_chunks[i] for i in reuse if i not in wav_segments]
+            if lost and not charge_job_usage(job, voice_params['voice_name'], sum(len(c) for c in lost)):
+                job_store.update(
+                    job_id, status='error',
+                    error='The audio this render was reusing is no longer available, and '
+                          'rendering those parts again would exceed your monthly character limit.',
+                )
+                return
+        pending = [i for i in range(len(text_chunks)) if i not in wav_segments]
 
         def update_progress(completed, total):
-            jobs[job_id]['completed_chunks'] = completed
-
-        wav_segments = tts.synthesize_all(prepared_chunks, update_progress)
-        output_wav = concatenator.concatenate(wav_segments)
-
-        # Write to persistent storage
-        user_dir = os.path.join(app.config['AUDIO_DIR'], str(user_id))
-        os.makedirs(user_dir, exist_ok=True)
-        output_path = os.path.join(user_dir, f'{job_id}.wav')
-        with open(output_path, 'wb') as f:
-            f.write(output_wav)
-
-        # Compute metadata
-        duration = wav_duration_seconds(output_wav)
-        file_size = len(output_wav)
+            job_store.update(job_id, completed_chunks=len(wav_segments) + completed)
+
+        rendered = chunk_scheduler.run(
+            job_id,
+            category=category,
+            min_interval=chunk_delay,
+            weight=tier_cfg['schedule_weight'],
+            fn=lambda text: tts.synthesize_chunk(prepare(text)),
+            chunks=[text_chunks[i] for i in pending],
+            progress_callback=update_progress,
+            split=split,
+            join=concatenator.concatenate,
+        )
+        wav_segments.update(zip(pending, rendered))
+        wav_segments = [wav_segments[i] for i in range(len(text_chunks))]
+        try:
+            segment_samples, sample_rate = segment_sample_counts(wav_segments, audio_format.name)
+            chunk_index, chapters = build_chapter_index(text_chunks, segment_samples)
+            for entry, text in zip(chunk_index, text_chunks):
+                entry.append(chunk_hash(text))  # lets a later re-render reuse it
+        except Exception as e:
+            logger.warning(f"Job {job_id}: could not build chapter index: {e}")
+            sample_rate, chunk_index, chapters = None, [], []
+
+        duration = sum(entry[1] for entry in chunk_index) / sample_rate if sample_rate else 0.0
+        if audio_format.name == 'wav':
+            try:
+                peaks = peaks_from_segments(wav_segments)
+                with audio_storage.writer(storage_key(user_id, f'{job_id}.{PEAKS_EXTENSION}')) as f:
+                    peaks.write(f)
+            except Exception as e:
+                logger.warning(f"Job {job_id}: could not build waveform peaks: {e}")
+
+        # Write to storage, streaming segments straight into it.  The encoder
+        # works on local files, so encoded jobs go through a work directory.
+        encode = requested_format != audio_format and audio_encoder.can_encode(requested_format.name)
+        if requested_format != audio_format and not encode:
+            logger.warning(f"Job {job_id}: no encoder for {requested_format.name}, keeping WAV")
+        if encode:
+            work_dir = job_work_dir(user_id)
+            source_path = os.path.join(work_dir, f'.{job_id}.source.wav')
+            with open(source_path, 'wb') as f:
+                concatenator.write(wav_segments, f)
+            del wav_segments
+            audio_format = encode_job_audio(source_path, work_dir, job_id, requested_format)
+            filename = f'{job_id}.{audio_format.extension}'
+            output_key = storage_key(user_id, filename)
+            audio_storage.put_file(output_key, os.path.join(work_dir, filename))
+        else:
+            filename = f'{job_id}.{audio_format.extension}'
+            output_key = storage_key(user_id, filename)
+            with audio_storage.writer(output_key) as f:
+                concatenator.write(wav_segments, f)
+            del wav_segments
+        file_size = audio_storage.size(output_key)
 
         # Create database record
         audio_doc = {
             'user_id': ObjectId(user_id),
             'title': audio_title,
-            'filename': f'{job_id}.wav',
+            'filename': filename,
+            'audio_format': audio_format.name,
             'voice_name': voice_params['voice_name'],
             'speaking_rate': voice_params['speaking_rate'],
             'pitch': voice_params['pitch'],
@@ -525,22 +951,265 @@ def process_tts_job(job_id, prepared_chunks, voice_params):
             'custom_mood': voice_params.get('custom_mood'),
             'duration_seconds': duration,
             'file_size_bytes': file_size,
+            'sample_rate': sample_rate,
+            'chunk_index': chunk_index,
+            'chapters': chapters,
+            'render_key': render_key(voice_params),
             'source_text_id': ObjectId(source_text_id) if source_text_id else None,
             'created_at': utcnow(),
         }
-        result = mongo_db.audio_files.insert_one(audio_doc)
-
-        jobs[job_id]['status'] = 'complete'
-        jobs[job_id]['output_path'] = output_path
-        jobs[job_id]['audio_id'] = str(result.inserted_id)
-        logger.info(f"Job {job_id} complete: {len(prepared_chunks)} chunks ({engine})")
+        result = get_db().audio_files.insert_one(audio_doc)
+        bump_collection_version(user_id, 'library')
+
+        job_store.update(
+            job_id,
+            status='complete',
+            output_path=output_key,  # a storage key, not necessarily a local path
+            audio_id=str(result.inserted_id),
+        )
+        logger.info(
+            f"Job {job_id} complete: {len(text_chunks)} chunks, "
+            f"{len(text_chunks) - len(pending)} reused ({engine})"
+        )
 
     except Exception as e:
-        jobs[job_id]['status'] = 'error'
-        jobs[job_id]['error'] = 'Audio generation failed. Please try again.'
+        job_store.update(
+            job_id,
+            status='error',
+            error='Audio generation failed. Please try again.',
+        )
         logger.exception(f"Job {job_id} failed: {e}")
-    finally:
-        decrement_active_jobs(client_ip)
+
+
+def synthesis_format(engine, requested_format):
+    """Return the format chunks are synthesized in for `requested_format`.
+
+    Cloud TTS can return MP3/Ogg Opus itself; everything else is
+    synthesized as WAV and handed to the encoder afterwards.
+    """
+    if engine != 'gemini' and requested_format.cloud_encoding:
+        return requested_format
+    return AUDIO_FORMATS['wav']
+
+
+def render_key(voice_params):
+    """Hash of the settings that shape synthesized speech.
+
+    Two renders with the same key produce the same audio for the same chunk
+    text, so their chunks are interchangeable.
+    """
+    settings = [voice_params.get(k) for k in ('voice_name', 'speaking_rate', 'pitch', 'system_instruction')]
+    return hashlib.sha256(json.dumps(settings).encode()).hexdigest()[:24]
+
+
+def find_previous_render(user_id, source_text_id, voice_params):
+    """Return the latest WAV render of a saved text with the same settings."""
+    return get_db().audio_files.find_one(
+        {
+            'source_text_id': ObjectId(source_text_id),
+            'user_id': ObjectId(user_id),
+            'render_key': render_key(voice_params),
+            'audio_format': 'wav',
+        },
+        {'chunk_index': 1},
+        sort=[('created_at', -1)],
+    )
+
+
+def reusable_chunk_hashes(previous_audio):
+    """Chunk hashes recorded in a previous render's chunk manifest."""
+    return {entry[2] for entry in (previous_audio or {}).get('chunk_index') or [] if len(entry) > 2}
+
+
+def load_reusable_segments(job_id, user_id, previous_audio_id, text_chunks, positions):
+    """Cut the audio of unchanged chunks out of a previous render.
+
+    Returns {chunk position: WAV bytes} for each of `positions` whose
+    chunk hash is in the previous audio's manifest; empty if the previous
+    audio cannot be read, in which case those chunks must be synthesized.
+    """
+    if not previous_audio_id:
+        return {}
+    try:
+        previous = get_db().audio_files.find_one(
+            {'_id': ObjectId(previous_audio_id), 'user_id': ObjectId(user_id)},
+            {'filename': 1, 'chunk_index': 1, 'audio_format': 1},
+        )
+        if not previous or previous.get('audio_format', 'wav') != 'wav':
+            return {}
+        spans = {entry[2]: entry[:2] for entry in previous.get('chunk_index') or [] if len(entry) > 2}
+        key = storage_key(user_id, previous['filename'])
+        info = read_wav_header(io.BytesIO(audio_storage.read_bytes(key, 0, WAV_HEADER_PROBE)))
+        segments = {}
+        for i in positions:
+            span = spans.get(chunk_hash(text_chunks[i]))
+            if span is None:
+                continue
+            start, samples = span
+            pcm = audio_storage.read_bytes(
+                key, info.data_offset + start * info.block_align, samples * info.block_align,
+            )
+            segments[i] = wav_header(len(pcm), info.sample_rate, info.bits_per_sample, info.channels) + pcm
+        return segments
+    except (StorageError, OSError, ValueError) as e:
+        logger.warning(f"Job {job_id}: cannot reuse audio {previous_audio_id}, rendering in full: {e}")
+        return {}
+
+
+def charge_job_usage(job, voice_name, chars):
+    """Add `chars` to the job owner's monthly usage, within their limit.
+
+    Returns False, charging nothing, if the limit would be exceeded.
+    """
+    monthly_limit = get_tier_config(job.get('tier', 'free'))['monthly_chars']
+    if monthly_limit is None:  # unlimited (owner)
+        return True
+    cost = calculate_char_cost(chars, voice_name)
+    if cost > monthly_limit:
+        return False
+    field = f"usage.{datetime.utcnow().strftime('%Y-%m')}.chars_used"
+    result = get_db().users.update_one(
+        {
+            '_id': ObjectId(job['user_id']),
+            '$or': [{field: {'$lte': monthly_limit - cost}}, {field: {'$exists': False}}],
+        },
+        {'$inc': {field: cost}},
+    )
+    return result.matched_count == 1
+
+
+def job_work_dir(user_id):
+    """Directory for a job's intermediate files.
+
+    With local storage this is the user's own directory, so finished files
+    are renamed into place rather than copied.
+    """
+    if isinstance(audio_storage, LocalAudioStorage):
+        path = os.path.join(app.config['AUDIO_DIR'], str(user_id))
+    else:
+        path = os.path.join(app.config['DATA_DIR'], 'work')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def encode_job_audio(source_path, work_dir, job_id, target_format):
+    """Encode a job's WAV into `target_format`; return the format produced.
+
+    The result is `work_dir/<job_id>.<extension>`.  Falls back to keeping
+    the WAV if the encoder fails.
+    """
+    output_path = os.path.join(work_dir, f'{job_id}.{target_format.extension}')
+    try:
+        audio_encoder.encode(source_path, output_path, target_format.name)
+        os.remove(source_path)
+        return target_format
+    except Exception as e:
+        logger.error(f"Job {job_id}: encoding to {target_format.name} failed ({e}), keeping WAV")
+        os.replace(source_path, os.path.join(work_dir, f'{job_id}.wav'))
+        return AUDIO_FORMATS['wav']
+
+
+def estimate_job_memory(chunks, speaking_rate):
+    """Estimate peak bytes a job holds: chunks × expected PCM per chunk."""
+    rate = max(0.25, speaking_rate or 1.0)
+    per_chunk = (
+        len(chunk) / (NARRATION_CHARS_PER_SECOND * rate) * PCM_BYTES_PER_SECOND
+        for chunk in chunks
+    )
+    return int(sum(per_chunk) * JOB_MEMORY_OVERHEAD_FACTOR)
+
+
+def check_job_capacity():
+    """Raise ExecutorSaturated if the backend would turn a new job away.
+
+    Lets a request be refused before it writes anything; dispatch_job
+    checks again, since other requests may fill the queue meanwhile.
+    """
+    if isinstance(job_store, SqliteJobQueue):
+        if job_store.queue_depth() >= app.config['JOB_MAX_QUEUED']:
+            raise ExecutorSaturated(QUEUE_RETRY_AFTER)
+    else:
+        job_executor.check_capacity()
+
+
+def dispatch_job(job_id, record, text_chunks, voice_params, estimated_bytes):
+    """Hand an accepted job to the configured backend.
+
+    Returns the job's 1-based queue position, as job_queue_position()
+    reports it; raises ExecutorSaturated when the backend cannot take
+    more work, leaving no trace of the job.
+    """
+    if isinstance(job_store, SqliteJobQueue):
+        ahead = job_store.queue_depth()
+        if ahead >= app.config['JOB_MAX_QUEUED']:
+            raise ExecutorSaturated(QUEUE_RETRY_AFTER)
+        job_store.create(
+            job_id, dict(record, status='queued'),
+            payload={'text_chunks': text_chunks, 'voice_params': voice_params},
+        )
+        return ahead + 1
+
+    job_store.create(job_id, dict(record, status='queued'))
+    try:
+        return job_executor.submit(
+            job_id, estimated_bytes, process_tts_job,
+            job_id, text_chunks, voice_params,
+        ) + 1
+    except ExecutorSaturated:
+        job_store.discard(job_id)
+        raise
+
+
+def server_busy_response(error):
+    """503 with Retry-After for a job the backend has no room for."""
+    response = jsonify({
+        'error': f'The server is busy. Please try again in {error.retry_after} seconds.',
+    })
+    response.status_code = 503
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
+
+def job_queue_position(job_id):
+    """Return the 1-based queue position of a waiting job, or None."""
+    if isinstance(job_store, SqliteJobQueue):
+        return job_store.position(job_id)
+    return job_executor.position(job_id)
+
+
+def handle_crashed_job(job_id, ran_alone):
+    """Deal with a job that was running when its worker pool broke.
+
+    A broken pool fails every job in it, not only the one whose process
+    died.  A job that shared the pool is re-queued, marked to run alone
+    next time; one that had the pool to itself caused the crash and fails.
+    """
+    job = job_store.get(job_id)
+    if not job or job['status'] not in ('queued', 'processing'):
+        return  # finished before the pool broke
+    if ran_alone:
+        logger.error(f"Job {job_id} crashed its worker process; failing it")
+        job_store.update(
+            job_id, status='error',
+            error='Audio generation failed. Please try again.',
+        )
+    else:
+        logger.warning(f"Job {job_id} was running when the worker pool broke; re-queuing it")
+        job_store.requeue(job_id, crashed=True)
+
+
+def run_queued_job(job_id):
+    """Process-pool entry point for `flask run-worker`."""
+    payload = job_store.get_payload(job_id)
+    if payload is None:
+        job_store.update(job_id, status='error', error='Job payload missing.')
+        return
+    # Jobs queued before chunks were kept as plain text carry prepared
+    # (SSML or Gemini) chunks; they are sent as they are and cannot be re-split.
+    if 'text_chunks' in payload:
+        process_tts_job(job_id, payload['text_chunks'], payload['voice_params'])
+    else:
+        process_tts_job(job_id, payload['prepared_chunks'], payload['voice_params'], prepared=True)
 
 
 # ── Page Routes ─────────────────────────────────────────────────
@@ -594,7 +1263,7 @@ def update_display_name():
     if not name or len(name) < 3 or len(name) > 30:
         return jsonify({'error': 'Display name must be 3–30 characters'}), 400
 
-    mongo_db.users.update_one(
+    get_db().users.update_one(
         {'_id': g.current_user_id}, {'$set': {'display_name': name}}
     )
     return jsonify({'success': True, 'display_name': name})
@@ -615,13 +1284,13 @@ def update_email():
         return jsonify({'error': 'Current password is incorrect'}), 403
 
     # Check uniqueness (exclude self)
-    existing = mongo_db.users.find_one({
+    existing = get_db().users.find_one({
         'email': new_email, '_id': {'$ne': g.current_user_id}
     })
     if existing:
         return jsonify({'error': 'Email already in use by another account'}), 409
 
-    mongo_db.users.update_one(
+    get_db().users.update_one(
         {'_id': g.current_user_id}, {'$set': {'email': new_email}}
     )
     return jsonify({'success': True})
@@ -642,7 +1311,7 @@ def update_password():
     if new_password != confirm_password:
         return jsonify({'error': 'New passwords do not match'}), 400
 
-    mongo_db.users.update_one(
+    get_db().users.update_one(
         {'_id': g.current_user_id},
         {'$set': {'password_hash': generate_password_hash(new_password)}}
     )
@@ -652,7 +1321,7 @@ def update_password():
 @app.route('/api/patreon/unlink', methods=['POST'])
 @login_required
 def patreon_unlink():
-    mongo_db.users.update_one(
+    get_db().users.update_one(
         {'_id': g.current_user_id},
         {'$unset': {'patreon_id': ''}, '$set': {'tier': 'free'}}
     )
@@ -662,6 +1331,26 @@ def patreon_unlink():
 
 # ── API: Usage ──────────────────────────────────────────────────
 
+def library_storage_usage():
+    """Return {'bytes', 'files'} for the logged-in user's library.
+
+    The totals are kept on the user document together with the library's
+    collection version, so polling /api/usage reuses them until a library
+    write bumps that version and only then runs the aggregate again.
+    """
+    version = g.current_user.get('collection_versions', {}).get('library', 0)
+    cached = g.current_user.get('library_storage') or {}
+    if cached.get('version') == version:
+        return cached
+    storage = next(get_db().audio_files.aggregate([
+        {'$match': {'user_id': g.current_user_id}},
+        {'$group': {'_id': None, 'bytes': {'$sum': '$file_size_bytes'}, 'files': {'$sum': 1}}},
+    ]), {'bytes': 0, 'files': 0})
+    storage = {'version': version, 'bytes': storage['bytes'], 'files': storage['files']}
+    get_db().users.update_one({'_id': g.current_user_id}, {'$set': {'library_storage': storage}})
+    return storage
+
+
 @app.route('/api/usage')
 @login_required
 def get_usage():
@@ -675,7 +1364,8 @@ def get_usage():
         .get('chars_used', 0)
     )
     monthly_limit = tier_cfg['monthly_chars']
-    voices, _, _ = get_voices_for_tier(tier)
+    voice_count = len(get_tier_catalog(tier).voices)
+    storage = library_storage_usage()
 
     now = datetime.utcnow()
     # Calculate reset date (first of next month)
@@ -692,8 +1382,28 @@ def get_usage():
         'chars_remaining': max(0, monthly_limit - chars_used) if monthly_limit else None,
         'period': now.strftime('%B %Y'),
         'resets': reset_date.strftime('%B %d, %Y'),
-        'voice_count': len(voices),
+        'voice_count': voice_count,
         'commercial': tier_cfg['commercial'],
+        'storage_bytes': storage['bytes'],
+        'storage_files': storage['files'],
+    })
+
+
+# ── API: Upstream Monitoring ───────────────────────────────────
+
+@app.route('/api/admin/upstream')
+@login_required
+def upstream_status():
+    """Scheduler and concurrency-controller state for this process (owner only)."""
+    if get_user_tier(g.current_user) != 'owner':
+        return jsonify({'error': 'Not found'}), 404
+    controller = chunk_scheduler.controller
+    return jsonify({
+        'pid': os.getpid(),
+        'categories': chunk_scheduler.stats(),
+        'concurrency': controller.snapshot() if controller else None,
+        'credentials': {engine: pool.snapshot() for engine, pool in credential_pools.items()},
+        'executor': job_executor.stats(),
     })
 
 
@@ -702,17 +1412,10 @@ def get_usage():
 @app.route('/api/voices')
 @login_required
 def get_voices():
-    tier = get_user_tier(g.current_user)
-    voices, categories, default = get_voices_for_tier(tier)
-    moods, custom_mood_allowed = get_moods_for_tier(tier)
-    return jsonify({
-        'categories': categories,
-        'voices': voices,
-        'default': default,
-        'tier': tier,
-        'moods': moods,
-        'custom_mood_allowed': custom_mood_allowed,
-    })
+    catalog = get_tier_catalog(get_user_tier(g.current_user))
+    # The catalog never changes at runtime, so compress it once per tier
+    g.compress_cache_key = catalog.etag
+    return etag_response(catalog.etag, lambda: catalog.voices_json)
 
 
 # ── API: Voice Presets ──────────────────────────────────────────
@@ -720,10 +1423,13 @@ def get_voices():
 @app.route('/api/presets', methods=['GET'])
 @login_required
 def list_presets():
-    presets = list(mongo_db.voice_presets.find(
-        {'user_id': g.current_user_id}
-    ).sort('name', 1))
-    return jsonify({'presets': [_preset_to_dict(p) for p in presets]})
+    def build():
+        presets = get_db().voice_presets.find(
+            {'user_id': g.current_user_id}
+        ).sort('name', 1)
+        return {'presets': [_preset_to_dict(p) for p in presets]}
+
+    return etag_response(collection_etag('presets'), build)
 
 
 @app.route('/api/presets', methods=['POST'])
@@ -741,7 +1447,7 @@ def create_preset():
     if voice_name not in get_allowed_voice_names_for_tier(tier):
         return jsonify({'error': 'Invalid voice'}), 400
 
-    existing = mongo_db.voice_presets.find_one({
+    existing = get_db().voice_presets.find_one({
         'user_id': g.current_user_id, 'name': name
     })
     if existing:
@@ -760,7 +1466,8 @@ def create_preset():
         'mood_id': mood_id,
         'created_at': utcnow(),
     }
-    result = mongo_db.voice_presets.insert_one(doc)
+    result = get_db().voice_presets.insert_one(doc)
+    bump_collection_version(g.current_user_id, 'presets')
     doc['_id'] = result.inserted_id
     return jsonify({'preset': _preset_to_dict(doc)}), 201
 
@@ -773,7 +1480,7 @@ def update_preset(preset_id):
     except Exception:
         return jsonify({'error': 'Invalid preset ID'}), 400
 
-    preset = mongo_db.voice_presets.find_one({
+    preset = get_db().voice_presets.find_one({
         '_id': oid, 'user_id': g.current_user_id
     })
     if not preset:
@@ -784,7 +1491,7 @@ def update_preset(preset_id):
     if not name or len(name) > 100:
         return jsonify({'error': 'Name is required (max 100 chars)'}), 400
 
-    duplicate = mongo_db.voice_presets.find_one({
+    duplicate = get_db().voice_presets.find_one({
         'user_id': g.current_user_id,
         'name': name,
         '_id': {'$ne': oid},
@@ -792,7 +1499,8 @@ def update_preset(preset_id):
     if duplicate:
         return jsonify({'error': 'A preset with that name already exists'}), 409
 
-    mongo_db.voice_presets.update_one({'_id': oid}, {'$set': {'name': name}})
+    get_db().voice_presets.update_one({'_id': oid}, {'$set': {'name': name}})
+    bump_collection_version(g.current_user_id, 'presets')
     preset['name'] = name
     return jsonify({'preset': _preset_to_dict(preset)})
 
@@ -805,11 +1513,12 @@ def delete_preset(preset_id):
     except Exception:
         return jsonify({'error': 'Invalid preset ID'}), 400
 
-    result = mongo_db.voice_presets.delete_one({
+    result = get_db().voice_presets.delete_one({
         '_id': oid, 'user_id': g.current_user_id
     })
     if result.deleted_count == 0:
         return jsonify({'error': 'Preset not found'}), 404
+    bump_collection_version(g.current_user_id, 'presets')
     return jsonify({'success': True})
 
 
@@ -830,10 +1539,13 @@ def _preset_to_dict(doc):
 @app.route('/api/texts', methods=['GET'])
 @login_required
 def list_texts():
-    texts = list(mongo_db.source_texts.find(
-        {'user_id': g.current_user_id}
-    ).sort('updated_at', -1))
-    return jsonify({'texts': [_text_to_dict(t) for t in texts]})
+    def build():
+        texts = get_db().source_texts.find(
+            {'user_id': g.current_user_id}
+        ).sort('updated_at', -1)
+        return {'texts': [_text_to_dict(t) for t in texts]}
+
+    return etag_response(collection_etag('texts'), build)
 
 
 @app.route('/api/texts/<text_id>', methods=['GET'])
@@ -844,7 +1556,7 @@ def get_text(text_id):
     except Exception:
         return jsonify({'error': 'Invalid text ID'}), 400
 
-    text = mongo_db.source_texts.find_one({
+    text = get_db().source_texts.find_one({
         '_id': oid, 'user_id': g.current_user_id
     })
     if not text:
@@ -875,7 +1587,8 @@ def save_text():
         'created_at': now,
         'updated_at': now,
     }
-    result = mongo_db.source_texts.insert_one(doc)
+    result = get_db().source_texts.insert_one(doc)
+    bump_collection_version(g.current_user_id, 'texts')
     doc['_id'] = result.inserted_id
     return jsonify({'text': _text_to_dict(doc)}), 201
 
@@ -888,7 +1601,7 @@ def update_text(text_id):
     except Exception:
         return jsonify({'error': 'Invalid text ID'}), 400
 
-    text = mongo_db.source_texts.find_one({
+    text = get_db().source_texts.find_one({
         '_id': oid, 'user_id': g.current_user_id
     })
     if not text:
@@ -899,10 +1612,11 @@ def update_text(text_id):
     if not title or len(title) > 200:
         return jsonify({'error': 'Title is required (max 200 chars)'}), 400
 
-    mongo_db.source_texts.update_one(
+    get_db().source_texts.update_one(
         {'_id': oid},
         {'$set': {'title': title, 'updated_at': utcnow()}}
     )
+    bump_collection_version(g.current_user_id, 'texts')
     text['title'] = title
     return jsonify({'text': _text_to_dict(text)})
 
@@ -915,17 +1629,20 @@ def delete_text(text_id):
     except Exception:
         return jsonify({'error': 'Invalid text ID'}), 400
 
-    result = mongo_db.source_texts.delete_one({
+    result = get_db().source_texts.delete_one({
         '_id': oid, 'user_id': g.current_user_id
     })
     if result.deleted_count == 0:
         return jsonify({'error': 'Text not found'}), 404
 
     # Unlink audio files that referenced this text
-    mongo_db.audio_files.update_many(
+    unlinked = get_db().audio_files.update_many(
         {'source_text_id': oid},
         {'$set': {'source_text_id': None}}
     )
+    bump_collection_version(g.current_user_id, 'texts')
+    if unlinked.modified_count:
+        bump_collection_version(g.current_user_id, 'library')
     return jsonify({'success': True})
 
 
@@ -948,68 +1665,299 @@ def _text_to_dict(doc, include_content=False):
 @app.route('/api/library', methods=['GET'])
 @login_required
 def list_audio():
-    audio_files = list(mongo_db.audio_files.find(
-        {'user_id': g.current_user_id}
-    ).sort('created_at', -1))
-    return jsonify({'audio_files': [_audio_to_dict(a) for a in audio_files]})
+    def build():
+        audio_files = get_db().audio_files.find(
+            {'user_id': g.current_user_id}, {'chunk_index': 0},
+        ).sort('created_at', -1)
+        return {'audio_files': [_audio_to_dict(a) for a in audio_files]}
 
+    # Entries carry signed URLs, so the ETag changes when they would
+    etag = f"{collection_etag('library')}-{audio_url_signer.window()}"
+    return etag_response(etag, build)
 
-@app.route('/api/library/<audio_id>/stream')
-@login_required
-def stream_library_audio(audio_id):
+
+# Bytes fetched to parse a stored WAV's header (Cloud TTS headers are 44)
+WAV_HEADER_PROBE = 64 * 1024
+
+
+def load_owned_audio(audio_id):
+    """Look up the current user's audio file.
+
+    Returns (audio_doc, storage_key, None), or (None, None, error_response).
+    """
     try:
         oid = ObjectId(audio_id)
     except Exception:
-        return jsonify({'error': 'Invalid audio ID'}), 400
+        return None, None, (jsonify({'error': 'Invalid audio ID'}), 400)
 
-    audio = mongo_db.audio_files.find_one({
+    audio = get_db().audio_files.find_one({
         '_id': oid, 'user_id': g.current_user_id
     })
     if not audio:
-        return jsonify({'error': 'Audio not found'}), 404
+        return None, None, (jsonify({'error': 'Audio not found'}), 404)
+
+    if not UUID_AUDIO_RE.match(audio.get('filename', '')):
+        return None, None, (jsonify({'error': 'Invalid filename'}), 400)
+
+    key = storage_key(g.current_user_id, audio['filename'])
+    if not audio_storage.exists(key):
+        return None, None, (jsonify({'error': 'Audio file not found'}), 404)
+    return audio, key, None
 
-    if not UUID_WAV_RE.match(audio.get('filename', '')):
-        return jsonify({'error': 'Invalid filename'}), 400
 
-    file_path = os.path.join(
-        app.config['AUDIO_DIR'], str(g.current_user_id), audio['filename']
+def signed_audio_url(user_id, audio_id, filename):
+    """Return an expiring URL for one audio file that needs no session."""
+    expires = audio_url_signer.expiry()
+    signature = audio_url_signer.signature(user_id, audio_id, filename, expires)
+    return url_for(
+        'stream_signed_audio', user_id=str(user_id), audio_id=str(audio_id),
+        filename=filename, expires=expires, sig=signature,
     )
+
+
+def send_audio_file(key, download_name=None):
+    """Respond with a stored audio file, or let the front proxy send it.
+
+    With AUDIO_OFFLOAD set, the response carries only an X-Accel-Redirect
+    or X-Sendfile header; the proxy then streams the file (Range requests
+    included) without holding an application thread for the transfer.
+    Files in remote storage are relayed with ranged reads.
+    """
+    mimetype = mimetype_for_filename(key)
+    file_path = audio_storage.local_path(key)
+    if file_path is None:
+        return relay_stored_audio(key, mimetype, download_name)
     if not os.path.exists(file_path):
-        return jsonify({'error': 'Audio file not found on disk'}), 404
+        raise NotFound()
+    mode = app.config['AUDIO_OFFLOAD']
+    relative = os.path.relpath(file_path, app.config['AUDIO_DIR'])
+    if mode not in ('x-accel', 'x-sendfile') or relative.startswith('..'):
+        return send_file(
+            file_path, mimetype=mimetype,
+            as_attachment=download_name is not None, download_name=download_name,
+        )
+
+    response = app.response_class(mimetype=mimetype)
+    if mode == 'x-accel':
+        prefix = app.config['AUDIO_ACCEL_PREFIX'].rstrip('/')
+        response.headers['X-Accel-Redirect'] = f"{prefix}/{url_quote(relative.replace(os.sep, '/'))}"
+    else:
+        response.headers['X-Sendfile'] = os.path.abspath(file_path)
+    if download_name is not None:
+        response.headers.set('Content-Disposition', 'attachment', filename=download_name)
+    response.headers['Accept-Ranges'] = 'bytes'
+    return response
 
-    return send_file(file_path, mimetype='audio/wav')
+
+def relay_stored_audio(key, mimetype, download_name=None):
+    """Stream an object from remote storage, honouring a single Range."""
+    size = audio_storage.size(key)
+    if size is None:
+        raise NotFound()
+    byte_range = request.range.range_for_length(size) if request.range else None
+    if request.range and byte_range is None:
+        raise RequestedRangeNotSatisfiable(length=size)
+    start, end = byte_range or (0, size)
+
+    response = app.response_class(
+        audio_storage.iter_range(key, start, end - start),
+        status=206 if byte_range else 200, mimetype=mimetype,
+    )
+    response.content_length = end - start
+    if byte_range:
+        response.headers['Content-Range'] = f'bytes {start}-{end - 1}/{size}'
+    response.headers['Accept-Ranges'] = 'bytes'
+    response.headers.set(
+        'Content-Disposition', 'attachment' if download_name else 'inline',
+        filename=download_name or key.rsplit('/', 1)[-1],
+    )
+    return response
+
+
+@app.route('/api/library/<audio_id>/stream')
+@login_required
+def stream_library_audio(audio_id):
+    audio, key, error = load_owned_audio(audio_id)
+    if error:
+        return error
+
+    return send_audio_file(key)
+
+
+@app.route('/api/audio/<user_id>/<audio_id>/<filename>')
+def stream_signed_audio(user_id, audio_id, filename):
+    """Serve audio for a signed URL; authorization is the signature alone.
+
+    No session or database access, so each Range request an <audio>
+    element makes while seeking costs only a storage read.
+    """
+    if not (OBJECT_ID_RE.match(user_id) and OBJECT_ID_RE.match(audio_id)
+            and UUID_AUDIO_RE.match(filename)):
+        return jsonify({'error': 'Invalid audio URL'}), 400
+    expires = request.args.get('expires')
+    if not audio_url_signer.verify(user_id, audio_id, filename, expires, request.args.get('sig')):
+        return jsonify({'error': 'Audio link expired or invalid'}), 403
+
+    response = send_audio_file(storage_key(user_id, filename))
+    response.cache_control.no_cache = None
+    response.cache_control.private = True
+    response.cache_control.max_age = max(0, min(int(expires) - int(time.time()), 3600))
+    return response
 
 
 @app.route('/api/library/<audio_id>/download')
 @login_required
 def download_library_audio(audio_id):
-    try:
-        oid = ObjectId(audio_id)
-    except Exception:
-        return jsonify({'error': 'Invalid audio ID'}), 400
+    audio, key, error = load_owned_audio(audio_id)
+    if error:
+        return error
 
-    audio = mongo_db.audio_files.find_one({
-        '_id': oid, 'user_id': g.current_user_id
-    })
-    if not audio:
-        return jsonify({'error': 'Audio not found'}), 404
+    safe_title = re.sub(r'[^\w\s-]', '', audio['title']).strip() or 'audio'
+    extension = audio['filename'].rsplit('.', 1)[-1]
+    return send_audio_file(key, download_name=f'{safe_title}.{extension}')
 
-    if not UUID_WAV_RE.match(audio.get('filename', '')):
-        return jsonify({'error': 'Invalid filename'}), 400
 
-    file_path = os.path.join(
-        app.config['AUDIO_DIR'], str(g.current_user_id), audio['filename']
+@app.route('/api/library/<audio_id>/chapters/<int:index>/stream')
+@login_required
+def stream_library_chapter(audio_id, index):
+    """Serve one chapter as a standalone WAV sliced from the stored file."""
+    audio, key, error = load_owned_audio(audio_id)
+    if error:
+        return error
+
+    chapters = audio.get('chapters') or []
+    if not 0 <= index < len(chapters):
+        return jsonify({'error': 'Chapter not found'}), 404
+    if audio.get('audio_format', 'wav') != 'wav':
+        return jsonify({'error': 'Chapter streaming is only available for WAV audio'}), 409
+
+    info = read_wav_header(io.BytesIO(audio_storage.read_bytes(key, 0, WAV_HEADER_PROBE)))
+    chapter = chapters[index]
+    start = info.data_offset + chapter['start_sample'] * info.block_align
+    length = min(
+        chapter['samples'] * info.block_align,
+        info.data_offset + info.data_size - start,
     )
-    if not os.path.exists(file_path):
-        return jsonify({'error': 'Audio file not found on disk'}), 404
-
-    safe_title = re.sub(r'[^\w\s-]', '', audio['title']).strip() or 'audio'
-    return send_file(
-        file_path,
-        mimetype='audio/wav',
-        as_attachment=True,
-        download_name=f'{safe_title}.wav',
+    header = wav_header(length, info.sample_rate, info.bits_per_sample, info.channels)
+
+    # Ranges address the chapter file as served: its own header, then audio
+    total = len(header) + length
+    byte_range = request.range.range_for_length(total) if request.range else None
+    if request.range and byte_range is None:
+        raise RequestedRangeNotSatisfiable(length=total)
+    first, last = byte_range or (0, total)
+
+    def generate():
+        if first < len(header):
+            yield header[first:last]
+        audio_from = max(first - len(header), 0)
+        audio_to = last - len(header)
+        if audio_to > audio_from:
+            yield from audio_storage.iter_range(key, start + audio_from, audio_to - audio_from)
+
+    response = app.response_class(
+        generate(), status=206 if byte_range else 200, mimetype='audio/wav',
     )
+    response.content_length = last - first
+    if byte_range:
+        response.headers['Content-Range'] = f'bytes {first}-{last - 1}/{total}'
+    response.headers['Accept-Ranges'] = 'bytes'
+    return response
+
+
+@app.route('/api/library/<audio_id>/peaks')
+@login_required
+def library_audio_peaks(audio_id):
+    """Serve the precomputed min/max waveform peaks of a library file.
+
+    `peaks` interleaves min and max per bucket of `samples_per_peak`
+    samples, scaled to -128..127.
+    """
+    audio, key, error = load_owned_audio(audio_id)
+    if error:
+        return error
+
+    peaks_key = peaks_path_for(key)
+    if not audio_storage.exists(peaks_key):
+        return jsonify({'error': 'Waveform not available for this audio'}), 404
+    sample_rate, samples_per_peak, pairs = read_peaks(audio_storage.read_bytes(peaks_key))
+    return jsonify({
+        'sample_rate': sample_rate,
+        'samples_per_peak': samples_per_peak,
+        'peaks': pairs.tolist(),
+    })
+
+
+def export_entries(user_id, docs):
+    """ZIP entries for export_library: each stored file, then a JSON manifest.
+
+    Files are opened as the archive reaches them, so a missing one costs
+    nothing up front; it is left out of the archive and the manifest.
+    """
+    manifest, used_names = [], set()
+    for doc in docs:
+        key = storage_key(user_id, doc['filename'])
+        source = audio_storage.iter_range(key)
+        try:
+            first_block = next(source, b'')
+        except (OSError, StorageError) as e:
+            logger.warning(f"Export skipping {key}: {e}")
+            continue
+        safe_title = re.sub(r'[^\w\s-]', '', doc['title']).strip() or 'audio'
+        extension = doc['filename'].rsplit('.', 1)[-1]
+        name, n = f'{safe_title}.{extension}', 1
+        while name.lower() in used_names:
+            n += 1
+            name = f'{safe_title} ({n}).{extension}'
+        used_names.add(name.lower())
+        created_at = doc.get('created_at')
+        yield (
+            name, itertools.chain([first_block], source),
+            created_at.timestamp() if created_at else time.time(), False,
+        )
+        manifest.append({
+            'file': name,
+            'title': doc['title'],
+            'duration_seconds': doc.get('duration_seconds'),
+            'audio_format': doc.get('audio_format', 'wav'),
+            'voice_name': doc.get('voice_name'),
+            'speaking_rate': doc.get('speaking_rate'),
+            'pitch': doc.get('pitch'),
+            'created_at': created_at.isoformat() if created_at else None,
+        })
+    manifest_json = json.dumps({'audio_files': manifest}, indent=2).encode()
+    yield 'manifest.json', manifest_json, time.time(), True
+
+
+@app.route('/api/library/export')
+@login_required
+def export_library():
+    """Stream a ZIP of the user's audio files plus a JSON manifest.
+
+    `?ids=a,b,c` limits the export to a selection; without it the whole
+    library is exported.  The archive is generated while it is sent, so
+    memory use does not grow with the library.
+    """
+    query = {'user_id': g.current_user_id}
+    ids = [i for i in request.args.get('ids', '').split(',') if i]
+    if ids:
+        try:
+            query['_id'] = {'$in': [ObjectId(i) for i in ids]}
+        except Exception:
+            return jsonify({'error': 'Invalid audio ID'}), 400
+
+    docs = [
+        doc for doc in get_db().audio_files.find(
+            query, {'chunk_index': 0, 'chapters': 0},
+        ).sort('created_at', 1)
+        if UUID_AUDIO_RE.match(doc.get('filename', ''))
+    ]
+    if not docs:
+        return jsonify({'error': 'No audio files to export'}), 404
+
+    response = app.response_class(stream_zip(export_entries(g.current_user_id, docs)), mimetype='application/zip')
+    response.headers.set('Content-Disposition', 'attachment', filename='storyteller-library.zip')
+    return response
 
 
 @app.route('/api/library/<audio_id>', methods=['PUT'])
@@ -1020,7 +1968,7 @@ def update_audio(audio_id):
     except Exception:
         return jsonify({'error': 'Invalid audio ID'}), 400
 
-    audio = mongo_db.audio_files.find_one({
+    audio = get_db().audio_files.find_one({
         '_id': oid, 'user_id': g.current_user_id
     })
     if not audio:
@@ -1031,7 +1979,8 @@ def update_audio(audio_id):
     if not title or len(title) > 200:
         return jsonify({'error': 'Title is required (max 200 chars)'}), 400
 
-    mongo_db.audio_files.update_one({'_id': oid}, {'$set': {'title': title}})
+    get_db().audio_files.update_one({'_id': oid}, {'$set': {'title': title}})
+    bump_collection_version(g.current_user_id, 'library')
     audio['title'] = title
     return jsonify({'audio': _audio_to_dict(audio)})
 
@@ -1044,21 +1993,21 @@ def delete_audio(audio_id):
     except Exception:
         return jsonify({'error': 'Invalid audio ID'}), 400
 
-    audio = mongo_db.audio_files.find_one({
+    audio = get_db().audio_files.find_one({
         '_id': oid, 'user_id': g.current_user_id
     })
     if not audio:
         return jsonify({'error': 'Audio not found'}), 404
 
-    file_path = os.path.join(
-        app.config['AUDIO_DIR'], str(g.current_user_id), audio['filename']
-    )
-    try:
-        os.remove(file_path)
-    except OSError:
-        pass
+    key = storage_key(g.current_user_id, audio['filename'])
+    for stored in (key, peaks_path_for(key)):
+        try:
+            audio_storage.delete(stored)
+        except (OSError, StorageError) as e:
+            logger.warning(f"Could not delete {stored}: {e}")
 
-    mongo_db.audio_files.delete_one({'_id': oid})
+    get_db().audio_files.delete_one({'_id': oid})
+    bump_collection_version(g.current_user_id, 'library')
     return jsonify({'success': True})
 
 
@@ -1079,8 +2028,19 @@ def _audio_to_dict(doc):
         'custom_mood': bool(doc.get('custom_mood')),
         'duration_seconds': doc.get('duration_seconds'),
         'file_size_bytes': doc.get('file_size_bytes', 0),
+        'audio_format': doc.get('audio_format', 'wav'),
+        'chapters': [
+            {
+                'title': c['title'],
+                'level': c['level'],
+                'start_seconds': round(c['start_sample'] / doc['sample_rate'], 3),
+                'duration_seconds': round(c['samples'] / doc['sample_rate'], 3),
+            }
+            for c in doc.get('chapters') or []
+        ] if doc.get('sample_rate') else [],
         'source_text_id': str(doc['source_text_id']) if doc.get('source_text_id') else None,
         'created_at': doc.get('created_at', '').isoformat() if doc.get('created_at') else None,
+        'stream_url': signed_audio_url(doc['user_id'], doc['_id'], doc['filename']),
     }
 
 
@@ -1112,11 +2072,10 @@ def synthesize():
             return jsonify({'error': 'Input text is empty'}), 400
 
         tier = get_user_tier(g.current_user)
-        allowed_voices = get_allowed_voice_names_for_tier(tier)
-        tier_default = get_voices_for_tier(tier)[2]
-        voice_name = request.form.get('voice_name', tier_default)
-        if voice_name not in allowed_voices:
-            voice_name = tier_default
+        catalog = get_tier_catalog(tier)
+        voice_name = request.form.get('voice_name', catalog.default_voice)
+        if voice_name not in catalog.allowed_voice_names:
+            voice_name = catalog.default_voice
 
         try:
             speaking_rate = float(request.form.get('speaking_rate', Config.TTS_SPEAKING_RATE))
@@ -1135,6 +2094,13 @@ def synthesize():
         custom_mood = request.form.get('custom_mood', '').strip() or None
         system_instruction = None
         engine = get_voice_engine(voice_name)
+        audio_format = (
+            request.form.get('audio_format')
+            or get_tier_config(tier).get('audio_format')
+            or Config.TTS_AUDIO_FORMAT
+        )
+        if audio_format not in AUDIO_FORMATS:
+            return jsonify({'error': f'Invalid audio_format (use {", ".join(AUDIO_FORMATS)})'}), 400
         if engine == 'gemini':
             system_instruction = validate_mood_for_tier(
                 tier, mood_id=mood_id, custom_prompt=custom_mood,
@@ -1142,6 +2108,12 @@ def synthesize():
 
         audio_title = (request.form.get('audio_title') or '').strip() or 'Untitled'
 
+        # Refuse before saving anything if the job would be turned away
+        try:
+            check_job_capacity()
+        except ExecutorSaturated as e:
+            return server_busy_response(e)
+
         # Optionally save source text or link to existing
         source_text_id = None
         save_text_flag = request.form.get('save_text') == '1'
@@ -1151,7 +2123,7 @@ def synthesize():
         if source_text_id_str:
             try:
                 st_oid = ObjectId(source_text_id_str)
-                st = mongo_db.source_texts.find_one({
+                st = get_db().source_texts.find_one({
                     '_id': st_oid, 'user_id': g.current_user_id
                 })
                 if st:
@@ -1160,7 +2132,7 @@ def synthesize():
                 pass
         elif save_text_flag and text_title:
             now = utcnow()
-            result = mongo_db.source_texts.insert_one({
+            result = get_db().source_texts.insert_one({
                 'user_id': g.current_user_id,
                 'title': text_title,
                 'content': raw_text,
@@ -1169,6 +2141,7 @@ def synthesize():
                 'created_at': now,
                 'updated_at': now,
             })
+            bump_collection_version(g.current_user_id, 'texts')
             source_text_id = str(result.inserted_id)
 
         processor = MarkdownProcessor()
@@ -1177,10 +2150,54 @@ def synthesize():
         if not clean_text.strip():
             return jsonify({'error': 'No readable text found after processing'}), 400
 
+        # A saved text may be edited and rendered again: content-defined
+        # boundaries keep its unchanged chunks identical so they can be
+        # reused.  Ad-hoc text never is, so it gets the fuller greedy
+        # packing (fewer chunks, fewer requests).
+        chunker = TextChunker(max_bytes=Config.TTS_MAX_BYTES_PER_REQUEST)
+        chunks = chunker.chunk_stable(clean_text) if source_text_id else chunker.chunk(clean_text)
+
+        if not chunks:
+            return jsonify({'error': 'Text produced no usable chunks'}), 400
+
+        if len(chunks) > MAX_CHUNKS_PER_JOB:
+            return jsonify({
+                'error': f'Text is too long ({len(chunks)} chunks). Maximum is {MAX_CHUNKS_PER_JOB} chunks per job.'
+            }), 400
+
+        voice_params = {
+            'voice_name': voice_name,
+            'speaking_rate': speaking_rate,
+            'pitch': pitch,
+            'system_instruction': system_instruction,
+            'mood_id': mood_id,
+            'custom_mood': custom_mood,
+            'audio_format': audio_format,
+        }
+
+        # ── Incremental re-render ────────────────────────────────
+        # Chunks whose text is unchanged since the last render of this saved
+        # text (same voice settings) are spliced from it, not synthesized.
+        # The job reuses exactly the chunks listed here, which are the ones
+        # left out of the charge below.
+        reusable = set()
+        if source_text_id and synthesis_format(engine, AUDIO_FORMATS[audio_format]).name == 'wav':
+            previous = find_previous_render(g.current_user_id, source_text_id, voice_params)
+            reusable = reusable_chunk_hashes(previous)
+        reuse_chunks = [i for i, c in enumerate(chunks) if chunk_hash(c) in reusable]
+        reused_chunks = len(reuse_chunks)
+        if reuse_chunks:
+            voice_params['previous_audio_id'] = str(previous['_id'])
+            voice_params['reuse_chunks'] = reuse_chunks
+
         # ── Monthly usage enforcement ────────────────────────────
         tier_cfg = get_tier_config(tier)
         monthly_limit = tier_cfg['monthly_chars']
-        char_cost = calculate_char_cost(len(clean_text), voice_name)
+        new_chars = (
+            sum(len(c) for c in chunks if chunk_hash(c) not in reusable)
+            if reused_chunks else len(clean_text)
+        )
+        char_cost = calculate_char_cost(new_chars, voice_name)
 
         if monthly_limit is not None:  # None = unlimited (owner)
             month_key = datetime.utcnow().strftime('%Y-%m')
@@ -1195,71 +2212,46 @@ def synthesize():
                     'error': f'Monthly character limit reached. '
                              f'You have {remaining:,} characters remaining this month. '
                              f'This request would cost {char_cost:,} characters.'
-                             f'{" (Studio voices cost 5× standard)" if char_cost != len(clean_text) else ""}'
+                             f'{" (Studio voices cost 5× standard)" if char_cost != new_chars else ""}'
                 }), 403
 
-        chunker = TextChunker(max_bytes=Config.TTS_MAX_BYTES_PER_REQUEST)
-        chunks = chunker.chunk(clean_text)
-
-        if not chunks:
-            return jsonify({'error': 'Text produced no usable chunks'}), 400
-
-        if len(chunks) > MAX_CHUNKS_PER_JOB:
-            return jsonify({
-                'error': f'Text is too long ({len(chunks)} chunks). Maximum is {MAX_CHUNKS_PER_JOB} chunks per job.'
-            }), 400
-
-        # Prepare chunks for the appropriate TTS engine
-        # (engine was set above during mood validation)
-        if engine == 'gemini':
-            prepared_chunks = [prepare_text_for_gemini(chunk) for chunk in chunks]
-        else:
-            builder = SSMLBuilder()
-            prepared_chunks = [builder.build(chunk) for chunk in chunks]
-
-        increment_active_jobs(client_ip)
-
+        # Chunks stay as plain text here; the job converts each one to SSML
+        # or Gemini text as it is sent, so a failing chunk can be re-split.
         job_id = str(uuid.uuid4())
-        jobs[job_id] = {
-            'status': 'processing',
-            'total_chunks': len(prepared_chunks),
-            'completed_chunks': 0,
+        record = {
+            'total_chunks': len(chunks),
+            'completed_chunks': reused_chunks,
             'error': None,
             'output_path': None,
             'created_at': time.time(),
             'client_ip': client_ip,
             'user_id': str(g.current_user_id),
+            'tier': tier,
             'audio_title': audio_title,
             'source_text_id': source_text_id,
             'audio_id': None,
         }
 
-        voice_params = {
-            'voice_name': voice_name,
-            'speaking_rate': speaking_rate,
-            'pitch': pitch,
-            'system_instruction': system_instruction,
-            'mood_id': mood_id,
-            'custom_mood': custom_mood,
-        }
-
-        thread = threading.Thread(
-            target=process_tts_job,
-            args=(job_id, prepared_chunks, voice_params),
-        )
-        thread.daemon = True
-        thread.start()
+        try:
+            queue_position = dispatch_job(
+                job_id, record, chunks, voice_params,
+                estimate_job_memory(chunks, speaking_rate),
+            )
+        except ExecutorSaturated as e:
+            return server_busy_response(e)
 
         # Increment monthly usage counter (after job accepted)
         if monthly_limit is not None:
-            mongo_db.users.update_one(
+            get_db().users.update_one(
                 {'_id': g.current_user_id},
                 {'$inc': {f'usage.{month_key}.chars_used': char_cost}},
             )
 
         return jsonify({
             'job_id': job_id,
-            'total_chunks': len(prepared_chunks),
+            'total_chunks': len(chunks),
+            'reused_chunks': reused_chunks,
+            'queue_position': queue_position,
         })
 
     except ValueError as e:
@@ -1272,7 +2264,7 @@ def synthesize():
 @app.route('/api/status/<job_id>')
 @login_required
 def status(job_id):
-    job = jobs.get(job_id)
+    job = job_store.get(job_id)
     if not job or job.get('user_id') != str(g.current_user_id):
         return jsonify({'error': 'Job not found'}), 404
 
@@ -1282,24 +2274,30 @@ def status(job_id):
         'completed_chunks': job['completed_chunks'],
         'error': job['error'],
         'audio_id': job.get('audio_id'),
+        'stream_url': signed_audio_url(
+            job['user_id'], job['audio_id'], os.path.basename(job['output_path']),
+        ) if job['status'] == 'complete' and job.get('audio_id') else None,
+        'queue_position': job_queue_position(job_id) if job['status'] == 'queued' else None,
     })
 
 
 @app.route('/api/stream/<job_id>')
 @login_required
 def stream(job_id):
-    """Serve WAV audio inline for browser playback via <audio> element."""
-    job = jobs.get(job_id)
+    """Serve job audio inline for browser playback via <audio> element."""
+    job = job_store.get(job_id)
     if not job or job.get('user_id') != str(g.current_user_id):
         return jsonify({'error': 'Job not found'}), 404
 
     if job['status'] != 'complete':
         return jsonify({'error': 'Job not complete'}), 400
 
-    if not job['output_path'] or not os.path.exists(job['output_path']):
+    if not job['output_path']:
         return jsonify({'error': 'Output file not found'}), 404
 
-    return send_file(job['output_path'], mimetype='audio/wav')
+    # Jobs finished before audio storage keys held an absolute file path;
+    # both forms end in the file name, which is all the key needs.
+    return send_audio_file(storage_key(job['user_id'], os.path.basename(job['output_path'])))
 
 
 # ── Error Handlers ─────────────────────────────────────────────
@@ -1311,6 +2309,15 @@ def not_found(e):
     return render_template('login.html', error='Page not found'), 404
 
 
+@app.errorhandler(StorageError)
+def storage_unavailable(e):
+    # Remote audio storage refused or failed a request (403, 5xx, timeout)
+    logger.error(f"Audio storage error on {request.path}: {e}")
+    if request.path.startswith('/api/'):
+        return jsonify({'error': 'Audio storage is unavailable. Please try again shortly.'}), 502
+    return render_template('login.html', error='Audio storage is unavailable'), 502
+
+
 @app.errorhandler(500)
 def server_error(e):
     logger.exception("Internal server error")
@@ -1322,26 +2329,55 @@ def server_error(e):
 # ── Cleanup ─────────────────────────────────────────────────────
 
 def cleanup_old_jobs():
-    """Clean up in-memory job entries older than 1 hour."""
+    """Clean up finished job entries older than 1 hour."""
     while True:
         time.sleep(600)
         try:
-            now = time.time()
-            expired_jobs = [
-                jid for jid, j in jobs.items()
-                if now - j.get('created_at', now) > 3600
-            ]
-            for jid in expired_jobs:
-                jobs.pop(jid, None)
+            job_store.purge(JOB_RETENTION_SECONDS)
         except Exception:
             pass
 
 
-cleanup_thread = threading.Thread(target=cleanup_old_jobs, daemon=True)
-cleanup_thread.start()
+# ── Serving-process startup ────────────────────────────────────
+#
+# Importing this module has no side effects beyond building the app, so
+# CLI commands and the gunicorn master (--preload) stay fast.  Background
+# threads start on the first request a serving process handles, which is
+# always after gunicorn has forked the worker.
+
+_serving_started = False
+_serving_lock = threading.Lock()
+
+
+def start_serving_process():
+    """Start per-process background work (idempotent)."""
+    global _serving_started
+    if _serving_started:
+        return
+    with _serving_lock:
+        if _serving_started:
+            return
+        os.makedirs(app.config['AUDIO_DIR'], exist_ok=True)
+        threading.Thread(target=cleanup_old_jobs, daemon=True).start()
+        _serving_started = True
+        logger.info(f"Serving process {os.getpid()} started background tasks")
+
+
+@app.before_request
+def ensure_serving_process():
+    if not _serving_started:
+        start_serving_process()
+
+
+logger.info(f"App loaded in {(time.perf_counter() - _import_started) * 1000:.0f} ms")
 
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
     debug = os.environ.get('FLASK_DEBUG', '0') == '1'
+    if app.config['ENSURE_INDEXES_ON_STARTUP']:
+        try:
+            ensure_indexes()
+        except Exception as e:
+            logger.warning(f"Could not create indexes on startup: {e}")
     app.run(debug=debug, port=port)
@@ -26,12 +26,19 @@ class Config:
     PERMANENT_SESSION_LIFETIME = timedelta(hours=24)
     MAX_CONTENT_LENGTH = 2 * 1024 * 1024  # 2 MB upload limit
 
+    # Response compression (JSON/text only; audio is never compressed)
+    COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', '1024'))
+    COMPRESS_LEVEL = int(os.environ.get('COMPRESS_LEVEL', '6'))
+
     # Authentication
     REGISTRATION_ENABLED = os.environ.get('REGISTRATION_ENABLED', '1') == '1'
 
     # MongoDB
     MONGO_URI = os.environ.get('MONGO_URI', 'mongodb://localhost:27017')
     MONGO_DB_NAME = os.environ.get('MONGO_DB_NAME', 'storyteller')
+    # Indexes are created by `flask init-db` at deploy time; the local dev
+    # server (python app.py) also ensures them unless this is disabled.
+    ENSURE_INDEXES_ON_STARTUP = os.environ.get('ENSURE_INDEXES_ON_STARTUP', '1') == '1'
 
     # Persistent audio file storage
     DATA_DIR = os.environ.get('DATA_DIR', os.path.join(os.path.dirname(__file__), 'instance'))
@@ -40,7 +47,47 @@ class Config:
         'audio'
     )
 
-    # Google Cloud TTS settings
+    # Where audio files live: 'local' (AUDIO_DIR) or 's3' (any S3-compatible
+    # object store, e.g. AWS S3 or MinIO, addressed with path-style URLs)
+    AUDIO_STORAGE = os.environ.get('AUDIO_STORAGE', 'local').lower()
+    S3_ENDPOINT_URL = os.environ.get('S3_ENDPOINT_URL', '')
+    S3_BUCKET = os.environ.get('S3_BUCKET', '')
+    S3_REGION = os.environ.get('S3_REGION', 'us-east-1')
+    S3_ACCESS_KEY_ID = os.environ.get('S3_ACCESS_KEY_ID', '')
+    S3_SECRET_ACCESS_KEY = os.environ.get('S3_SECRET_ACCESS_KEY', '')
+    S3_PREFIX = os.environ.get('S3_PREFIX', 'audio/')
+
+    # Audio delivery: '' streams files from Flask; 'x-accel' (nginx) or
+    # 'x-sendfile' (Apache, lighttpd) hands them to the front proxy once the
+    # request is authorized.  For nginx, AUDIO_ACCEL_PREFIX must be an
+    # `internal` location aliased to AUDIO_DIR.
+    AUDIO_OFFLOAD = os.environ.get('AUDIO_OFFLOAD', '').lower()
+    AUDIO_ACCEL_PREFIX = os.environ.get('AUDIO_ACCEL_PREFIX', '/_protected_audio/')
+
+    # Lifetime of the signed audio URLs handed to the player (rounded up to
+    # the next hour, so URLs stay stable for caching)
+    AUDIO_URL_TTL_SECONDS = int(os.environ.get('AUDIO_URL_TTL_SECONDS', str(6 * 3600)))
+
+    # Background jobs: 'thread' runs jobs inside the web worker; 'queue'
+    # enqueues them for `flask run-worker` (same host, shared DATA_DIR).
+    JOB_BACKEND = os.environ.get('JOB_BACKEND', 'thread')
+    JOB_QUEUE_PATH = os.path.join(DATA_DIR, 'jobs.sqlite3')
+    JOB_WORKER_PROCESSES = int(os.environ.get('JOB_WORKER_PROCESSES', '2'))
+    # Admission control for the 'thread' backend (per web process)
+    JOB_WORKER_THREADS = int(os.environ.get('JOB_WORKER_THREADS', '4'))
+    JOB_MEMORY_BUDGET_MB = int(os.environ.get('JOB_MEMORY_BUDGET_MB', '512'))
+    JOB_MAX_QUEUED = int(os.environ.get('JOB_MAX_QUEUED', '50'))
+    # Threads issuing chunk requests for all jobs in a process
+    CHUNK_SCHEDULER_THREADS = int(os.environ.get('CHUNK_SCHEDULER_THREADS', '16'))
+    # Duplicate chunk requests slower than their category's p95, capped at
+    # this percentage of requests (0 disables hedging)
+    CHUNK_HEDGE_PERCENT = float(os.environ.get('CHUNK_HEDGE_PERCENT', '0'))
+    # Learn each voice category's in-flight limit from 429/503s and latency
+    ADAPTIVE_CONCURRENCY = os.environ.get('ADAPTIVE_CONCURRENCY', '1') == '1'
+    CHUNK_CONCURRENCY_MAX = int(os.environ.get('CHUNK_CONCURRENCY_MAX', '16'))
+
+    # Google Cloud TTS settings (API keys may be comma-separated, one per
+    # project, to pool their quotas)
     GOOGLE_API_KEY = os.environ.get('GOOGLE_API_KEY', '')
     TTS_VOICE_NAME = os.environ.get('TTS_VOICE_NAME', DEFAULT_VOICE)
     TTS_LANGUAGE_CODE = 'en-US'
@@ -48,6 +95,10 @@ class Config:
     TTS_SPEAKING_RATE = float(os.environ.get('TTS_SPEAKING_RATE', '0.95'))
     TTS_PITCH = float(os.environ.get('TTS_PITCH', '-2.0'))
     TTS_SAMPLE_RATE_HERTZ = 24000
+    # Default library format: 'wav', 'mp3', 'ogg' (Opus), 'flac' or 'adpcm'.
+    # Cloud TTS returns mp3/ogg directly; anything else is encoded from WAV
+    # with ffmpeg when installed (otherwise the WAV is kept).
+    TTS_AUDIO_FORMAT = os.environ.get('TTS_AUDIO_FORMAT', 'wav')
 
     # Gemini TTS settings (separate API key from Google AI Studio)
     GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY', '')
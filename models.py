@@ -1,37 +1,48 @@
 """MongoDB connection and collection helpers for Text-to-Storyteller."""
 
 import logging
+import threading
 from datetime import datetime, timezone
+from bson import ObjectId
 from pymongo import MongoClient, ASCENDING, DESCENDING
 
 _logger = logging.getLogger(__name__)
 
-# Module-level references (initialized by init_db)
+# Module-level references (configured by init_db, connected on first use)
+_settings = None
 _client = None
 _db = None
+_connect_lock = threading.Lock()
 
 
 def init_db(mongo_uri, db_name='storyteller'):
-    """Initialize the MongoDB connection and return the database reference."""
-    global _client, _db
-    _client = MongoClient(
-        mongo_uri,
-        maxPoolSize=50,
-        minPoolSize=5,
-        serverSelectionTimeoutMS=5000,
-    )
-    _db = _client[db_name]
-    try:
-        _ensure_indexes()
-    except Exception as e:
-        _logger.warning(f"Could not create indexes on startup (will retry on first query): {e}")
-    return _db
+    """Record connection settings; the client is created lazily by get_db().
+
+    Deferring the connection keeps imports (CLI commands, the gunicorn
+    master with --preload) free of network I/O and means no MongoClient is
+    ever created before a fork.
+    """
+    global _settings
+    _settings = (mongo_uri, db_name)
 
 
 def get_db():
-    """Get the database reference. Must call init_db first."""
-    if _db is None:
+    """Get the database reference, connecting on first use."""
+    global _client, _db
+    if _db is not None:
+        return _db
+    if _settings is None:
         raise RuntimeError("Database not initialized. Call init_db() first.")
+    with _connect_lock:
+        if _db is None:
+            mongo_uri, db_name = _settings
+            _client = MongoClient(
+                mongo_uri,
+                maxPoolSize=50,
+                minPoolSize=5,
+                serverSelectionTimeoutMS=5000,
+            )
+            _db = _client[db_name]
     return _db
 
 
@@ -44,6 +55,11 @@ def close_db():
         _db = None
 
 
+def ensure_indexes():
+    """Create all indexes.  Run once per deployment (`flask init-db`)."""
+    _ensure_indexes()
+
+
 def _ensure_indexes():
     """Create indexes for efficient queries."""
     db = get_db()
@@ -54,6 +70,9 @@ def _ensure_indexes():
     # Audio files: user lookup, sorted by creation date
     db.audio_files.create_index([('user_id', ASCENDING), ('created_at', DESCENDING)])
 
+    # Audio files: unlink on source text deletion
+    db.audio_files.create_index('source_text_id')
+
     # Source texts: user lookup, sorted by updated date
     db.source_texts.create_index([('user_id', ASCENDING), ('updated_at', DESCENDING)])
 
@@ -64,6 +83,84 @@ def _ensure_indexes():
     )
 
 
+# ── Query shape registry ────────────────────────────────────────
+#
+# Every filter/sort combination app.py issues, with placeholder values.
+# `flask db-explain` runs explain() on each one and fails on COLLSCAN, so
+# add an entry here whenever a new query shape is introduced.
+
+_SAMPLE_OID = ObjectId('000000000000000000000000')
+
+QUERY_SHAPES = [
+    # (name, collection, filter, sort)
+    ('users.by_id', 'users', {'_id': _SAMPLE_OID}, None),
+    ('users.by_email', 'users', {'email': 'x@example.com'}, None),
+    ('users.email_taken', 'users',
+     {'email': 'x@example.com', '_id': {'$ne': _SAMPLE_OID}}, None),
+
+    ('audio_files.list', 'audio_files',
+     {'user_id': _SAMPLE_OID}, [('created_at', DESCENDING)]),
+    ('audio_files.owned', 'audio_files',
+     {'_id': _SAMPLE_OID, 'user_id': _SAMPLE_OID}, None),
+    ('audio_files.by_id', 'audio_files', {'_id': _SAMPLE_OID}, None),
+    ('audio_files.by_source_text', 'audio_files',
+     {'source_text_id': _SAMPLE_OID}, None),
+    ('audio_files.previous_render', 'audio_files',
+     {'source_text_id': _SAMPLE_OID, 'user_id': _SAMPLE_OID,
+      'render_key': 'x', 'audio_format': 'wav'}, [('created_at', DESCENDING)]),
+    ('audio_files.export', 'audio_files',
+     {'user_id': _SAMPLE_OID}, [('created_at', ASCENDING)]),
+    ('audio_files.export_selection', 'audio_files',
+     {'user_id': _SAMPLE_OID, '_id': {'$in': [_SAMPLE_OID]}}, [('created_at', ASCENDING)]),
+
+    ('source_texts.list', 'source_texts',
+     {'user_id': _SAMPLE_OID}, [('updated_at', DESCENDING)]),
+    ('source_texts.owned', 'source_texts',
+     {'_id': _SAMPLE_OID, 'user_id': _SAMPLE_OID}, None),
+    ('source_texts.by_id', 'source_texts', {'_id': _SAMPLE_OID}, None),
+
+    ('voice_presets.list', 'voice_presets',
+     {'user_id': _SAMPLE_OID}, [('name', ASCENDING)]),
+    ('voice_presets.by_name', 'voice_presets',
+     {'user_id': _SAMPLE_OID, 'name': 'x'}, None),
+    ('voice_presets.name_taken', 'voice_presets',
+     {'user_id': _SAMPLE_OID, 'name': 'x', '_id': {'$ne': _SAMPLE_OID}}, None),
+    ('voice_presets.owned', 'voice_presets',
+     {'_id': _SAMPLE_OID, 'user_id': _SAMPLE_OID}, None),
+    ('voice_presets.by_id', 'voice_presets', {'_id': _SAMPLE_OID}, None),
+]
+
+
+def _plan_stages(plan):
+    """Yield every stage name in an explain() plan tree."""
+    if not isinstance(plan, dict):
+        return
+    if 'stage' in plan:
+        yield plan['stage']
+    for key in ('inputStage', 'queryPlan'):
+        if key in plan:
+            yield from _plan_stages(plan[key])
+    for child in plan.get('inputStages', []):
+        yield from _plan_stages(child)
+
+
+def explain_query_shapes():
+    """Run explain() on every registered query shape.
+
+    Returns a list of (name, stages) tuples, where stages is the list of
+    stage names in the winning plan (e.g. ['FETCH', 'IXSCAN']).
+    """
+    db = get_db()
+    results = []
+    for name, collection, query, sort in QUERY_SHAPES:
+        cursor = db[collection].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        plan = cursor.explain().get('queryPlanner', {}).get('winningPlan', {})
+        results.append((name, list(_plan_stages(plan))))
+    return results
+
+
 def utcnow():
     """Return current UTC time."""
     return datetime.now(timezone.utc)
@@ -5,31 +5,54 @@ Run once locally to create static WAV files in static/samples/.
 The files are committed to the repo and served directly — zero ongoing
 API cost.
 
+Each WAV is also encoded to a compact Ogg/Opus preview (~25× smaller)
+when ffmpeg is on PATH, and static/samples/manifest.json records the
+duration and size of every variant.  The UI prefers the Opus preview and
+falls back to the WAV.
+
+The manifest also records a fingerprint of SAMPLE_TEXT, voice, rate,
+pitch and engine for every sample, so only missing, placeholder or stale
+samples are regenerated.  Voices are generated concurrently, paced per
+category by CATEGORY_RATE_LIMITS, and the manifest is saved after every
+sample — an interrupted run simply resumes where it stopped.
+
 Usage:
-    python scripts/generate_samples.py              # generate all missing
+    python scripts/generate_samples.py              # generate missing/stale/placeholder
     python scripts/generate_samples.py --force      # regenerate everything
+    python scripts/generate_samples.py --workers 16 --rpm gemini=3  # tune concurrency / pacing
     python scripts/generate_samples.py --voice Zephyr  # one specific voice
     python scripts/generate_samples.py --category gemini  # one category
-    python scripts/generate_samples.py --replace-placeholders  # replace short placeholder WAVs
     python scripts/generate_samples.py --status      # show which samples are real vs placeholder
+    python scripts/generate_samples.py --previews    # (re)encode Opus previews + manifest, no API calls
 
-Requires GOOGLE_API_KEY (Cloud TTS) and/or GEMINI_API_KEY environment variables.
+Requires GOOGLE_API_KEY (Cloud TTS) and/or GEMINI_API_KEY environment variables
+(either may be a comma-separated list of keys to spread the quota).
 """
 
 import argparse
+import hashlib
+import json
 import math
 import os
+import shutil
 import struct
+import subprocess
 import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # Allow importing from project root
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
-from voice_registry import VOICES, get_voice_engine, get_chunk_delay
+from voice_registry import (
+    VOICES, CATEGORY_RATE_LIMITS, get_voice_engine, get_voice_category,
+    get_chunk_delay,
+)
 from services.tts_client import TTSClient
 from services.ssml_builder import SSMLBuilder
 from services.gemini_tts_client import GeminiTTSClient
+from services.credential_pool import CredentialPool
 
 # ── Configuration ───────────────────────────────────────────────
 
@@ -50,11 +73,30 @@ CLOUD_TTS_PITCH = -2.0
 # Real samples are typically 600-800 KB; placeholders are ~47 KB
 PLACEHOLDER_SIZE_THRESHOLD = 100_000  # bytes
 
+# Compressed preview settings (Opus is tuned for speech at low bitrates)
+PREVIEW_BITRATE = '24k'
+MANIFEST_PATH = os.path.join(SAMPLES_DIR, 'manifest.json')
+
+# Concurrency and retry policy
+DEFAULT_WORKERS = 8
+MAX_ATTEMPTS = 3
+RATE_LIMIT_BACKOFF = 30.0  # seconds, multiplied by the attempt number
+
+# Shared by every worker thread so quota accounting and quarantine stick
+CREDENTIALS = {
+    'cloud_tts': CredentialPool.from_env('GOOGLE_API_KEY', CATEGORY_RATE_LIMITS),
+    'gemini': CredentialPool.from_env('GEMINI_API_KEY', CATEGORY_RATE_LIMITS),
+}
+
 
 def sample_path(api_name: str) -> str:
     return os.path.join(SAMPLES_DIR, f'{api_name}.wav')
 
 
+def preview_path(api_name: str) -> str:
+    return os.path.join(SAMPLES_DIR, f'{api_name}.ogg')
+
+
 def is_placeholder(path: str) -> bool:
     """Check if a sample file is a placeholder (short tone) vs real audio."""
     if not os.path.exists(path):
@@ -89,6 +131,197 @@ def create_placeholder_wav(path: str, duration_sec: float = 1.0,
     return data_size + 44
 
 
+def wav_duration(path: str) -> float:
+    """Return the duration of a WAV file in seconds (0.0 if unreadable)."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if len(data) < 44 or data[:4] != b'RIFF':
+        return 0.0
+    byte_rate = struct.unpack_from('<I', data, 28)[0]
+    pos = 12
+    while byte_rate and pos + 8 <= len(data):
+        chunk_id = data[pos:pos + 4]
+        chunk_size = struct.unpack_from('<I', data, pos + 4)[0]
+        if chunk_id == b'data':
+            return chunk_size / byte_rate
+        pos += 8 + chunk_size + (chunk_size % 2)
+    return 0.0
+
+
+def encode_preview(api_name: str) -> int:
+    """Encode the voice's WAV sample to an Ogg/Opus preview with ffmpeg.
+
+    Returns the preview size in bytes, or 0 if ffmpeg is not installed.
+    """
+    ffmpeg = shutil.which('ffmpeg')
+    if not ffmpeg:
+        return 0
+    subprocess.run(
+        [
+            ffmpeg, '-y', '-loglevel', 'error',
+            '-i', sample_path(api_name),
+            '-ac', '1', '-c:a', 'libopus', '-b:a', PREVIEW_BITRATE,
+            '-application', 'voip',
+            preview_path(api_name),
+        ],
+        check=True,
+    )
+    return os.path.getsize(preview_path(api_name))
+
+
+# ── Manifest ────────────────────────────────────────────────────
+
+def load_manifest() -> dict:
+    """Load manifest.json, or return an empty manifest."""
+    try:
+        with open(MANIFEST_PATH) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+    manifest.setdefault('voices', {})
+    return manifest
+
+
+def save_manifest(manifest: dict):
+    """Write manifest.json atomically so an interrupted run never corrupts it."""
+    tmp_path = MANIFEST_PATH + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+        f.write('\n')
+    os.replace(tmp_path, MANIFEST_PATH)
+
+
+def record_sample(manifest: dict, api_name: str, fingerprint: str = None,
+                  placeholder: bool = False):
+    """Refresh a voice's manifest entry from the files on disk.
+
+    The existing fingerprint is kept unless a new one is given; placeholders
+    never carry a fingerprint, so they always count as stale.
+    """
+    wav = sample_path(api_name)
+    old = manifest['voices'].get(api_name, {})
+    entry = {
+        'duration_seconds': round(wav_duration(wav), 2),
+        'wav_bytes': os.path.getsize(wav),
+    }
+    ogg = preview_path(api_name)
+    if os.path.exists(ogg):
+        entry['ogg_bytes'] = os.path.getsize(ogg)
+    if placeholder:
+        entry['placeholder'] = True
+    elif fingerprint or old.get('fingerprint'):
+        entry['fingerprint'] = fingerprint or old['fingerprint']
+    manifest['voices'][api_name] = entry
+
+
+def sample_settings(api_name: str) -> dict:
+    """Return the engine and rate/pitch a sample is generated with."""
+    engine = get_voice_engine(api_name)
+    if engine == 'gemini' or api_name.startswith('en-US-Chirp-HD-'):
+        # Gemini and Chirp-HD take plain text with no rate/pitch
+        return {'engine': engine, 'rate': None, 'pitch': None}
+    # Chirp3-HD voices support speed but not pitch
+    pitch = 0.0 if _is_chirp_voice(api_name) else CLOUD_TTS_PITCH
+    return {'engine': engine, 'rate': CLOUD_TTS_RATE, 'pitch': pitch}
+
+
+def sample_fingerprint(api_name: str) -> str:
+    """Hash everything that determines a sample's audio content."""
+    payload = json.dumps(
+        {'text': SAMPLE_TEXT, 'voice': api_name, **sample_settings(api_name)},
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+
+def stale_reason(voice: dict, manifest: dict):
+    """Return why a voice's sample needs regenerating, or None if current."""
+    api_name = voice['api_name']
+    if not os.path.exists(sample_path(api_name)):
+        return 'missing'
+    entry = manifest['voices'].get(api_name, {})
+    if entry.get('placeholder') or is_placeholder(sample_path(api_name)):
+        return 'placeholder'
+    if entry.get('fingerprint') != sample_fingerprint(api_name):
+        return 'stale'
+    return None
+
+
+def adopt_existing(voices: list, manifest: dict) -> int:
+    """Fingerprint real samples that predate the manifest instead of
+    regenerating them.  Returns the number of samples adopted."""
+    adopted = 0
+    for voice in voices:
+        api_name = voice['api_name']
+        path = sample_path(api_name)
+        entry = manifest['voices'].get(api_name, {})
+        if ('fingerprint' not in entry and not entry.get('placeholder')
+                and os.path.exists(path) and not is_placeholder(path)):
+            record_sample(manifest, api_name, sample_fingerprint(api_name))
+            adopted += 1
+    return adopted
+
+
+def encode_all_previews(voices: list, manifest: dict):
+    """Encode Opus previews for existing WAVs, without any API calls."""
+    if not shutil.which('ffmpeg'):
+        print('ffmpeg not found on PATH — skipping Opus previews.')
+    for voice in voices:
+        api_name = voice['api_name']
+        if not os.path.exists(sample_path(api_name)):
+            continue
+        size = encode_preview(api_name)
+        if size:
+            print(f"  OPUS  {voice['display_name']} ({size / 1024:.0f} KB)")
+        record_sample(manifest, api_name,
+                      placeholder=is_placeholder(sample_path(api_name)))
+
+
+# ── Rate limiting ───────────────────────────────────────────────
+
+class RateLimiter:
+    """Space calls evenly so at most `rpm` start per minute (thread-safe)."""
+
+    def __init__(self, rpm: float):
+        self.interval = 60.0 / rpm
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def build_limiters(overrides: dict) -> dict:
+    """One limiter per voice category, at the app's safe share of quota
+    (see get_chunk_delay) times the number of API keys, unless overridden
+    with --rpm CATEGORY=N."""
+    limiters = {}
+    for category in CATEGORY_RATE_LIMITS:
+        if category in overrides:
+            rpm = overrides[category]
+        else:
+            sample_voice = next(v for v in VOICES if v['category'] == category)
+            keys = max(1, len(CREDENTIALS[get_voice_engine(sample_voice['api_name'])]))
+            rpm = 60.0 / get_chunk_delay(sample_voice['api_name']) * keys
+        limiters[category] = RateLimiter(rpm)
+    return limiters
+
+
+def parse_rpm_overrides(values: list) -> dict:
+    overrides = {}
+    for value in values or []:
+        category, _, rpm = value.partition('=')
+        if category not in CATEGORY_RATE_LIMITS or not rpm:
+            raise SystemExit(f'Invalid --rpm value: {value!r} (use CATEGORY=N)')
+        overrides[category] = float(rpm)
+    return overrides
+
+
 def _is_chirp_voice(api_name: str) -> bool:
     """Chirp-HD and Chirp3-HD voices don't support pitch adjustment."""
     return 'Chirp' in api_name
@@ -103,16 +336,18 @@ def generate_cloud_tts_sample(voice: dict) -> bytes:
     """
     api_name = voice['api_name']
     delay = get_chunk_delay(api_name)
-    is_chirp = _is_chirp_voice(api_name)
+    settings = sample_settings(api_name)
 
     # Chirp-HD (non-3) voices reject SSML and speed/pitch entirely —
     # use the REST API directly with plain text.
     if api_name.startswith('en-US-Chirp-HD-'):
         import base64
         import requests
+        credentials = CREDENTIALS['cloud_tts']
+        api_key = credentials.acquire(voice['category'])
         resp = requests.post(
             'https://texttospeech.googleapis.com/v1/text:synthesize',
-            params={'key': os.environ.get('GOOGLE_API_KEY', '')},
+            params={'key': api_key},
             json={
                 'input': {'text': SAMPLE_TEXT},
                 'voice': {'languageCode': 'en-US', 'name': api_name},
@@ -124,17 +359,17 @@ def generate_cloud_tts_sample(voice: dict) -> bytes:
         )
         if not resp.ok:
             err = resp.json().get('error', {}).get('message', resp.text)
+            credentials.report(api_key, voice['category'], resp.status_code, err)
             raise RuntimeError(f'TTS error ({resp.status_code}): {err}')
         return base64.b64decode(resp.json()['audioContent'])
 
-    # Chirp3-HD voices support speed but not pitch
-    pitch = 0.0 if is_chirp else CLOUD_TTS_PITCH
-
     client = TTSClient(
         voice_name=api_name,
-        speaking_rate=CLOUD_TTS_RATE,
-        pitch=pitch,
+        speaking_rate=settings['rate'],
+        pitch=settings['pitch'],
         chunk_delay=delay,
+        credentials=CREDENTIALS['cloud_tts'],
+        category=voice['category'],
     )
     builder = SSMLBuilder()
     ssml = builder.build(SAMPLE_TEXT)
@@ -147,6 +382,8 @@ def generate_gemini_sample(voice: dict) -> bytes:
     client = GeminiTTSClient(
         voice_name=voice['api_name'],
         chunk_delay=delay,
+        credentials=CREDENTIALS['gemini'],
+        category=voice['category'],
     )
     return client.synthesize_chunk(SAMPLE_TEXT)
 
@@ -159,25 +396,54 @@ def generate_sample(voice: dict) -> bytes:
     return generate_cloud_tts_sample(voice)
 
 
+def generate_with_retry(voice: dict, limiter: RateLimiter) -> bytes:
+    """Generate one sample, backing off and retrying on rate-limit errors."""
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        limiter.wait()
+        try:
+            return generate_sample(voice)
+        except Exception as e:
+            if '429' not in str(e) or attempt == MAX_ATTEMPTS:
+                raise
+            time.sleep(RATE_LIMIT_BACKOFF * attempt)
+
+
+def write_sample(api_name: str, wav_data: bytes):
+    """Write a WAV atomically so an interrupted run leaves no partial file."""
+    path = sample_path(api_name)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(wav_data)
+    os.replace(tmp_path, path)
+
+
 def show_status():
     """Print a summary of real vs placeholder vs missing samples."""
-    real, placeholder, missing = [], [], []
+    manifest = load_manifest()
+    real, placeholder, missing, stale = [], [], [], []
     for v in VOICES:
-        path = sample_path(v['api_name'])
-        if os.path.exists(path):
-            if is_placeholder(path):
-                placeholder.append(v)
-            else:
-                real.append(v)
-        else:
+        reason = stale_reason(v, manifest)
+        if reason == 'missing':
             missing.append(v)
+        elif reason == 'placeholder':
+            placeholder.append(v)
+        else:
+            real.append(v)
+            if reason == 'stale':
+                stale.append(v)
 
     print(f'=== Sample Status ===')
     print(f'  Real samples:        {len(real)}')
+    print(f'    of which stale:    {len(stale)}')
     print(f'  Placeholder samples: {len(placeholder)}')
     print(f'  Missing:             {len(missing)}')
     print()
 
+    if stale:
+        print('Stale voices (settings or SAMPLE_TEXT changed):')
+        print(f'  {", ".join(v["api_name"] for v in stale)}')
+        print()
+
     if placeholder:
         cats = {}
         for v in placeholder:
@@ -203,7 +469,16 @@ def main():
     )
     parser.add_argument(
         '--replace-placeholders', action='store_true',
-        help='Replace placeholder WAVs with real samples',
+        help='Deprecated: placeholders are now always regenerated',
+    )
+    parser.add_argument(
+        '--workers', type=int, default=DEFAULT_WORKERS,
+        help=f'Concurrent requests (default {DEFAULT_WORKERS})',
+    )
+    parser.add_argument(
+        '--rpm', action='append', metavar='CATEGORY=N',
+        help='Override the requests-per-minute pacing for a category '
+             '(e.g. gemini=3 for a free-tier key)',
     )
     parser.add_argument(
         '--voice',
@@ -217,6 +492,10 @@ def main():
         '--status', action='store_true',
         help='Show sample status and exit',
     )
+    parser.add_argument(
+        '--previews', action='store_true',
+        help='Only (re)encode Opus previews and the manifest from existing WAVs',
+    )
     args = parser.parse_args()
 
     if args.status:
@@ -242,58 +521,65 @@ def main():
             print(f'No voices in category: {args.category}')
             sys.exit(1)
 
-    total = len(voices)
+    manifest = load_manifest()
+
+    if args.previews:
+        encode_all_previews(voices, manifest)
+        save_manifest(manifest)
+        print(f"Manifest: {len(manifest['voices'])} voices -> {os.path.abspath(MANIFEST_PATH)}")
+        return
+
+    limiters = build_limiters(parse_rpm_overrides(args.rpm))
+
+    if not args.force:
+        adopted = adopt_existing(voices, manifest)
+        if adopted:
+            save_manifest(manifest)
+            print(f'Fingerprinted {adopted} existing samples (use --force to regenerate them)')
+
+    todo = []
+    for voice in voices:
+        reason = 'forced' if args.force else stale_reason(voice, manifest)
+        if reason:
+            todo.append((voice, reason))
+
+    total = len(todo)
+    skipped = len(voices) - total
     generated = 0
-    skipped = 0
-    failed = 0
     failed_voices = []
+    lock = threading.Lock()
 
-    print(f'Generating samples for {total} voices...')
+    print(f'Generating {total} of {len(voices)} samples with {args.workers} workers...')
     print(f'Output: {os.path.abspath(SAMPLES_DIR)}')
     print()
 
-    for i, voice in enumerate(voices, 1):
-        path = sample_path(voice['api_name'])
-        label = f"[{i}/{total}] {voice['display_name']} ({voice['api_name']})"
-
-        # Skip logic
-        if os.path.exists(path) and not args.force:
-            if args.replace_placeholders and is_placeholder(path):
-                pass  # Will regenerate below
-            else:
-                print(f'  SKIP  {label} — already exists')
-                skipped += 1
+    def run(voice, reason):
+        api_name = voice['api_name']
+        limiter = limiters[get_voice_category(api_name)]
+        wav_data = generate_with_retry(voice, limiter)
+        write_sample(api_name, wav_data)
+        preview_size = encode_preview(api_name)
+        with lock:
+            record_sample(manifest, api_name, sample_fingerprint(api_name))
+            save_manifest(manifest)
+        return reason, len(wav_data), preview_size
+
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as pool:
+        futures = {pool.submit(run, voice, reason): voice for voice, reason in todo}
+        for done, future in enumerate(as_completed(futures), 1):
+            voice = futures[future]
+            label = f"[{done}/{total}] {voice['display_name']} ({voice['api_name']})"
+            try:
+                reason, size, preview_size = future.result()
+            except Exception as e:
+                print(f'  FAIL  {label}: {str(e)[:100]}')
+                failed_voices.append(voice)
                 continue
-
-        try:
-            print(f'  GEN   {label}...', end='', flush=True)
-            wav_data = generate_sample(voice)
-
-            with open(path, 'wb') as f:
-                f.write(wav_data)
-
-            size_kb = len(wav_data) / 1024
-            print(f' OK ({size_kb:.0f} KB)')
             generated += 1
-
-            # Rate limiting between voices to avoid quota issues
-            if i < total:
-                engine = get_voice_engine(voice['api_name'])
-                # Gemini free tier: 3 RPM → 21s between calls
-                # Cloud TTS: much higher limits → 0.3s between calls
-                delay = 21.0 if engine == 'gemini' else 0.3
-                time.sleep(delay)
-
-        except Exception as e:
-            err_str = str(e)
-            print(f' FAILED: {err_str[:100]}')
-            failed += 1
-            failed_voices.append(voice)
-
-            # On rate limit errors, wait longer before continuing
-            if '429' in err_str:
-                print('    Rate limited — waiting 60s...', flush=True)
-                time.sleep(60)
+            if preview_size:
+                print(f'  GEN   {label} [{reason}] OK ({size / 1024:.0f} KB, opus {preview_size / 1024:.0f} KB)')
+            else:
+                print(f'  GEN   {label} [{reason}] OK ({size / 1024:.0f} KB)')
 
     # Create placeholders for any failures (so the app doesn't break)
     if failed_voices:
@@ -303,15 +589,16 @@ def main():
             path = sample_path(voice['api_name'])
             if not os.path.exists(path):
                 create_placeholder_wav(path)
+                record_sample(manifest, voice['api_name'], placeholder=True)
                 print(f'  PLACEHOLDER  {voice["display_name"]}')
+        save_manifest(manifest)
 
     print()
-    print(f'Done: {generated} generated, {skipped} skipped, {failed} failed')
+    print(f'Done: {generated} generated, {skipped} up to date, {len(failed_voices)} failed')
     if failed_voices:
         print(f'Failed voices: {[v["api_name"] for v in failed_voices]}')
         print()
-        print('To regenerate failed voices later:')
-        print('  python scripts/generate_samples.py --replace-placeholders')
+        print('Re-run the script to retry them; completed samples are not regenerated.')
 
 
 if __name__ == '__main__':
@@ -0,0 +1,51 @@
+import logging
+import os
+import shutil
+import subprocess
+
+logger = logging.getLogger(__name__)
+
+
+class AudioEncoder:
+    """Transcode a finished WAV file into a compact library format.
+
+    Uses ffmpeg when it is installed (it is optional, as for the sample
+    previews in scripts/generate_samples.py).  ffmpeg reads the source file
+    and writes the result incrementally, so encoding never holds the whole
+    narration in memory.
+    """
+
+    # format name -> (ffmpeg codec arguments, container)
+    CODECS = {
+        'flac': (['-c:a', 'flac', '-compression_level', '8'], 'flac'),
+        'adpcm': (['-c:a', 'adpcm_ima_wav'], 'wav'),
+        'ogg': (['-c:a', 'libopus', '-b:a', '32k', '-application', 'voip'], 'ogg'),
+        'mp3': (['-c:a', 'libmp3lame', '-b:a', '64k'], 'mp3'),
+    }
+    TIMEOUT_SECONDS = 1800
+
+    def __init__(self, ffmpeg=None):
+        self.ffmpeg = ffmpeg or shutil.which('ffmpeg')
+
+    def can_encode(self, format_name):
+        return bool(self.ffmpeg) and format_name in self.CODECS
+
+    def encode(self, src_path, dest_path, format_name):
+        """Encode `src_path` (WAV) to `dest_path`; the destination appears atomically."""
+        codec_args, container = self.CODECS[format_name]
+        tmp_path = dest_path + '.tmp'
+        try:
+            subprocess.run(
+                [self.ffmpeg, '-nostdin', '-loglevel', 'error', '-y',
+                 '-i', src_path, *codec_args, '-f', container, tmp_path],
+                check=True, capture_output=True, timeout=self.TIMEOUT_SECONDS,
+            )
+        except subprocess.CalledProcessError as e:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise RuntimeError(f'ffmpeg failed: {e.stderr.decode(errors="replace").strip()}')
+        except subprocess.TimeoutExpired:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise RuntimeError('ffmpeg timed out')
+        os.replace(tmp_path, dest_path)
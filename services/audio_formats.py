@@ -0,0 +1,306 @@
+import io
+import struct
+from collections import namedtuple
+
+from services.wav_concatenator import WavConcatenator
+
+# cloud_encoding: Cloud TTS audioEncoding, or None when only our own
+# encoder (services/audio_encoder.py) can produce the format
+AudioFormat = namedtuple('AudioFormat', 'name cloud_encoding mimetype extension')
+
+AUDIO_FORMATS = {
+    'wav': AudioFormat('wav', 'LINEAR16', 'audio/wav', 'wav'),
+    'mp3': AudioFormat('mp3', 'MP3', 'audio/mpeg', 'mp3'),
+    'ogg': AudioFormat('ogg', 'OGG_OPUS', 'audio/ogg', 'ogg'),
+    'flac': AudioFormat('flac', None, 'audio/flac', 'flac'),
+    'adpcm': AudioFormat('adpcm', None, 'audio/wav', 'wav'),  # IMA ADPCM in WAV
+}
+
+_MIMETYPES_BY_EXTENSION = {}
+for _fmt in AUDIO_FORMATS.values():
+    _MIMETYPES_BY_EXTENSION.setdefault(_fmt.extension, _fmt.mimetype)
+
+
+def mimetype_for_filename(filename):
+    """Return the audio mimetype for a stored file, by extension."""
+    ext = filename.rsplit('.', 1)[-1].lower()
+    return _MIMETYPES_BY_EXTENSION.get(ext, 'application/octet-stream')
+
+
+# ── Ogg Opus ────────────────────────────────────────────────────
+
+def _make_ogg_crc_table():
+    table = []
+    for i in range(256):
+        r = i << 24
+        for _ in range(8):
+            r = ((r << 1) ^ 0x04C11DB7) if r & 0x80000000 else (r << 1)
+        table.append(r & 0xFFFFFFFF)
+    return table
+
+
+_OGG_CRC_TABLE = _make_ogg_crc_table()
+_OGG_HEADER = struct.Struct('<4sBBqIIIB')   # capture .. segment count (27 bytes)
+_OGG_BOS, _OGG_EOS = 0x02, 0x04
+_OGG_NO_GRANULE = -1
+
+
+def _ogg_crc(data):
+    crc = 0
+    table = _OGG_CRC_TABLE
+    for byte in data:
+        crc = ((crc << 8) & 0xFFFFFFFF) ^ table[((crc >> 24) ^ byte) & 0xFF]
+    return crc
+
+
+def _ogg_pages(data):
+    """Yield (header_type, granule, lacing, body) for each Ogg page."""
+    pos = 0
+    while pos + _OGG_HEADER.size <= len(data):
+        capture, _version, header_type, granule, _serial, _seq, _crc, nsegs = \
+            _OGG_HEADER.unpack_from(data, pos)
+        if capture != b'OggS':
+            raise ValueError(f'Invalid Ogg page at byte {pos}')
+        lacing = data[pos + 27:pos + 27 + nsegs]
+        body_start = pos + 27 + nsegs
+        body_end = body_start + sum(lacing)
+        yield header_type, granule, lacing, data[body_start:body_end]
+        pos = body_end
+
+
+def _ogg_page(header_type, granule, serial, seq, lacing, body):
+    page = bytearray(_OGG_HEADER.pack(b'OggS', 0, header_type, granule, serial, seq, 0, len(lacing)))
+    page += lacing
+    page += body
+    struct.pack_into('<I', page, 22, _ogg_crc(page))
+    return page
+
+
+# Opus frame length in 48 kHz samples for each TOC config (RFC 6716 §3.1)
+_OPUS_FRAME_SAMPLES = (
+    (480, 960, 1920, 2880) * 3      # SILK-only, configs 0-11
+    + (480, 960) * 2                # hybrid, 12-15
+    + (120, 240, 480, 960) * 4      # CELT-only, 16-31
+)
+
+
+def _opus_packet_samples(packet):
+    toc = packet[0]
+    code = toc & 3
+    frames = 1 if code == 0 else 2 if code < 3 else packet[1] & 0x3F
+    return frames * _OPUS_FRAME_SAMPLES[toc >> 3]
+
+
+def _opus_layout(data):
+    """Return (pre_skip, decoded samples, final granule) of an Ogg Opus file.
+
+    Decoded samples count every sample the audio packets produce, before
+    the pre-skip is dropped or the final page's granule trims the end.
+    """
+    pre_skip, decoded, final = 0, 0, 0
+    packet, packet_no = bytearray(), 0
+    for _header_type, granule, lacing, body in _ogg_pages(data):
+        pos = 0
+        for size in lacing:
+            packet += body[pos:pos + size]
+            pos += size
+            if size == 255:
+                continue   # packet continues in the next lacing value
+            if packet_no == 0 and packet[:8] == b'OpusHead':
+                pre_skip = struct.unpack_from('<H', packet, 10)[0]
+            elif packet_no >= 2 and packet:
+                decoded += _opus_packet_samples(packet)
+            packet, packet_no = bytearray(), packet_no + 1
+        if granule != _OGG_NO_GRANULE:
+            final = granule
+    return pre_skip, decoded, final
+
+
+class OggOpusConcatenator:
+    """Join Ogg Opus files from Cloud TTS into one logical stream.
+
+    Plain byte concatenation would produce a chained Ogg file, which many
+    browsers stop playing after the first link.  Instead every page is
+    re-stamped with the first file's serial number and a running page
+    sequence, granule positions continue across segments, and the
+    OpusHead/OpusTags headers of later segments are dropped.
+
+    Only the first OpusHead's pre-skip is applied by the decoder; a later
+    segment's priming samples and its end padding are decoded like any
+    other audio.  Granule positions therefore continue from the number of
+    samples the earlier segments decode to, not from their own (trimmed)
+    final granules, or every splice would shift the timestamps after it.
+    """
+
+    def concatenate(self, segments: list) -> bytes:
+        if not segments:
+            raise ValueError("No Ogg segments to concatenate")
+        if len(segments) == 1:
+            return segments[0]
+
+        serial = struct.unpack_from('<I', segments[0], 14)[0]
+        out = bytearray()
+        seq = 0
+        base_granule = 0
+        last_page_at = None
+
+        for i, seg in enumerate(segments):
+            if seg[:4] != b'OggS':
+                raise ValueError(f"Segment {i} is not an Ogg file")
+            _pre_skip, decoded, final = _opus_layout(seg)
+            packets_seen = 0
+            for header_type, granule, lacing, body in _ogg_pages(seg):
+                in_headers = packets_seen < 2   # OpusHead, then OpusTags
+                packets_seen += sum(1 for v in lacing if v < 255)
+                if i > 0 and in_headers:
+                    continue
+                header_type &= ~_OGG_EOS
+                if i > 0:
+                    header_type &= ~_OGG_BOS
+                if granule != _OGG_NO_GRANULE:
+                    if granule == final and i + 1 < len(segments):
+                        granule = decoded   # end trimming is only valid at EOS
+                    granule += base_granule
+                last_page_at = len(out)
+                out += _ogg_page(header_type, granule, serial, seq, lacing, body)
+                seq += 1
+            base_granule += decoded
+
+        if last_page_at is None:
+            raise ValueError("All segments were empty after parsing")
+        # Mark the end of the (single) logical stream
+        out[last_page_at + 5] |= _OGG_EOS
+        struct.pack_into('<I', out, last_page_at + 22, 0)
+        end = len(out)
+        struct.pack_into('<I', out, last_page_at + 22, _ogg_crc(out[last_page_at:end]))
+        return bytes(out)
+
+    @staticmethod
+    def joined_durations(segments: list) -> list:
+        """Seconds each segment spans in the stream `concatenate` builds.
+
+        A later segment's pre-skip is subtracted from its own span and
+        added to the one before it, so each span starts where that
+        segment's speech does rather than at its priming samples.  The
+        spans add up to the joined file's duration.
+        """
+        layouts = [_opus_layout(seg) for seg in segments]
+        spans = []
+        for i, (pre_skip, decoded, final) in enumerate(layouts):
+            if i + 1 < len(layouts):
+                samples = decoded - pre_skip + layouts[i + 1][0]
+            else:
+                samples = final - pre_skip
+            spans.append(max(0, samples) / 48000)
+        return spans
+
+    def write(self, segments: list, f):
+        f.write(self.concatenate(segments))
+
+    @staticmethod
+    def duration_seconds(data: bytes) -> float:
+        """Final granule position minus the encoder pre-skip, at 48 kHz."""
+        pre_skip, final = None, 0
+        for _header_type, granule, _lacing, body in _ogg_pages(data):
+            if pre_skip is None and body[:8] == b'OpusHead':
+                pre_skip = struct.unpack_from('<H', body, 10)[0]
+            if granule != _OGG_NO_GRANULE:
+                final = granule
+        return max(0, final - (pre_skip or 0)) / 48000
+
+
+# ── MP3 ─────────────────────────────────────────────────────────
+
+_MP3_BITRATES = {  # kbps for Layer III, by MPEG version
+    'mpeg1': (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    'mpeg2': (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+_MP3_SAMPLE_RATES = {
+    3: (44100, 48000, 32000),   # MPEG-1
+    2: (22050, 24000, 16000),   # MPEG-2
+    0: (11025, 12000, 8000),    # MPEG-2.5
+}
+
+
+def _mp3_frame(data, pos):
+    """Return (frame_length, samples, sample_rate) for the frame at `pos`, or None."""
+    if pos + 4 > len(data):
+        return None
+    h = struct.unpack_from('>I', data, pos)[0]
+    version, layer = (h >> 19) & 3, (h >> 17) & 3
+    bitrate_idx, sr_idx, padding = (h >> 12) & 0xF, (h >> 10) & 3, (h >> 9) & 1
+    if (h >> 21) != 0x7FF or version == 1 or layer != 1 or bitrate_idx in (0, 15) or sr_idx == 3:
+        return None
+    sample_rate = _MP3_SAMPLE_RATES[version][sr_idx]
+    if version == 3:
+        bitrate = _MP3_BITRATES['mpeg1'][bitrate_idx] * 1000
+        return 144 * bitrate // sample_rate + padding, 1152, sample_rate
+    bitrate = _MP3_BITRATES['mpeg2'][bitrate_idx] * 1000
+    return 72 * bitrate // sample_rate + padding, 576, sample_rate
+
+
+def _mp3_audio(data):
+    """Strip ID3 tags and any Xing/Info/VBRI header frame; return bare frames."""
+    start, end = 0, len(data)
+    if data[:3] == b'ID3' and len(data) >= 10:
+        size = 0
+        for b in data[6:10]:
+            size = (size << 7) | (b & 0x7F)
+        start = 10 + size + (10 if data[5] & 0x10 else 0)
+    if end - start >= 128 and data[end - 128:end - 125] == b'TAG':
+        end -= 128
+    frame = _mp3_frame(data, start)
+    if frame and any(tag in data[start:start + frame[0]] for tag in (b'Xing', b'Info', b'VBRI')):
+        # Describes only this segment's length; wrong once segments are joined
+        start += frame[0]
+    return data[start:end]
+
+
+class Mp3Concatenator:
+    """Join MP3 segments frame-to-frame.
+
+    MP3 frames are self-contained, so segments join by concatenation once
+    the per-file ID3 tags and VBR header frames are removed.
+    """
+
+    def concatenate(self, segments: list) -> bytes:
+        if not segments:
+            raise ValueError("No MP3 segments to concatenate")
+        if len(segments) == 1:
+            return segments[0]
+        out = io.BytesIO()
+        for i, seg in enumerate(segments):
+            audio = _mp3_audio(seg)
+            if not _mp3_frame(audio, 0):
+                raise ValueError(f"Segment {i} does not start with an MP3 frame")
+            out.write(audio)
+        return out.getvalue()
+
+    def write(self, segments: list, f):
+        f.write(self.concatenate(segments))
+
+    @classmethod
+    def joined_durations(cls, segments: list) -> list:
+        """Seconds each segment spans once joined; frames are kept whole."""
+        return [cls.duration_seconds(seg) for seg in segments]
+
+    @staticmethod
+    def duration_seconds(data: bytes) -> float:
+        audio = _mp3_audio(data)
+        pos, seconds = 0, 0.0
+        while True:
+            frame = _mp3_frame(audio, pos)
+            if not frame or frame[0] <= 0:
+                break
+            length, samples, sample_rate = frame
+            seconds += samples / sample_rate
+            pos += length
+        return seconds
+
+
+def get_concatenator(format_name):
+    """Return a concatenator for segments in `format_name`."""
+    return {
+        'mp3': Mp3Concatenator,
+        'ogg': OggOpusConcatenator,
+    }.get(format_name, WavConcatenator)()
@@ -0,0 +1,304 @@
+import datetime
+import hashlib
+import hmac
+import logging
+import os
+import re
+from contextlib import contextmanager
+from urllib.parse import quote, urlsplit
+from xml.sax.saxutils import escape
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+READ_BLOCK = 256 * 1024
+
+
+class StorageError(Exception):
+    """An audio storage backend failed to read or write an object."""
+
+
+def storage_key(user_id, filename):
+    """Key of a user's stored file, the same for every backend."""
+    return f'{user_id}/{filename}'
+
+
+class LocalAudioStorage:
+    """Audio files under one directory: AUDIO_DIR/<user_id>/<filename>."""
+
+    def __init__(self, root):
+        self.root = root
+
+    def local_path(self, key):
+        """Filesystem path of `key`, for callers that can use one directly."""
+        return os.path.join(self.root, *key.split('/'))
+
+    def exists(self, key):
+        return os.path.exists(self.local_path(key))
+
+    def size(self, key):
+        try:
+            return os.path.getsize(self.local_path(key))
+        except OSError:
+            return None
+
+    @contextmanager
+    def writer(self, key):
+        """Yield a file to write `key` into; it appears when the block exits."""
+        path = self.local_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + '.tmp'
+        try:
+            with open(tmp_path, 'wb') as f:
+                yield f
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def put_file(self, key, src_path):
+        """Move a finished local file into storage."""
+        path = self.local_path(key)
+        if os.path.abspath(src_path) != os.path.abspath(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(src_path, path)
+
+    def iter_range(self, key, start=0, length=None):
+        """Yield the bytes of `key` from `start`, `length` bytes or to the end."""
+        with open(self.local_path(key), 'rb') as f:
+            f.seek(start)
+            remaining = length
+            while remaining is None or remaining > 0:
+                block = f.read(READ_BLOCK if remaining is None else min(READ_BLOCK, remaining))
+                if not block:
+                    break
+                if remaining is not None:
+                    remaining -= len(block)
+                yield block
+
+    def read_bytes(self, key, start=0, length=None):
+        return b''.join(self.iter_range(key, start, length))
+
+    def delete(self, key):
+        try:
+            os.remove(self.local_path(key))
+        except FileNotFoundError:
+            pass
+
+
+class S3AudioStorage:
+    """Audio files in an S3-compatible bucket (AWS S3, MinIO, R2, ...).
+
+    Talks to the S3 REST API with `requests` and AWS Signature V4, using
+    path-style URLs so any endpoint works.  Writers upload a multipart part
+    whenever PART_SIZE bytes have accumulated, so a job's audio is sent
+    while it is being written and at most one part is held in memory.
+    Reads are ranged GETs streamed in READ_BLOCK pieces.
+    """
+
+    PART_SIZE = 8 * 1024 * 1024   # S3 requires at least 5 MB per part
+    TIMEOUT_SECONDS = 60
+
+    def __init__(self, endpoint_url, bucket, access_key, secret_key,
+                 region='us-east-1', prefix=''):
+        if not (endpoint_url and bucket and access_key and secret_key):
+            raise StorageError('S3 storage needs an endpoint, bucket and credentials')
+        self.endpoint_url = endpoint_url.rstrip('/')
+        self.bucket = bucket
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.region = region
+        self.prefix = prefix.strip('/') + '/' if prefix.strip('/') else ''
+        self._http = requests.Session()
+
+    def local_path(self, key):
+        return None
+
+    # ── Signed requests ─────────────────────────────────────────
+
+    def _signing_key(self, date):
+        key = ('AWS4' + self.secret_key).encode()
+        for part in (date, self.region, 's3', 'aws4_request'):
+            key = hmac.new(key, part.encode(), hashlib.sha256).digest()
+        return key
+
+    def _authorization(self, method, path, query, headers, payload_hash):
+        """AWS Signature V4 Authorization header; `headers` are lower-case."""
+        amz_date = headers['x-amz-date']
+        signed = sorted(headers)
+        canonical_headers = ''.join(f'{h}:{str(headers[h]).strip()}\n' for h in signed)
+        canonical_request = '\n'.join([
+            method, path, query, canonical_headers, ';'.join(signed), payload_hash,
+        ])
+        scope = f'{amz_date[:8]}/{self.region}/s3/aws4_request'
+        string_to_sign = '\n'.join([
+            'AWS4-HMAC-SHA256', amz_date, scope,
+            hashlib.sha256(canonical_request.encode()).hexdigest(),
+        ])
+        signature = hmac.new(
+            self._signing_key(amz_date[:8]), string_to_sign.encode(), hashlib.sha256,
+        ).hexdigest()
+        return (
+            f'AWS4-HMAC-SHA256 Credential={self.access_key}/{scope}, '
+            f"SignedHeaders={';'.join(signed)}, Signature={signature}"
+        )
+
+    def _request(self, method, key, params=None, headers=None, data=None, stream=False):
+        path = '/' + quote(f'{self.bucket}/{self.prefix}{key}', safe='/-_.~')
+        query = '&'.join(
+            f"{quote(k, safe='-_.~')}={quote(str(v), safe='-_.~')}"
+            for k, v in sorted((params or {}).items())
+        )
+        headers = {name.lower(): value for name, value in (headers or {}).items()}
+        headers['host'] = urlsplit(self.endpoint_url).netloc
+        headers['x-amz-date'] = datetime.datetime.now(datetime.timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+        headers['x-amz-content-sha256'] = 'UNSIGNED-PAYLOAD'
+        headers['authorization'] = self._authorization(
+            method, path, query, headers, 'UNSIGNED-PAYLOAD',
+        )
+        del headers['host']  # requests sets it from the URL
+        url = self.endpoint_url + path + ('?' + query if query else '')
+
+        try:
+            response = self._http.request(
+                method, url, headers=headers,
+                data=data, stream=stream, timeout=self.TIMEOUT_SECONDS,
+            )
+        except requests.RequestException as e:
+            raise StorageError(f'S3 {method} {key} failed: {e}')
+        if response.status_code >= 300 and response.status_code != 404:
+            raise StorageError(
+                f'S3 {method} {key} failed: HTTP {response.status_code} {response.text[:200]}'
+            )
+        return response
+
+    # ── Storage interface ───────────────────────────────────────
+
+    def exists(self, key):
+        return self._request('HEAD', key).status_code != 404
+
+    def size(self, key):
+        response = self._request('HEAD', key)
+        if response.status_code == 404:
+            return None
+        return int(response.headers.get('Content-Length', 0))
+
+    @contextmanager
+    def writer(self, key):
+        """Yield a file to write `key` into; uploaded as it is written."""
+        upload = _MultipartUpload(self, key)
+        try:
+            yield upload
+            upload.complete()
+        except BaseException:
+            upload.abort()
+            raise
+
+    def put_file(self, key, src_path):
+        """Upload a finished local file, then remove the local copy."""
+        with self.writer(key) as dest, open(src_path, 'rb') as src:
+            while True:
+                block = src.read(self.PART_SIZE)
+                if not block:
+                    break
+                dest.write(block)
+        os.remove(src_path)
+
+    def iter_range(self, key, start=0, length=None):
+        if length == 0:
+            return
+        end = '' if length is None else start + length - 1
+        response = self._request(
+            'GET', key, headers={'Range': f'bytes={start}-{end}'}, stream=True,
+        )
+        if response.status_code == 404:
+            raise StorageError(f'S3 object {key} not found')
+        with response:
+            yield from response.iter_content(READ_BLOCK)
+
+    def read_bytes(self, key, start=0, length=None):
+        return b''.join(self.iter_range(key, start, length))
+
+    def delete(self, key):
+        self._request('DELETE', key)
+
+
+class _MultipartUpload:
+    """Write-only file object backed by an S3 multipart upload.
+
+    Objects smaller than one part are sent with a single PUT instead.
+    """
+
+    def __init__(self, storage, key):
+        self.storage = storage
+        self.key = key
+        self._buffer = bytearray()
+        self._upload_id = None
+        self._etags = []
+        self._written = 0
+
+    def write(self, data):
+        self._buffer += data
+        self._written += len(data)
+        while len(self._buffer) >= self.storage.PART_SIZE:
+            part = bytes(self._buffer[:self.storage.PART_SIZE])
+            del self._buffer[:self.storage.PART_SIZE]
+            self._upload_part(part)
+        return len(data)
+
+    def tell(self):
+        return self._written
+
+    def flush(self):
+        pass
+
+    def _upload_part(self, part):
+        if self._upload_id is None:
+            response = self.storage._request('POST', self.key, params={'uploads': ''})
+            match = re.search(r'<UploadId>([^<]+)</UploadId>', response.text)
+            if not match:
+                raise StorageError(f'S3 did not return an upload id for {self.key}')
+            self._upload_id = match.group(1)
+        response = self.storage._request('PUT', self.key, params={
+            'partNumber': len(self._etags) + 1, 'uploadId': self._upload_id,
+        }, data=part)
+        self._etags.append(response.headers['ETag'])
+
+    def complete(self):
+        if self._upload_id is None:
+            self.storage._request('PUT', self.key, data=bytes(self._buffer))
+            return
+        if self._buffer:
+            self._upload_part(bytes(self._buffer))
+            self._buffer = bytearray()
+        parts = ''.join(
+            f'<Part><PartNumber>{n}</PartNumber><ETag>{escape(etag)}</ETag></Part>'
+            for n, etag in enumerate(self._etags, 1)
+        )
+        body = f'<CompleteMultipartUpload>{parts}</CompleteMultipartUpload>'
+        response = self.storage._request(
+            'POST', self.key, params={'uploadId': self._upload_id}, data=body.encode(),
+        )
+        if '<Error>' in response.text:  # S3 may report failure with a 200
+            raise StorageError(f'S3 multipart upload of {self.key} failed: {response.text[:200]}')
+
+    def abort(self):
+        if self._upload_id is None:
+            return
+        try:
+            self.storage._request('DELETE', self.key, params={'uploadId': self._upload_id})
+        except StorageError as e:
+            logger.warning(f'Could not abort multipart upload of {self.key}: {e}')
+
+
+def get_audio_storage(config):
+    """Build the audio storage backend selected by AUDIO_STORAGE."""
+    if config['AUDIO_STORAGE'] == 's3':
+        return S3AudioStorage(
+            config['S3_ENDPOINT_URL'], config['S3_BUCKET'],
+            config['S3_ACCESS_KEY_ID'], config['S3_SECRET_ACCESS_KEY'],
+            region=config['S3_REGION'], prefix=config['S3_PREFIX'],
+        )
+    return LocalAudioStorage(config['AUDIO_DIR'])
@@ -0,0 +1,50 @@
+import io
+import re
+
+from services.wav_concatenator import read_wav_header
+
+# Headings as emitted by MarkdownProcessor: "[SECTION_BREAK_2]Title"
+HEADING_RE = re.compile(r'\[SECTION_BREAK_(\d)\]([^\n]*)')
+MAX_TITLE_LENGTH = 200
+
+
+def wav_segment_samples(segment):
+    """Return (sample_count, sample_rate) for one WAV segment."""
+    info = read_wav_header(io.BytesIO(segment))
+    data_size = min(info.data_size, len(segment) - info.data_offset)
+    return data_size // info.block_align, info.sample_rate
+
+
+def build_chapter_index(text_chunks, segment_samples):
+    """Lay out chunks and headings on the sample timeline of the joined audio.
+
+    `segment_samples` holds the sample count of each chunk's audio, in
+    order.  Returns (chunk_index, chapters): chunk_index is a list of
+    [start_sample, samples] per chunk; chapters lists every titled heading
+    with its level, start sample and length up to the next heading of the
+    same or a higher level.  A heading in the middle of a chunk is placed
+    by its character position within that chunk's text.
+    """
+    chunk_index, chapters = [], []
+    offset = 0
+    for text, samples in zip(text_chunks, segment_samples):
+        chunk_index.append([offset, samples])
+        for match in HEADING_RE.finditer(text):
+            title = match.group(2).strip()
+            if not title:
+                continue  # thematic breaks carry no title
+            start = offset + samples * match.start() // max(1, len(text))
+            chapters.append({
+                'title': title[:MAX_TITLE_LENGTH],
+                'level': int(match.group(1)),
+                'start_sample': start,
+            })
+        offset += samples
+
+    for i, chapter in enumerate(chapters):
+        end = next(
+            (c['start_sample'] for c in chapters[i + 1:] if c['level'] <= chapter['level']),
+            offset,
+        )
+        chapter['samples'] = end - chapter['start_sample']
+    return chunk_index, chapters
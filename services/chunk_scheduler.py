@@ -0,0 +1,403 @@
+import logging
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from services.concurrency_controller import OVERLOAD_STATUSES
+
+logger = logging.getLogger(__name__)
+
+
+class _Flow:
+    """One job's chunks as seen by the scheduler."""
+
+    def __init__(self, job_id, category, weight, fn, chunks, progress_callback, split, join):
+        self.job_id = job_id
+        self.category = category
+        self.weight = weight
+        self.fn = fn
+        self.split = split
+        self.join = join
+        self.total = len(chunks)
+        self.chunks = list(chunks)  # pieces of re-split chunks are appended
+        self.progress_callback = progress_callback
+        self.pending = deque((i, 0.0) for i in range(len(chunks)))  # (index, ready_at)
+        self.results = [None] * len(chunks)
+        self.attempts = [0] * len(chunks)
+        self.overloads = [0] * len(chunks)
+        self.depth = [0] * len(chunks)
+        self.parent = {}        # piece index -> index of the chunk it was split from
+        self.pieces = {}        # split chunk index -> its piece indexes
+        self.running = {}       # index -> requests currently in flight
+        self.started = {}       # index -> monotonic start of the primary request
+        self.hedged = set()     # indexes that already have a hedge request
+        self.resolved = set()   # indexes with a result
+        self.completed = 0
+        self.finish_tag = 0.0
+        self.error = None
+        self.done = threading.Event()
+        self.progress_lock = threading.Lock()
+
+    @property
+    def remaining(self):
+        return len(self.pending) + len(self.running)
+
+
+class _LatencyTracker:
+    """Recent successful request latencies for one voice category."""
+
+    def __init__(self, window, min_samples):
+        self.samples = deque(maxlen=window)
+        self.min_samples = min_samples
+        self.p95 = None
+
+    def record(self, seconds):
+        self.samples.append(seconds)
+        if len(self.samples) >= self.min_samples:
+            ordered = sorted(self.samples)
+            self.p95 = ordered[min(len(ordered) - 1, math.ceil(0.95 * len(ordered)) - 1)]
+
+
+class ChunkScheduler:
+    """Interleave chunk requests from every active job in this process.
+
+    Each voice category (which maps to one upstream quota) is paced at its
+    own minimum interval, shared by all jobs.  Within a category, the next
+    request goes to the job with the smallest weighted-fair-queuing finish
+    tag.  A job's weight is its tier weight, boosted while it has few chunks
+    left, so a 3-chunk job from any tier is not stuck behind a 200-chunk job.
+
+    Failed chunks are retried once after `retry_delay`; a second failure
+    fails the job, mirroring the clients' own synthesize_all().  Upstream
+    429/503s are not the chunk's fault, so they get their own budget of
+    `overload_retries` with exponential backoff.  A chunk that fails in a
+    way the job's `split` callback recognises is instead replaced by
+    smaller pieces, paced and counted like any other request.
+
+    With `hedge_ratio` > 0, a request still running past the category's
+    observed p95 latency gets one duplicate; whichever finishes first wins
+    and the other's result is discarded.  Hedges draw from a token bucket
+    that earns `hedge_ratio` tokens per primary request, so they never
+    exceed that fraction of a category's traffic.
+
+    An optional `controller` (AimdController) caps how many requests per
+    category are in flight at once and learns that cap from upstream
+    429/503s and latency.
+    """
+
+    HEDGE_BURST = 5.0
+    OVERLOAD_RETRIES = 5
+
+    def __init__(self, max_workers=16, short_job_chunks=10, retry_delay=2.0,
+                 hedge_ratio=0.0, hedge_min_samples=20, latency_window=200,
+                 controller=None):
+        self.max_workers = max_workers
+        self.short_job_chunks = short_job_chunks
+        self.retry_delay = retry_delay
+        self.hedge_ratio = hedge_ratio
+        self.hedge_min_samples = hedge_min_samples
+        self.latency_window = latency_window
+        self.controller = controller
+        self._cond = threading.Condition()
+        self._flows = {}            # category -> list of _Flow
+        self._intervals = {}        # category -> seconds between requests
+        self._next_slot = {}        # category -> monotonic time
+        self._virtual_time = {}     # category -> WFQ virtual time
+        self._latency = {}          # category -> _LatencyTracker
+        self._hedge_tokens = {}     # category -> available hedges
+        self._counters = {}         # category -> {'requests', 'hedges', 'hedge_wins'}
+        self._in_flight = {}        # category -> requests currently running
+        self._pool = None
+        self._dispatcher = None
+
+    def run(self, job_id, category, min_interval, weight, fn, chunks, progress_callback=None,
+            split=None, join=None):
+        """Synthesize `chunks` with `fn` under the shared schedule.
+
+        `split(chunk, error, depth)` may return smaller pieces to retry a
+        failed chunk as, or None; `join(results)` merges the pieces' results.
+        Blocks until every chunk is done and returns results in order.
+        """
+        if not chunks:
+            return []
+        flow = _Flow(job_id, category, weight, fn, chunks, progress_callback, split, join)
+        with self._cond:
+            if self._dispatcher is None:
+                self._start()
+            self._intervals[category] = min_interval
+            vt = self._virtual_time.setdefault(category, 0.0)
+            flow.finish_tag = vt
+            self._flows.setdefault(category, []).append(flow)
+            self._cond.notify_all()
+
+        flow.done.wait()
+        if flow.error:
+            raise flow.error
+        return flow.results[:flow.total]
+
+    def stats(self):
+        with self._cond:
+            result = {}
+            for cat in set(self._flows) | set(self._counters):
+                flows = self._flows.get(cat, [])
+                tracker = self._latency.get(cat)
+                result[cat] = {
+                    'jobs': len(flows),
+                    'pending': sum(len(f.pending) for f in flows),
+                    'in_flight': self._in_flight.get(cat, 0),
+                    'in_flight_limit': self.controller.limit(cat) if self.controller else None,
+                    'p95_seconds': round(tracker.p95, 3) if tracker and tracker.p95 else None,
+                    **self._counters.get(cat, {}),
+                }
+            return result
+
+    def _start(self):
+        # Started on first use so importing the app never spawns threads
+        self._pool = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix='chunk',
+        )
+        self._dispatcher = threading.Thread(
+            target=self._dispatch_loop, name='chunk-dispatcher', daemon=True,
+        )
+        self._dispatcher.start()
+
+    def _count(self, category, key):
+        counters = self._counters.setdefault(
+            category, {'requests': 0, 'hedges': 0, 'hedge_wins': 0},
+        )
+        counters[key] += 1
+
+    def _effective_weight(self, flow):
+        boost = max(1.0, self.short_job_chunks / max(1, flow.remaining))
+        return flow.weight * boost
+
+    def _pick_hedge(self, category, flows, now, waits):
+        """Return (flow, index) for a request overdue past p95, or None."""
+        if self.hedge_ratio <= 0 or self._hedge_tokens.get(category, 0.0) < 1.0:
+            return None
+        tracker = self._latency.get(category)
+        if tracker is None or tracker.p95 is None:
+            return None
+        for flow in flows:
+            for index, started in flow.started.items():
+                if index in flow.hedged or index in flow.resolved:
+                    continue
+                deadline = started + tracker.p95
+                if deadline <= now:
+                    return flow, index
+                waits.append(deadline - now)
+        return None
+
+    def _pick(self, now):
+        """Return ((flow, index, is_hedge), None) or (None, seconds_to_wait)."""
+        waits = []
+        for category, flows in self._flows.items():
+            slot = self._next_slot.get(category, 0.0)
+            if slot > now:
+                if any(f.pending or f.started for f in flows):
+                    waits.append(slot - now)
+                continue
+            if self.controller and self._in_flight.get(category, 0) >= self.controller.limit(category):
+                continue  # woken again when a request finishes
+
+            hedge = self._pick_hedge(category, flows, now, waits)
+            if hedge:
+                flow, index = hedge
+                flow.hedged.add(index)
+                flow.running[index] += 1
+                self._hedge_tokens[category] -= 1.0
+                self._count(category, 'hedges')
+                self._in_flight[category] = self._in_flight.get(category, 0) + 1
+                self._next_slot[category] = max(now, slot) + self._intervals.get(category, 0.0)
+                return (flow, index, True), None
+
+            vt = self._virtual_time.get(category, 0.0)
+            best, best_tag = None, None
+            for flow in flows:
+                if not flow.pending:
+                    continue
+                ready_at = flow.pending[0][1]
+                if ready_at > now:
+                    waits.append(ready_at - now)
+                    continue
+                # A waiting job keeps the start tag it joined with; measuring
+                # it from the current virtual time would let whichever job is
+                # being served keep pulling that time, and its lead, forward
+                tag = flow.finish_tag + 1.0 / self._effective_weight(flow)
+                if best_tag is None or tag < best_tag:
+                    best, best_tag = flow, tag
+            if best is None:
+                continue
+
+            index, _ = best.pending.popleft()
+            best.running[index] = 1
+            self._virtual_time[category] = max(vt, best.finish_tag)
+            best.finish_tag = best_tag
+            self._next_slot[category] = max(now, slot) + self._intervals.get(category, 0.0)
+            self._count(category, 'requests')
+            self._in_flight[category] = self._in_flight.get(category, 0) + 1
+            if self.hedge_ratio > 0:
+                self._hedge_tokens[category] = min(
+                    self.HEDGE_BURST, self._hedge_tokens.get(category, 0.0) + self.hedge_ratio,
+                )
+            return (best, index, False), None
+        return None, (min(waits) if waits else None)
+
+    def _dispatch_loop(self):
+        while True:
+            with self._cond:
+                while True:
+                    choice, wait_for = self._pick(time.monotonic())
+                    if choice:
+                        break
+                    self._cond.wait(timeout=wait_for)
+            self._pool.submit(self._execute, *choice)
+
+    def _finish(self, flow):
+        """Remove a flow from scheduling (caller holds the lock)."""
+        flows = self._flows.get(flow.category, [])
+        if flow in flows:
+            flows.remove(flow)
+        flow.done.set()
+
+    def _settle(self, flow, index):
+        """Drop one in-flight request for `index` (caller holds the lock)."""
+        self._in_flight[flow.category] -= 1
+        flow.running[index] -= 1
+        if flow.running[index] <= 0:
+            del flow.running[index]
+            flow.started.pop(index, None)
+            flow.hedged.discard(index)
+
+    def _add_pieces(self, flow, index, pieces):
+        """Replace chunk `index` by `pieces`, queued ahead of other chunks (caller holds the lock)."""
+        added = []
+        for piece in pieces:
+            added.append(len(flow.chunks))
+            flow.chunks.append(piece)
+            flow.results.append(None)
+            flow.attempts.append(0)
+            flow.overloads.append(0)
+            flow.depth.append(flow.depth[index] + 1)
+            flow.parent[added[-1]] = index
+        flow.pieces[index] = added
+        now = time.monotonic()
+        flow.pending.extendleft((i, now) for i in reversed(added))
+
+    def _resolve(self, flow, index, result):
+        """Record a result, joining finished pieces into their chunk (caller holds the lock).
+
+        Returns True when `index` resolves one of the job's own chunks.
+        """
+        flow.resolved.add(index)
+        flow.results[index] = result
+        while index in flow.parent:
+            index = flow.parent[index]
+            pieces = flow.pieces[index]
+            if not all(i in flow.resolved for i in pieces):
+                return False
+            flow.resolved.add(index)
+            flow.results[index] = flow.join([flow.results[i] for i in pieces])
+            for i in pieces:
+                flow.results[i] = None
+        return True
+
+    @staticmethod
+    def _chunk_number(flow, index):
+        while index in flow.parent:
+            index = flow.parent[index]
+        return index + 1
+
+    def _execute(self, flow, index, is_hedge):
+        total = flow.total
+        number = self._chunk_number(flow, index)
+        started = time.monotonic()
+        if not is_hedge:
+            # Timed from here rather than dispatch, so waiting for a free
+            # pool thread never looks like a slow upstream response
+            with self._cond:
+                flow.started[index] = started
+                self._cond.notify_all()
+        try:
+            result = flow.fn(flow.chunks[index])
+        except Exception as e:
+            overloaded = getattr(e, 'status_code', None) in OVERLOAD_STATUSES
+            if overloaded and self.controller:
+                self.controller.on_overload(flow.category)
+            with self._cond:
+                self._settle(flow, index)
+                self._cond.notify_all()
+                if flow.done.is_set() or index in flow.resolved:
+                    return
+                if index in flow.running:
+                    # The other request for this chunk may still succeed
+                    logger.warning(f"TTS request failed on chunk {number}/{total} of job {flow.job_id} "
+                                   f"while a duplicate is in flight: {e}")
+                    return
+                if overloaded and flow.overloads[index] < self.OVERLOAD_RETRIES:
+                    flow.overloads[index] += 1
+                    backoff = self.retry_delay * 2 ** (flow.overloads[index] - 1)
+                    logger.warning(f"Upstream overloaded on chunk {number}/{total} of job {flow.job_id}; "
+                                   f"retrying in {backoff:.1f}s")
+                    flow.pending.append((index, time.monotonic() + backoff))
+                    return
+                pieces = flow.split(flow.chunks[index], e, flow.depth[index]) if flow.split else None
+                if pieces:
+                    logger.warning(f"Chunk {number}/{total} of job {flow.job_id} failed ({e}); "
+                                   f"retrying as {len(pieces)} pieces")
+                    self._add_pieces(flow, index, pieces)
+                    return
+                flow.attempts[index] += 1
+                if flow.attempts[index] < 2:
+                    logger.error(f"TTS failed on chunk {number}/{total} of job {flow.job_id}: {e}")
+                    flow.pending.append((index, time.monotonic() + self.retry_delay))
+                else:
+                    logger.error(f"Retry also failed on chunk {number}/{total} of job {flow.job_id}: {e}")
+                    flow.error = RuntimeError(
+                        f"Audio generation failed on chunk {number} of {total}. Please try again."
+                    )
+                    flow.pending.clear()
+                    self._finish(flow)
+            return
+
+        latency = time.monotonic() - started
+        with self._cond:
+            self._settle(flow, index)
+            self._latency.setdefault(
+                flow.category, _LatencyTracker(self.latency_window, self.hedge_min_samples),
+            ).record(latency)
+            self._cond.notify_all()
+            if flow.done.is_set() or index in flow.resolved:
+                # Lost the race to the other request for this chunk
+                return
+            if self.controller:
+                # Once per chunk: a hedge's loser must not grow the limit twice
+                self.controller.on_success(flow.category, latency)
+            if is_hedge:
+                self._count(flow.category, 'hedge_wins')
+            try:
+                if not self._resolve(flow, index, result):
+                    return  # other pieces of the same chunk are still running
+            except Exception as e:
+                logger.error(f"Could not join the pieces of chunk {number}/{total} of job {flow.job_id}: {e}")
+                flow.error = RuntimeError(
+                    f"Audio generation failed on chunk {number} of {total}. Please try again."
+                )
+                flow.pending.clear()
+                self._finish(flow)
+                return
+            flow.completed += 1
+            finished = flow.completed == total
+
+        if flow.progress_callback:
+            with flow.progress_lock:
+                try:
+                    flow.progress_callback(flow.completed, total)
+                except Exception:
+                    logger.exception(f"Progress callback failed for job {flow.job_id}")
+
+        if finished:
+            with self._cond:
+                self._finish(flow)
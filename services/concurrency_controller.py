@@ -0,0 +1,94 @@
+import threading
+import time
+
+# Upstream statuses that mean "slow down" rather than "this request is bad"
+OVERLOAD_STATUSES = (429, 503)
+
+
+class _Limit:
+    def __init__(self, initial):
+        self.limit = float(initial)
+        self.baseline = None        # EWMA of request latency, seconds
+        self.samples = 0
+        self.last_decrease = 0.0
+        self.successes = 0
+        self.overloads = 0
+        self.latency_spikes = 0
+
+
+class AimdController:
+    """Additive-increase / multiplicative-decrease limit on in-flight requests.
+
+    One limit per key (a voice category, which maps to one engine quota).
+    Each success grows the limit by `increase / limit`, i.e. roughly
+    `increase` per round trip at full concurrency.  A 429/503, or a success
+    slower than `latency_spike` times the running baseline, multiplies it by
+    `decrease` — at most once per baseline latency, so a burst of failures
+    from the same window only counts once.
+    """
+
+    WARMUP_SAMPLES = 10
+
+    def __init__(self, initial=2, min_limit=1, max_limit=16,
+                 increase=1.0, decrease=0.5, latency_spike=3.0):
+        self.initial = initial
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_spike = latency_spike
+        self._lock = threading.Lock()
+        self._limits = {}
+
+    def _get(self, key):
+        state = self._limits.get(key)
+        if state is None:
+            state = self._limits[key] = _Limit(self.initial)
+        return state
+
+    def limit(self, key):
+        """Return the current whole-number in-flight allowance for `key`."""
+        with self._lock:
+            return max(self.min_limit, int(self._get(key).limit))
+
+    def on_success(self, key, latency):
+        with self._lock:
+            state = self._get(key)
+            state.successes += 1
+            spike = (
+                state.samples >= self.WARMUP_SAMPLES
+                and latency > self.latency_spike * state.baseline
+            )
+            if spike:
+                state.latency_spikes += 1
+                self._decrease(state)
+                return
+            state.baseline = latency if state.baseline is None else 0.9 * state.baseline + 0.1 * latency
+            state.samples += 1
+            state.limit = min(self.max_limit, state.limit + self.increase / state.limit)
+
+    def on_overload(self, key):
+        with self._lock:
+            state = self._get(key)
+            state.overloads += 1
+            self._decrease(state)
+
+    def _decrease(self, state):
+        now = time.monotonic()
+        if now - state.last_decrease < (state.baseline or 0.0):
+            return
+        state.last_decrease = now
+        state.limit = max(self.min_limit, state.limit * self.decrease)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                key: {
+                    'limit': round(s.limit, 2),
+                    'baseline_latency': round(s.baseline, 3) if s.baseline is not None else None,
+                    'successes': s.successes,
+                    'overloads': s.overloads,
+                    'latency_spikes': s.latency_spikes,
+                }
+                for key, s in self._limits.items()
+            }
@@ -0,0 +1,117 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+AUTH_STATUSES = (401, 403)
+QUOTA_STATUSES = (429,)
+
+
+class CredentialPool:
+    """Spread TTS requests over several API keys (one per Google project).
+
+    Keys come from a comma-separated environment variable, so a single key
+    still works unchanged.  Every key keeps a one-minute request window per
+    voice category; `acquire()` hands out the key with the most headroom
+    left under that category's RPM.  A key that fails authentication is
+    quarantined for every category, one that hits a quota only for the
+    category it exhausted.
+    """
+
+    WINDOW_SECONDS = 60
+    AUTH_QUARANTINE_SECONDS = 600
+    QUOTA_QUARANTINE_SECONDS = 60
+
+    def __init__(self, keys, rpm_limits=None):
+        self.keys = list(dict.fromkeys(keys))  # de-duplicated, order kept
+        self.rpm_limits = rpm_limits or {}
+        self._lock = threading.Lock()
+        self._windows = {}      # (key, category) -> deque of request times
+        self._quarantine = {}   # (key, category or None) -> monotonic release time
+
+    @classmethod
+    def from_env(cls, env_var, rpm_limits=None):
+        keys = [k.strip() for k in os.environ.get(env_var, '').split(',') if k.strip()]
+        return cls(keys, rpm_limits)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _quarantined_until(self, key, category, now):
+        until = max(
+            self._quarantine.get((key, None), 0.0),
+            self._quarantine.get((key, category), 0.0),
+        )
+        return until if until > now else 0.0
+
+    def _window(self, key, category, now):
+        window = self._windows.setdefault((key, category), deque())
+        while window and window[0] <= now - self.WINDOW_SECONDS:
+            window.popleft()
+        return window
+
+    def available(self, category):
+        """Return how many keys are currently usable for `category`."""
+        now = time.monotonic()
+        with self._lock:
+            return sum(1 for k in self.keys if not self._quarantined_until(k, category, now))
+
+    def acquire(self, category):
+        """Pick a key for one request in `category` and count it."""
+        if not self.keys:
+            raise RuntimeError('No API keys configured')
+        now = time.monotonic()
+        rpm = self.rpm_limits.get(category)
+        with self._lock:
+            usable = [k for k in self.keys if not self._quarantined_until(k, category, now)]
+            if usable:
+                key = max(
+                    usable,
+                    key=lambda k: (rpm or 0) - len(self._window(k, category, now)),
+                )
+            else:
+                # Everything is quarantined: try the key that recovers first
+                key = min(self.keys, key=lambda k: self._quarantined_until(k, category, now))
+            self._window(key, category, now).append(now)
+        return key
+
+    def report(self, key, category, status_code, message=''):
+        """Record a failed request; quarantine the key on auth or quota errors."""
+        auth_failed = status_code in AUTH_STATUSES or (
+            status_code == 400 and 'API key' in (message or '')
+        )
+        if auth_failed:
+            scope, seconds = None, self.AUTH_QUARANTINE_SECONDS
+        elif status_code in QUOTA_STATUSES:
+            scope, seconds = category, self.QUOTA_QUARANTINE_SECONDS
+        else:
+            return
+        with self._lock:
+            self._quarantine[(key, scope)] = time.monotonic() + seconds
+        logger.warning(
+            f"Quarantined API key …{key[-4:]} for {seconds}s "
+            f"({'all categories' if scope is None else scope}, status {status_code})"
+        )
+
+    def snapshot(self):
+        now = time.monotonic()
+        with self._lock:
+            result = {}
+            for key in self.keys:
+                categories = {
+                    cat: len(self._window(k, cat, now))
+                    for (k, cat) in list(self._windows) if k == key
+                }
+                quarantine = {
+                    scope or '*': round(until - now, 1)
+                    for (k, scope), until in self._quarantine.items()
+                    if k == key and until > now
+                }
+                result[f'…{key[-4:]}'] = {
+                    'requests_last_minute': categories,
+                    'quarantined_seconds': quarantine,
+                }
+            return result
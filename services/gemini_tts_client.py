@@ -1,11 +1,13 @@
-import os
 import re
 import base64
-import struct
 import time
 import logging
 import requests
 
+from services.credential_pool import CredentialPool
+from services.tts_client import TTSApiError, api_error_message
+from services.wav_concatenator import wav_header
+
 logger = logging.getLogger(__name__)
 
 
@@ -13,20 +15,10 @@ def _pcm_to_wav(pcm_bytes, sample_rate=24000, bits_per_sample=16, channels=1):
     """Wrap raw PCM bytes in a standard WAV header.
 
     Gemini TTS returns raw PCM (Linear16) audio.  The WavConcatenator
-    expects valid WAV segments, so we prepend the RIFF/fmt/data headers.
+    expects valid WAV segments, so we prepend the RIFF/fmt/data headers
+    (RF64 if the audio is ever over 4 GB).
     """
-    data_size = len(pcm_bytes)
-    byte_rate = sample_rate * channels * bits_per_sample // 8
-    block_align = channels * bits_per_sample // 8
-
-    header = struct.pack('<4sI4s', b'RIFF', 36 + data_size, b'WAVE')
-    header += struct.pack(
-        '<4sIHHIIHH',
-        b'fmt ', 16, 1, channels,
-        sample_rate, byte_rate, block_align, bits_per_sample,
-    )
-    header += struct.pack('<4sI', b'data', data_size)
-    return header + pcm_bytes
+    return wav_header(len(pcm_bytes), sample_rate, bits_per_sample, channels) + pcm_bytes
 
 
 def prepare_text_for_gemini(text_chunk: str) -> str:
@@ -54,10 +46,12 @@ class GeminiTTSClient:
         f'{MODEL}:generateContent'
     )
 
-    def __init__(self, voice_name='Zephyr', chunk_delay=0.5, system_instruction=None):
-        self.api_key = os.environ.get('GEMINI_API_KEY', '')
-        if not self.api_key:
+    def __init__(self, voice_name='Zephyr', chunk_delay=0.5, system_instruction=None,
+                 credentials=None, category='gemini'):
+        self.credentials = credentials or CredentialPool.from_env('GEMINI_API_KEY')
+        if not self.credentials:
             raise RuntimeError('GEMINI_API_KEY environment variable is not set')
+        self.category = category
 
         self.voice_name = voice_name
         self.chunk_delay = chunk_delay
@@ -84,18 +78,21 @@ class GeminiTTSClient:
             },
         }
 
+        api_key = self.credentials.acquire(self.category)
         resp = requests.post(
             self.ENDPOINT,
-            params={'key': self.api_key},
+            params={'key': api_key},
             json=payload,
             timeout=60,
         )
 
         if resp.status_code != 200:
-            raw_error = resp.json().get('error', {}).get('message', resp.text)
+            raw_error = api_error_message(resp)
+            self.credentials.report(api_key, self.category, resp.status_code, raw_error)
             logger.error(f'Gemini TTS API error ({resp.status_code}): {raw_error}')
-            raise RuntimeError(
-                f'Gemini TTS service returned an error (status {resp.status_code})'
+            raise TTSApiError(
+                f'Gemini TTS service returned an error (status {resp.status_code})',
+                resp.status_code, raw_error,
             )
 
         try:
@@ -0,0 +1,117 @@
+import logging
+import math
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class ExecutorSaturated(Exception):
+    """Raised when a job cannot be admitted; carries a Retry-After hint."""
+
+    def __init__(self, retry_after):
+        super().__init__(f'Job executor saturated; retry after {retry_after}s')
+        self.retry_after = retry_after
+
+
+class BoundedJobExecutor:
+    """Fixed pool of job threads with a FIFO queue and a memory budget.
+
+    Jobs start strictly in arrival order.  The head of the queue waits until
+    a thread is free *and* its estimated memory fits in what the running
+    jobs leave of `memory_budget` (a job larger than the whole budget still
+    runs, but only on its own).  Once `max_queued` jobs are waiting, new
+    submissions are rejected so a traffic spike turns into latency and 503s
+    rather than unbounded threads and RAM.
+    """
+
+    def __init__(self, max_workers=4, memory_budget=512 * 1024 * 1024, max_queued=50):
+        self.max_workers = max_workers
+        self.memory_budget = memory_budget
+        self.max_queued = max_queued
+        self._cond = threading.Condition()
+        self._queue = deque()      # (job_id, estimated_bytes, fn, args)
+        self._running = {}         # job_id -> estimated_bytes
+        self._avg_duration = 60.0  # seconds, exponentially weighted
+        self._threads = []
+
+    def _start_threads(self):
+        # Started on first use so importing the app never spawns threads
+        for i in range(self.max_workers):
+            t = threading.Thread(target=self._worker, name=f'job-worker-{i}', daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def submit(self, job_id, estimated_bytes, fn, *args):
+        """Queue `fn(*args)`; return the number of jobs ahead of it.
+
+        Raises ExecutorSaturated when the queue is full.
+        """
+        with self._cond:
+            self._check_capacity()
+            if not self._threads:
+                self._start_threads()
+            self._queue.append((job_id, estimated_bytes, fn, args))
+            ahead = len(self._queue) - 1
+            self._cond.notify_all()
+        return ahead
+
+    def check_capacity(self):
+        """Raise ExecutorSaturated if a job submitted now would be rejected."""
+        with self._cond:
+            self._check_capacity()
+
+    def position(self, job_id):
+        """Return the 1-based queue position of `job_id`, or None if not queued."""
+        with self._cond:
+            for i, entry in enumerate(self._queue, 1):
+                if entry[0] == job_id:
+                    return i
+        return None
+
+    def stats(self):
+        with self._cond:
+            return {
+                'running': len(self._running),
+                'queued': len(self._queue),
+                'running_bytes': sum(self._running.values()),
+                'memory_budget': self.memory_budget,
+            }
+
+    def _check_capacity(self):
+        if len(self._queue) >= self.max_queued:
+            raise ExecutorSaturated(self._retry_after())
+
+    def _retry_after(self):
+        """Estimate seconds until a queue slot frees up (caller holds lock)."""
+        waves = (len(self._queue) + len(self._running)) / max(1, self.max_workers)
+        return max(5, min(300, math.ceil(self._avg_duration * waves / 4)))
+
+    def _can_start_head(self):
+        if not self._queue or len(self._running) >= self.max_workers:
+            return False
+        if not self._running:
+            return True
+        head_bytes = self._queue[0][1]
+        return sum(self._running.values()) + head_bytes <= self.memory_budget
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while not self._can_start_head():
+                    self._cond.wait()
+                job_id, estimated_bytes, fn, args = self._queue.popleft()
+                self._running[job_id] = estimated_bytes
+
+            started = time.monotonic()
+            try:
+                fn(*args)
+            except Exception:
+                logger.exception(f'Job {job_id} raised outside its own handler')
+            finally:
+                elapsed = time.monotonic() - started
+                with self._cond:
+                    self._running.pop(job_id, None)
+                    self._avg_duration = 0.8 * self._avg_duration + 0.2 * elapsed
+                    self._cond.notify_all()
@@ -0,0 +1,244 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+# Job lifecycle: queued → processing → complete | error
+ACTIVE_STATUSES = ('queued', 'processing')
+
+_RECORD_FIELDS = (
+    'status', 'total_chunks', 'completed_chunks', 'error', 'output_path',
+    'created_at', 'client_ip', 'user_id', 'audio_title', 'source_text_id',
+    'audio_id', 'tier',
+)
+
+
+class MemoryJobStore:
+    """Per-process job state for jobs run on threads inside the web worker."""
+
+    def __init__(self):
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def create(self, job_id, record, payload=None):
+        with self._lock:
+            self._jobs[job_id] = dict(record)
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def update(self, job_id, **fields):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.update(fields)
+
+    def discard(self, job_id):
+        """Forget a job that was never started."""
+        with self._lock:
+            self._jobs.pop(job_id, None)
+
+    def count_active(self, client_ip):
+        with self._lock:
+            return sum(
+                1 for j in self._jobs.values()
+                if j.get('client_ip') == client_ip and j.get('status') in ACTIVE_STATUSES
+            )
+
+    def purge(self, max_age_seconds):
+        """Drop finished jobs older than `max_age_seconds`."""
+        cutoff = time.time() - max_age_seconds
+        with self._lock:
+            expired = [
+                jid for jid, j in self._jobs.items()
+                if j.get('created_at', cutoff) < cutoff and j.get('status') not in ACTIVE_STATUSES
+            ]
+            for jid in expired:
+                self._jobs.pop(jid, None)
+
+
+class SqliteJobQueue:
+    """Durable job queue and state shared by web and worker processes.
+
+    Backed by a SQLite file in WAL mode on the local disk, so web workers
+    and `flask run-worker` on the same host can share it without any extra
+    infrastructure.  Jobs survive restarts of either side; a worker that
+    starts up re-queues anything a previous worker left half-done.
+    """
+
+    SCHEMA = '''
+        CREATE TABLE IF NOT EXISTS jobs (
+            id               TEXT PRIMARY KEY,
+            status           TEXT NOT NULL,
+            record           TEXT NOT NULL,
+            payload          TEXT,
+            worker_pid       INTEGER,
+            created_at       REAL NOT NULL,
+            updated_at       REAL NOT NULL,
+            client_ip        TEXT
+        );
+        CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at);
+        CREATE INDEX IF NOT EXISTS jobs_client_ip ON jobs (client_ip, status);
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(self.SCHEMA)
+
+    def _connect(self):
+        # One short-lived connection per call keeps this safe across threads
+        # and forked processes.
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    @staticmethod
+    def _to_job(row):
+        job = json.loads(row['record'])
+        job['status'] = row['status']
+        return job
+
+    def create(self, job_id, record, payload=None):
+        now = time.time()
+        record = {k: v for k, v in record.items() if k in _RECORD_FIELDS}
+        with closing(self._connect()) as conn:
+            conn.execute(
+                'INSERT INTO jobs (id, status, record, payload, created_at, updated_at, client_ip) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (job_id, record.get('status', 'queued'), json.dumps(record),
+                 json.dumps(payload) if payload is not None else None,
+                 record.get('created_at', now), now, record.get('client_ip')),
+            )
+
+    def get(self, job_id):
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                'SELECT status, record FROM jobs WHERE id = ?', (job_id,)
+            ).fetchone()
+        return self._to_job(row) if row else None
+
+    def get_payload(self, job_id):
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                'SELECT payload FROM jobs WHERE id = ?', (job_id,)
+            ).fetchone()
+        return json.loads(row['payload']) if row and row['payload'] else None
+
+    def update(self, job_id, **fields):
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute(
+                'SELECT status, record FROM jobs WHERE id = ?', (job_id,)
+            ).fetchone()
+            if row is None:
+                conn.execute('ROLLBACK')
+                return
+            job = self._to_job(row)
+            job.update(fields)
+            status = job.pop('status')
+            sets, params = 'status = ?, record = ?, updated_at = ?', [status, json.dumps(job), time.time()]
+            if status not in ACTIVE_STATUSES:
+                # Finished jobs no longer need their (large) input payload
+                sets += ', payload = NULL'
+            conn.execute(f'UPDATE jobs SET {sets} WHERE id = ?', params + [job_id])
+            conn.execute('COMMIT')
+        finally:
+            conn.close()
+
+    def claim(self, worker_pid, include_crashed=True):
+        """Atomically move the oldest queued job to processing; return its id.
+
+        With `include_crashed` false, jobs that were running when a worker
+        pool broke (see `requeue`) are passed over.
+        """
+        query = "SELECT id FROM jobs WHERE status = 'queued'"
+        if not include_crashed:
+            query += " AND json_extract(record, '$.crashed') IS NULL"
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute(query + ' ORDER BY created_at LIMIT 1').fetchone()
+            if row is None:
+                conn.execute('ROLLBACK')
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'processing', worker_pid = ?, updated_at = ? WHERE id = ?",
+                (worker_pid, time.time(), row['id']),
+            )
+            conn.execute('COMMIT')
+            return row['id']
+        finally:
+            conn.close()
+
+    def requeue(self, job_id, **fields):
+        """Return a claimed job to the queue, updating its record with `fields`."""
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute(
+                "SELECT status, record FROM jobs WHERE id = ? AND status = 'processing'", (job_id,)
+            ).fetchone()
+            if row is None:
+                conn.execute('ROLLBACK')
+                return
+            job = self._to_job(row)
+            job.update(fields)
+            job.pop('status')
+            conn.execute(
+                "UPDATE jobs SET status = 'queued', record = ?, worker_pid = NULL, updated_at = ? "
+                "WHERE id = ?",
+                (json.dumps(job), time.time(), job_id),
+            )
+            conn.execute('COMMIT')
+        finally:
+            conn.close()
+
+    def requeue_abandoned(self):
+        """Return jobs left in 'processing' by a previous worker to the queue."""
+        with closing(self._connect()) as conn:
+            cur = conn.execute(
+                "UPDATE jobs SET status = 'queued', worker_pid = NULL, updated_at = ? "
+                "WHERE status = 'processing'",
+                (time.time(),),
+            )
+            return cur.rowcount
+
+    def count_active(self, client_ip):
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE client_ip = ? AND status IN ('queued', 'processing')",
+                (client_ip,),
+            ).fetchone()
+        return row[0]
+
+    def queue_depth(self):
+        """Return the number of jobs waiting to be claimed."""
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()
+        return row[0]
+
+    def position(self, job_id):
+        """Return the 1-based queue position of `job_id`, or None if not queued."""
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND created_at <= "
+                "(SELECT created_at FROM jobs WHERE id = ? AND status = 'queued')",
+                (job_id,),
+            ).fetchone()
+        return row[0] or None
+
+    def purge(self, max_age_seconds):
+        """Drop finished jobs older than `max_age_seconds`."""
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "DELETE FROM jobs WHERE created_at < ? AND status NOT IN ('queued', 'processing')",
+                (time.time() - max_age_seconds,),
+            )
@@ -0,0 +1,99 @@
+import gzip
+import threading
+import zlib
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+
+class ResponseCompressor:
+    """Compress JSON and text responses for clients that accept it.
+
+    Audio and other binary responses are left alone, as are file responses
+    served via send_file (direct passthrough) and streamed responses.  Responses whose payload is
+    static for the life of the process can pass a `cache_key` so the
+    compressed bytes are computed once and reused.
+    """
+
+    COMPRESSIBLE_MIMETYPES = {'application/json', 'application/javascript'}
+
+    def __init__(self, min_size=1024, level=6, max_cache_entries=64):
+        self.min_size = min_size
+        self.level = level
+        self.max_cache_entries = max_cache_entries
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def encodings(self):
+        """Return supported encodings in order of preference."""
+        if brotli is not None:
+            return ('br', 'gzip', 'deflate')
+        return ('gzip', 'deflate')
+
+    def choose_encoding(self, accept_encodings):
+        """Pick the best supported encoding from an Accept-Encoding header."""
+        for encoding in self.encodings():
+            if accept_encodings[encoding]:
+                return encoding
+        return None
+
+    def _is_compressible(self, response):
+        if response.status_code != 200 or response.direct_passthrough:
+            return False
+        if response.is_streamed:
+            return False  # compressing would buffer the whole generator
+        if 'Content-Encoding' in response.headers:
+            return False
+        mimetype = response.mimetype or ''
+        return mimetype.startswith('text/') or mimetype in self.COMPRESSIBLE_MIMETYPES
+
+    def _encode(self, data, encoding):
+        if encoding == 'br':
+            return brotli.compress(data, quality=min(self.level, 11))
+        if encoding == 'gzip':
+            return gzip.compress(data, compresslevel=self.level, mtime=0)
+        return zlib.compress(data, self.level)
+
+    def _cached_encode(self, data, encoding, cache_key):
+        key = (cache_key, encoding)
+        with self._lock:
+            cached = self._cache.get(key)
+        if cached is not None:
+            return cached
+        compressed = self._encode(data, encoding)
+        with self._lock:
+            if len(self._cache) >= self.max_cache_entries:
+                self._cache.clear()
+            self._cache[key] = compressed
+        return compressed
+
+    def compress(self, response, accept_encodings, cache_key=None):
+        """Compress `response` in place if worthwhile; return the response."""
+        if not self._is_compressible(response):
+            return response
+
+        response.vary.add('Accept-Encoding')
+        encoding = self.choose_encoding(accept_encodings)
+        if encoding is None:
+            return response
+
+        data = response.get_data()
+        if len(data) < self.min_size:
+            return response
+
+        if cache_key is not None:
+            compressed = self._cached_encode(data, encoding, cache_key)
+        else:
+            compressed = self._encode(data, encoding)
+
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = encoding
+
+        # The encoded body differs byte-for-byte from the identity one,
+        # so any strong validator has to be weakened.
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
@@ -0,0 +1,82 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+
+class StaticAsset:
+    """One fingerprinted static file with its precompressed variants."""
+
+    def __init__(self, filename, fingerprinted, mimetype, etag, variants):
+        self.filename = filename
+        self.fingerprinted = fingerprinted
+        self.mimetype = mimetype
+        self.etag = etag
+        self.variants = variants  # {encoding or None: bytes}
+
+
+class AssetManifest:
+    """Content-hash static files at startup and serve them immutably.
+
+    `style.css` becomes `style.<hash>.css`; the hashed name changes whenever
+    the file content does, so responses can be cached forever.  Each asset
+    is precompressed once (gzip, plus brotli when installed) and held in
+    memory — the set of fingerprinted files is small (CSS/JS only).
+    """
+
+    EXTENSIONS = ('.css', '.js')
+    HASH_LENGTH = 12
+
+    def __init__(self, static_folder, extensions=None):
+        self.static_folder = static_folder
+        self.extensions = tuple(extensions or self.EXTENSIONS)
+        self._by_filename = {}
+        self._by_fingerprint = {}
+        self.build()
+
+    def build(self):
+        """Walk the static folder and (re)build the manifest."""
+        by_filename, by_fingerprint = {}, {}
+        for root, _dirs, files in os.walk(self.static_folder):
+            for name in files:
+                if not name.endswith(self.extensions):
+                    continue
+                path = os.path.join(root, name)
+                filename = os.path.relpath(path, self.static_folder).replace(os.sep, '/')
+                asset = self._load(filename, path)
+                by_filename[filename] = asset
+                by_fingerprint[asset.fingerprinted] = asset
+        self._by_filename = by_filename
+        self._by_fingerprint = by_fingerprint
+
+    def _load(self, filename, path):
+        with open(path, 'rb') as f:
+            data = f.read()
+        digest = hashlib.sha256(data).hexdigest()[:self.HASH_LENGTH]
+        stem, ext = os.path.splitext(filename)
+        variants = {None: data, 'gzip': gzip.compress(data, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            variants['br'] = brotli.compress(data, quality=11)
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        return StaticAsset(filename, f'{stem}.{digest}{ext}', mimetype, digest, variants)
+
+    def fingerprint(self, filename):
+        """Return the fingerprinted name for `filename`, or it unchanged."""
+        asset = self._by_filename.get(filename)
+        return asset.fingerprinted if asset else filename
+
+    def resolve(self, fingerprinted):
+        """Return the StaticAsset for a fingerprinted name, or None."""
+        return self._by_fingerprint.get(fingerprinted)
+
+    def choose_variant(self, asset, accept_encodings):
+        """Return (encoding, body) for the best variant the client accepts."""
+        for encoding in ('br', 'gzip'):
+            if encoding in asset.variants and accept_encodings[encoding]:
+                return encoding, asset.variants[encoding]
+        return None, asset.variants[None]
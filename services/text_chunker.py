@@ -1,7 +1,16 @@
+import hashlib
 import re
 
 
+def chunk_hash(text: str) -> str:
+    """Stable content hash identifying a chunk's text across renders."""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()[:24]
+
+
 class TextChunker:
+    # chunk_stable(): average distance between anchors, in chunks
+    ANCHOR_SPACING_CHUNKS = 4
+
     def __init__(self, max_bytes: int = 4800):
         self.max_bytes = max_bytes
         self.ssml_overhead = 200
@@ -44,6 +53,49 @@ class TextChunker:
 
         return chunks
 
+    def chunk_stable(self, text: str) -> list:
+        """Chunk text so that a local edit only moves nearby boundaries.
+
+        With plain greedy packing one inserted word can shift every later
+        chunk boundary.  Here the text is first cut before "anchor"
+        paragraphs, picked from each paragraph's own content with a
+        probability proportional to its size, and each span between anchors
+        is chunked on its own.  An edit then changes only the chunks of its
+        span (and a neighbouring one if it adds or removes an anchor), so
+        unchanged chunks keep their exact text across re-renders.
+        """
+        spacing = self.effective_max * self.ANCHOR_SPACING_CHUNKS
+        if self._byte_len(text) <= spacing:
+            return self.chunk(text)
+
+        chunks, span = [], []
+        for paragraph in text.split('\n\n'):
+            if span and self._is_anchor(paragraph, spacing):
+                chunks.extend(self.chunk('\n\n'.join(span)))
+                span = []
+            span.append(paragraph)
+        if span:
+            chunks.extend(self.chunk('\n\n'.join(span)))
+        return chunks
+
+    def _is_anchor(self, paragraph: str, spacing: int) -> bool:
+        data = paragraph.encode('utf-8')
+        draw = int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), 'big') / 2 ** 64
+        return draw < len(data) / spacing
+
+    def resplit(self, text: str, pieces: int = 2) -> list:
+        """Split one existing chunk into roughly `pieces` smaller chunks.
+
+        Uses the same boundary preference as chunk(), so a chunk the TTS
+        service rejected or timed out on can be retried in smaller parts.
+        Returns an empty list when the text cannot be split any further.
+        """
+        # A little slack so greedy packing doesn't leave a tiny tail piece
+        target = int(self._byte_len(text) / pieces * 1.1) + 1
+        smaller = TextChunker(max_bytes=target + self.ssml_overhead)
+        parts = smaller.chunk(text)
+        return parts if len(parts) > 1 else []
+
     def _split_large_section(self, text: str) -> list:
         """Split a section that exceeds byte limit at paragraph,
         then sentence, then clause, then word boundaries."""
@@ -1,21 +1,62 @@
-import os
 import base64
 import time
 import logging
 import requests
+from requests.exceptions import Timeout
+
+from services.credential_pool import CredentialPool
 
 logger = logging.getLogger(__name__)
 
 TTS_ENDPOINT = 'https://texttospeech.googleapis.com/v1/text:synthesize'
 
 
+# Upstream phrases for requests rejected because the input is too long
+SIZE_ERROR_HINTS = ('longer than', 'too long', 'exceeds')
+
+
+class TTSApiError(RuntimeError):
+    """Non-200 response from a TTS API; `status_code` lets callers back off."""
+
+    def __init__(self, message, status_code, detail=''):
+        super().__init__(message)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def api_error_message(resp):
+    """Upstream error message of a failed response.
+
+    Proxies and load balancers answer 429/503 with HTML or plain text, so
+    a body that is not the API's JSON error falls back to its first bytes.
+    """
+    try:
+        return resp.json()['error']['message']
+    except (ValueError, KeyError, TypeError):
+        return resp.text[:200]
+
+
+def is_size_or_timeout_error(exc):
+    """True for failures a smaller request is likely to avoid."""
+    if isinstance(exc, Timeout):
+        return True
+    if not isinstance(exc, TTSApiError):
+        return False
+    if exc.status_code in (413, 504):
+        return True
+    detail = (exc.detail or '').lower()
+    return exc.status_code == 400 and any(hint in detail for hint in SIZE_ERROR_HINTS)
+
+
 class TTSClient:
     def __init__(self, voice_name='en-US-Studio-Q', language_code='en-US',
                  speaking_rate=0.95, pitch=-2.0, sample_rate_hertz=24000,
-                 chunk_delay=0.15):
-        self.api_key = os.environ.get('GOOGLE_API_KEY', '')
-        if not self.api_key:
+                 chunk_delay=0.15, credentials=None, category='cloud_tts',
+                 audio_encoding='LINEAR16'):
+        self.credentials = credentials or CredentialPool.from_env('GOOGLE_API_KEY')
+        if not self.credentials:
             raise RuntimeError('GOOGLE_API_KEY environment variable is not set')
+        self.category = category
 
         self.chunk_delay = chunk_delay
         self.voice_params = {
@@ -23,31 +64,39 @@ class TTSClient:
             'name': voice_name,
         }
         self.audio_config = {
-            'audioEncoding': 'LINEAR16',
+            'audioEncoding': audio_encoding,
             'speakingRate': speaking_rate,
             'pitch': pitch,
             'sampleRateHertz': sample_rate_hertz,
         }
 
     def synthesize_chunk(self, ssml: str) -> bytes:
-        """Send a single SSML chunk to Google TTS and return raw WAV bytes."""
+        """Send a single SSML chunk to Google TTS and return the audio bytes.
+
+        WAV for LINEAR16, otherwise an Ogg Opus or MP3 file.
+        """
         payload = {
             'input': {'ssml': ssml},
             'voice': self.voice_params,
             'audioConfig': self.audio_config,
         }
 
+        api_key = self.credentials.acquire(self.category)
         resp = requests.post(
             TTS_ENDPOINT,
-            params={'key': self.api_key},
+            params={'key': api_key},
             json=payload,
             timeout=30,
         )
 
         if resp.status_code != 200:
-            raw_error = resp.json().get('error', {}).get('message', resp.text)
+            raw_error = api_error_message(resp)
+            self.credentials.report(api_key, self.category, resp.status_code, raw_error)
             logger.error(f'Google TTS API error ({resp.status_code}): {raw_error}')
-            raise RuntimeError(f'TTS service returned an error (status {resp.status_code})')
+            raise TTSApiError(
+                f'TTS service returned an error (status {resp.status_code})',
+                resp.status_code, raw_error,
+            )
 
         audio_b64 = resp.json().get('audioContent', '')
         if not audio_b64:
@@ -1,5 +1,76 @@
 import struct
 import io
+from collections import namedtuple
+
+# Largest size a 32-bit RIFF/data size field can hold.  Files beyond it are
+# written as RF64 (EBU Tech 3306): the 32-bit fields are set to 0xFFFFFFFF
+# and the real sizes live in a 'ds64' chunk right after 'WAVE'.
+RIFF_SIZE_LIMIT = 0xFFFFFFFF
+_RF64_PLACEHOLDER = 0xFFFFFFFF
+_DS64 = struct.Struct('<QQQI')  # riff size, data size, sample count, table length
+
+WavInfo = namedtuple(
+    'WavInfo',
+    'channels sample_rate bits_per_sample byte_rate block_align data_offset data_size rf64',
+)
+
+
+def wav_header(data_size, sample_rate=24000, bits_per_sample=16, channels=1):
+    """Return a canonical PCM WAV header for `data_size` bytes of audio.
+
+    Switches to RF64 automatically when the sizes do not fit 32 bits.
+    """
+    byte_rate = sample_rate * channels * bits_per_sample // 8
+    block_align = channels * bits_per_sample // 8
+    fmt = struct.pack(
+        '<4sIHHIIHH',
+        b'fmt ', 16, 1, channels,
+        sample_rate, byte_rate, block_align, bits_per_sample,
+    )
+    if 36 + data_size <= RIFF_SIZE_LIMIT:
+        return struct.pack('<4sI4s', b'RIFF', 36 + data_size, b'WAVE') + fmt + \
+            struct.pack('<4sI', b'data', data_size)
+    ds64 = struct.pack('<4sI', b'ds64', _DS64.size) + _DS64.pack(
+        36 + 8 + _DS64.size + data_size, data_size, data_size // block_align, 0,
+    )
+    return struct.pack('<4sI4s', b'RF64', _RF64_PLACEHOLDER, b'WAVE') + ds64 + fmt + \
+        struct.pack('<4sI', b'data', _RF64_PLACEHOLDER)
+
+
+def read_wav_header(f):
+    """Parse a RIFF or RF64 WAV header from a binary file object.
+
+    Reads only the header chunks (seeking past anything else) and leaves
+    `f` positioned at the first audio byte.  Raises ValueError when the
+    stream is not a WAV file or has no 'data' chunk.
+    """
+    riff = f.read(12)
+    if len(riff) < 12 or riff[:4] not in (b'RIFF', b'RF64') or riff[8:12] != b'WAVE':
+        raise ValueError('Not a WAV file')
+    rf64 = riff[:4] == b'RF64'
+    ds64_data_size = None
+    fmt = None
+    while True:
+        header = f.read(8)
+        if len(header) < 8:
+            raise ValueError("No 'data' chunk found")
+        chunk_id, size = struct.unpack('<4sI', header)
+        if chunk_id == b'data':
+            if rf64 and size == _RF64_PLACEHOLDER and ds64_data_size is not None:
+                size = ds64_data_size
+            if fmt is None:
+                raise ValueError("'data' chunk before 'fmt ' chunk")
+            channels, sample_rate, byte_rate, block_align, bits = fmt
+            return WavInfo(channels, sample_rate, bits, byte_rate, block_align, f.tell(), size, rf64)
+        body = f.read(size) if chunk_id in (b'ds64', b'fmt ') else None
+        if chunk_id == b'ds64':
+            ds64_data_size = _DS64.unpack_from(body)[1]
+        elif chunk_id == b'fmt ':
+            fmt = struct.unpack_from('<HIIHH', body, 2)  # skips the format tag
+        else:
+            f.seek(size, io.SEEK_CUR)
+        if size % 2:
+            f.seek(1, io.SEEK_CUR)  # chunks are word-aligned
 
 
 class WavConcatenator:
@@ -48,8 +119,26 @@ class WavConcatenator:
         if len(wav_segments) == 1:
             return wav_segments[0]
 
+        out = io.BytesIO()
+        self.write(wav_segments, out)
+        return out.getvalue()
+
+    def write(self, wav_segments: list, f):
+        """Write the concatenation of `wav_segments` to file object `f`.
+
+        Streams the audio of each segment straight to `f` rather than
+        assembling the whole file in memory, and writes an RF64 header
+        when the result exceeds 4 GB.
+        """
+        if not wav_segments:
+            raise ValueError("No WAV segments to concatenate")
+
+        if len(wav_segments) == 1:
+            f.write(wav_segments[0])
+            return
+
         # ── Multi-segment concatenation ─────────────────────────────
-        all_audio = []
+        spans = []                # (segment index, audio start, audio size)
         header_bytes = None       # everything up to (not including) audio data
         data_size_offset = None   # byte offset of the data-chunk size field
 
@@ -69,12 +158,12 @@ class WavConcatenator:
                 raise ValueError(f"No 'data' chunk found in segment {i}")
 
             audio_start = data_pos + 8
-            audio = seg[audio_start:audio_start + data_size]
+            audio_size = min(data_size, len(seg) - audio_start)
 
-            if not audio:
+            if audio_size <= 0:
                 raise ValueError(f"Segment {i} 'data' chunk is empty")
 
-            all_audio.append(audio)
+            spans.append((i, audio_start, audio_size))
 
             # Keep the first segment's complete header (everything before
             # the audio samples).  This preserves 'fmt ', 'fact', 'LIST',
@@ -83,20 +172,35 @@ class WavConcatenator:
                 header_bytes = bytearray(seg[:audio_start])
                 data_size_offset = data_pos + 4
 
-        total_audio_bytes = sum(len(a) for a in all_audio)
+        total_audio_bytes = sum(size for _i, _start, size in spans)
         if total_audio_bytes == 0:
             raise ValueError("All segments were empty after parsing")
 
         # Patch the two size fields in the header
         # RIFF chunk size (offset 4) = total_file_size - 8
         riff_size = (len(header_bytes) - 8) + total_audio_bytes
-        struct.pack_into('<I', header_bytes, 4, riff_size)
-        # data chunk size
-        struct.pack_into('<I', header_bytes, data_size_offset, total_audio_bytes)
-
-        out = io.BytesIO()
-        out.write(header_bytes)
-        for audio in all_audio:
-            out.write(audio)
-        out.seek(0)
-        return out.read()
+        if riff_size <= RIFF_SIZE_LIMIT:
+            struct.pack_into('<I', header_bytes, 4, riff_size)
+            struct.pack_into('<I', header_bytes, data_size_offset, total_audio_bytes)
+        else:
+            header_bytes = self._rf64_header(header_bytes, data_size_offset, total_audio_bytes)
+
+        f.write(header_bytes)
+        for i, start, size in spans:
+            f.write(memoryview(wav_segments[i])[start:start + size])
+
+    def _rf64_header(self, header_bytes, data_size_offset, total_audio_bytes):
+        """Rebuild a RIFF header as RF64 with a 'ds64' chunk after 'WAVE'."""
+        struct.pack_into('<I', header_bytes, data_size_offset, _RF64_PLACEHOLDER)
+        fmt_pos, _fmt_size = self._find_chunk(header_bytes, b'fmt ')
+        block_align = struct.unpack_from('<H', header_bytes, fmt_pos + 8 + 12)[0] if fmt_pos else 0
+        ds64_chunk_size = 8 + _DS64.size
+        riff_size = len(header_bytes) + ds64_chunk_size - 8 + total_audio_bytes
+        ds64 = struct.pack('<4sI', b'ds64', _DS64.size) + _DS64.pack(
+            riff_size, total_audio_bytes,
+            total_audio_bytes // block_align if block_align else 0, 0,
+        )
+        return (
+            struct.pack('<4sI4s', b'RF64', _RF64_PLACEHOLDER, b'WAVE')
+            + ds64 + bytes(header_bytes[12:])
+        )
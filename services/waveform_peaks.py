@@ -0,0 +1,139 @@
+import io
+import mmap
+import struct
+import sys
+from array import array
+
+from services.wav_concatenator import read_wav_header
+
+try:
+    import numpy as np
+except ImportError:  # optional; the array fallback produces identical peaks
+    np = None
+
+PEAKS_PER_SECOND = 20
+PEAKS_EXTENSION = 'peaks'
+
+# Sidecar layout: header, then one signed byte min/max pair per bucket.
+# 8-bit resolution is plenty for drawing a waveform.
+_PEAKS_MAGIC = b'PEAK'
+_PEAKS_HEADER = struct.Struct('<4sIII')   # magic, sample rate, samples per peak, pairs
+_FEED_BLOCK = 4 * 1024 * 1024
+
+
+def peaks_path_for(audio_path):
+    """Return the sidecar path (or storage key) holding the peaks of `audio_path`."""
+    return audio_path.rsplit('.', 1)[0] + '.' + PEAKS_EXTENSION
+
+
+def _samples(pcm):
+    """Little-endian 16-bit PCM as an array('h') in native byte order."""
+    samples = array('h')
+    samples.frombytes(pcm)
+    if sys.byteorder == 'big':
+        samples.byteswap()
+    return samples
+
+
+class PeakBuilder:
+    """Reduce 16-bit PCM to a min/max pair per fixed-size bucket.
+
+    PCM can be fed in pieces of any length; samples that do not fill a
+    bucket are carried over to the next call.  Each bucket is reduced with
+    NumPy when it is installed, otherwise with C-level min()/max() over
+    `array('h')` slices, so no Python loop ever touches single samples.
+    """
+
+    def __init__(self, sample_rate, channels=1, peaks_per_second=PEAKS_PER_SECOND):
+        self.sample_rate = sample_rate
+        self.samples_per_peak = max(1, sample_rate // peaks_per_second)
+        self._bucket_bytes = self.samples_per_peak * channels * 2
+        self._carry = b''
+        self._pairs = array('b')
+
+    def feed(self, pcm):
+        if self._carry:
+            pcm = self._carry + bytes(pcm)
+        usable = len(pcm) - len(pcm) % self._bucket_bytes
+        if usable:
+            self._reduce(memoryview(pcm)[:usable])
+        self._carry = bytes(pcm[usable:])
+
+    def _reduce(self, pcm):
+        n = self._bucket_bytes // 2
+        if np is not None:
+            buckets = np.frombuffer(pcm, dtype='<i2').reshape(-1, n)
+            pairs = np.empty((len(buckets), 2), dtype=np.int8)
+            pairs[:, 0] = buckets.min(axis=1) >> 8
+            pairs[:, 1] = buckets.max(axis=1) >> 8
+            self._pairs.frombytes(pairs.tobytes())
+            return
+        samples = _samples(pcm)
+        pairs = self._pairs
+        for start in range(0, len(samples), n):
+            bucket = samples[start:start + n]
+            pairs.append(min(bucket) >> 8)
+            pairs.append(max(bucket) >> 8)
+
+    def finish(self):
+        """Flush the partial last bucket and return the interleaved pairs."""
+        if len(self._carry) >= 2:
+            samples = _samples(self._carry[:len(self._carry) - len(self._carry) % 2])
+            self._pairs.append(min(samples) >> 8)
+            self._pairs.append(max(samples) >> 8)
+        self._carry = b''
+        return self._pairs
+
+    def write(self, f):
+        """Write the peaks sidecar to file object `f`."""
+        pairs = self.finish()
+        f.write(_PEAKS_HEADER.pack(
+            _PEAKS_MAGIC, self.sample_rate, self.samples_per_peak, len(pairs) // 2,
+        ))
+        f.write(pairs.tobytes())
+
+
+def peaks_from_segments(wav_segments):
+    """Build peaks for the concatenation of 16-bit PCM WAV segments."""
+    builder = None
+    for seg in wav_segments:
+        info = read_wav_header(io.BytesIO(seg))
+        if info.bits_per_sample != 16:
+            raise ValueError(f'Unsupported sample width: {info.bits_per_sample} bits')
+        if builder is None:
+            builder = PeakBuilder(info.sample_rate, info.channels)
+        end = min(info.data_offset + info.data_size, len(seg))
+        builder.feed(memoryview(seg)[info.data_offset:end])
+    if builder is None:
+        raise ValueError('No WAV segments')
+    return builder
+
+
+def peaks_from_file(path):
+    """Build peaks for a stored WAV, memory-mapping it instead of reading it."""
+    with open(path, 'rb') as f:
+        info = read_wav_header(f)
+        if info.bits_per_sample != 16:
+            raise ValueError(f'Unsupported sample width: {info.bits_per_sample} bits')
+        builder = PeakBuilder(info.sample_rate, info.channels)
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            end = min(info.data_offset + info.data_size, len(mm))
+            view = memoryview(mm)
+            try:
+                for start in range(info.data_offset, end, _FEED_BLOCK):
+                    builder.feed(view[start:min(start + _FEED_BLOCK, end)])
+            finally:
+                view.release()
+    return builder
+
+
+def read_peaks(data):
+    """Return (sample_rate, samples_per_peak, pairs) from a peaks sidecar's bytes."""
+    if len(data) < _PEAKS_HEADER.size:
+        raise ValueError('Truncated peaks file')
+    magic, sample_rate, samples_per_peak, count = _PEAKS_HEADER.unpack_from(data)
+    if magic != _PEAKS_MAGIC:
+        raise ValueError('Not a peaks file')
+    pairs = array('b')
+    pairs.frombytes(data[_PEAKS_HEADER.size:_PEAKS_HEADER.size + count * 2])
+    return sample_rate, samples_per_peak, pairs
@@ -0,0 +1,59 @@
+import time
+import zipfile
+
+
+class _DrainableBuffer:
+    """Write-only, unseekable sink for ZipFile whose contents can be drained.
+
+    ZipFile falls back to data descriptors when it cannot seek, so entries
+    are written strictly front to back and nothing is ever patched later.
+    """
+
+    def __init__(self):
+        self._parts = []
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._parts)
+        self._parts = []
+        return data
+
+
+def stream_zip(entries):
+    """Yield a ZIP archive piece by piece.
+
+    `entries` is an iterable of (arcname, source, mtime, compress) where
+    `source` is bytes or an iterable of byte blocks (such as a storage
+    read), `mtime` is a Unix timestamp and `compress` selects DEFLATE over
+    STORED.  Only one block is held in memory at a time.  Streamed entries
+    always get ZIP64 records, since their size is not known up front.
+    """
+    for piece in _zip_pieces(entries):
+        if piece:
+            yield piece
+
+
+def _zip_pieces(entries):
+    sink = _DrainableBuffer()
+    with zipfile.ZipFile(sink, 'w', allowZip64=True) as archive:
+        for arcname, source, mtime, compress in entries:
+            info = zipfile.ZipInfo(arcname, date_time=time.localtime(mtime)[:6])
+            info.compress_type = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+            info.external_attr = 0o644 << 16
+            if isinstance(source, bytes):
+                info.file_size = len(source)
+                with archive.open(info, 'w') as dest:
+                    dest.write(source)
+            else:
+                with archive.open(info, 'w', force_zip64=True) as dest:
+                    for block in source:
+                        dest.write(block)
+                        yield sink.drain()
+            yield sink.drain()
+    yield sink.drain()
@@ -11,8 +11,9 @@ class VoiceBrowser {
         this.isOpen = false;
         this.onChange = options.onChange || (() => {});
 
-        // Audio preview
+        // Audio preview (samples are only fetched when a preview is played)
         this.previewAudio = new Audio();
+        this.previewAudio.preload = 'none';
         this.previewingVoice = null;
 
         this.els = {
@@ -232,8 +233,11 @@ class VoiceBrowser {
         btn.classList.add('playing');
         btn.innerHTML = '&#9646;&#9646; Stop';
         this.previewingVoice = voiceName;
-        this.previewAudio.src = '/static/samples/' + voiceName + '.wav';
-        this.previewAudio.play().catch(() => {
+        VoiceSamples.url(voiceName).then(url => {
+            if (this.previewingVoice !== voiceName) return;
+            this.previewAudio.src = url;
+            return this.previewAudio.play();
+        }).catch(() => {
             // Sample file might not exist yet
             btn.classList.remove('playing');
             btn.innerHTML = '&#9654; Preview';
@@ -963,7 +967,11 @@ class StorytellerApp {
             this.els.progressBar.style.width = pct + '%';
             this.els.progressChunks.textContent = completed + ' / ' + total;
 
-            if (completed > 0) {
+            if (data.status === 'queued') {
+                this.els.progressTime.textContent = data.queue_position
+                    ? 'Waiting in queue (position ' + data.queue_position + ')...'
+                    : 'Waiting in queue...';
+            } else if (completed > 0) {
                 const elapsed = (Date.now() - this.startTime) / 1000;
                 const avgPerChunk = elapsed / completed;
                 const remaining = avgPerChunk * (total - completed);
@@ -974,7 +982,7 @@ class StorytellerApp {
                 clearInterval(this.pollInterval);
                 this.els.progressSection.hidden = true;
                 this.els.resultSection.hidden = false;
-                this.els.audioPlayer.src = '/api/stream/' + this.jobId;
+                this.els.audioPlayer.src = data.stream_url || '/api/stream/' + this.jobId;
                 this.els.audioPlayer.load();
                 this.resetButton();
 
@@ -0,0 +1,30 @@
+// ── Voice Preview Samples ────────────────────────────────────
+// Shared by the landing page and the voice browser.
+
+const VoiceSamples = (() => {
+    const canPlayOpus = new Audio().canPlayType('audio/ogg; codecs="opus"') !== '';
+    let manifest = null;
+
+    function loadManifest() {
+        // Fetched once, on the first preview
+        if (!manifest) {
+            manifest = fetch('/static/samples/manifest.json')
+                .then(resp => resp.ok ? resp.json() : {voices: {}})
+                .catch(() => ({voices: {}}));
+        }
+        return manifest;
+    }
+
+    // Resolve to the compact Opus preview when the manifest lists one and
+    // the browser plays Opus; otherwise to the WAV
+    function url(voiceName) {
+        const base = '/static/samples/' + voiceName;
+        if (!canPlayOpus) return Promise.resolve(base + '.wav');
+        return loadManifest().then(m => {
+            const entry = (m.voices || {})[voiceName];
+            return entry && entry.ogg_bytes ? base + '.ogg' : base + '.wav';
+        });
+    }
+
+    return {url};
+})();
@@ -0,0 +1,22 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Let tests import app modules (services.*, app) from the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Importing app reads its config from the environment: keep audio files and
+# the job queue of any test that needs the app out of the working tree.
+os.environ.setdefault('DATA_DIR', tempfile.mkdtemp(prefix='storyteller-tests-'))
+os.environ.setdefault('SECRET_KEY', 'test-secret')
+
+
+@pytest.fixture(autouse=True)
+def reset_rate_limits():
+    """Every test starts with an empty per-IP request log."""
+    app = sys.modules.get('app')
+    if app is not None:
+        app.ip_request_log.clear()
+    yield
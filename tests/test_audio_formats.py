@@ -0,0 +1,90 @@
+import os
+import shutil
+import struct
+import subprocess
+
+import pytest
+
+from services.audio_formats import OggOpusConcatenator, _ogg_crc, _ogg_pages
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+
+def load_segments():
+    """Ogg Opus files from libopus (24 kHz mono, as Cloud TTS returns them)."""
+    segments = []
+    for i in (1, 2, 3):
+        with open(os.path.join(FIXTURES, f'segment{i}.opus.ogg'), 'rb') as f:
+            segments.append(f.read())
+    return segments
+
+
+def page_headers(data):
+    """Yield (header_type, granule, serial, sequence, crc_ok) for each page."""
+    pos = 0
+    while pos < len(data):
+        nsegs = data[pos + 26]
+        end = pos + 27 + nsegs + sum(data[pos + 27:pos + 27 + nsegs])
+        page = bytearray(data[pos:end])
+        crc = struct.unpack_from('<I', page, 22)[0]
+        struct.pack_into('<I', page, 22, 0)
+        header_type, granule, serial, seq = struct.unpack_from('<BqII', data, pos + 5)
+        yield header_type, granule, serial, seq, _ogg_crc(page) == crc
+        pos = end
+
+
+def test_joined_timeline_counts_every_decoded_sample():
+    segments = load_segments()
+    joined = OggOpusConcatenator().concatenate(segments)
+    # 0.4 s and 0.5 s of audio plus 312 priming samples decode to 21 and
+    # 26 whole 20 ms frames (0.42 s, 0.52 s); only the first pre-skip and
+    # the last segment's end padding are trimmed.
+    spans = OggOpusConcatenator.joined_durations(segments)
+    assert spans == pytest.approx([0.42, 0.52, 2.5])
+    assert OggOpusConcatenator.duration_seconds(joined) == pytest.approx(sum(spans))
+    assert spans[-1] == pytest.approx(OggOpusConcatenator.duration_seconds(segments[-1]))
+
+
+def test_single_segment_span_is_its_duration():
+    segment = load_segments()[1]
+    assert OggOpusConcatenator.joined_durations([segment]) == \
+        [OggOpusConcatenator.duration_seconds(segment)]
+
+
+def test_joined_file_is_one_logical_stream():
+    segments = load_segments()
+    joined = OggOpusConcatenator().concatenate(segments)
+    pages = list(page_headers(joined))
+
+    assert all(crc_ok for *_, crc_ok in pages)
+    assert {serial for _, _, serial, _, _ in pages} == {struct.unpack_from('<I', segments[0], 14)[0]}
+    assert [seq for _, _, _, seq, _ in pages] == list(range(len(pages)))
+    assert [bool(h & 0x02) for h, *_ in pages] == [True] + [False] * (len(pages) - 1)
+    assert [bool(h & 0x04) for h, *_ in pages] == [False] * (len(pages) - 1) + [True]
+
+    granules = [g for _, g, _, _, _ in pages if g > 0]
+    assert granules == sorted(set(granules))
+
+    bodies = [body for _, _, _, body in _ogg_pages(joined)]
+    assert sum(body[:8] == b'OpusHead' for body in bodies) == 1
+    assert sum(body[:8] == b'OpusTags' for body in bodies) == 1
+
+
+def test_single_segment_is_returned_unchanged():
+    segment = load_segments()[0]
+    assert OggOpusConcatenator().concatenate([segment]) == segment
+
+
+@pytest.mark.skipif(not shutil.which('ffmpeg'), reason='ffmpeg not installed')
+def test_joined_file_decodes_to_its_duration(tmp_path):
+    segments = load_segments()
+    path = tmp_path / 'joined.ogg'
+    path.write_bytes(OggOpusConcatenator().concatenate(segments))
+    result = subprocess.run(
+        ['ffmpeg', '-v', 'warning', '-i', str(path), '-f', 's16le', '-ac', '1', '-ar', '48000', '-'],
+        capture_output=True,
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stderr == b''   # no timestamp warnings at the splices
+    decoded_seconds = len(result.stdout) / 2 / 48000
+    assert decoded_seconds == pytest.approx(OggOpusConcatenator.duration_seconds(path.read_bytes()))
@@ -0,0 +1,95 @@
+from unittest import mock
+
+import pytest
+from bson import ObjectId
+
+import app as storyteller
+from services.audio_storage import storage_key
+
+FILENAME = 'a1b2c3d4-0000-4000-8000-000000000040.wav'
+
+
+@pytest.fixture
+def library(tmp_path, monkeypatch):
+    """A logged-in client whose one library file is stored under tmp_path."""
+    monkeypatch.setattr(storyteller.audio_storage, 'root', str(tmp_path))
+    monkeypatch.setitem(storyteller.app.config, 'AUDIO_DIR', str(tmp_path))
+    db = mock.MagicMock()
+    user_id, audio_id = ObjectId(), ObjectId()
+    db.users.find_one.return_value = {'_id': user_id, 'email': 'gm@example.com', 'tier': 'bard'}
+    db.audio_files.find_one.return_value = {
+        '_id': audio_id, 'user_id': user_id, 'filename': FILENAME,
+        'title': 'The Lost Mine', 'audio_format': 'wav',
+    }
+    monkeypatch.setattr(storyteller, 'get_db', lambda: db)
+    (tmp_path / str(user_id)).mkdir()
+    (tmp_path / str(user_id) / FILENAME).write_bytes(b'RIFF-library-audio')
+    client = storyteller.app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = str(user_id)
+    return client, f'/api/library/{audio_id}', tmp_path / str(user_id) / FILENAME
+
+
+def test_x_accel_hands_the_file_to_nginx(library, monkeypatch):
+    client, url, path = library
+    monkeypatch.setitem(storyteller.app.config, 'AUDIO_OFFLOAD', 'x-accel')
+    monkeypatch.setitem(storyteller.app.config, 'AUDIO_ACCEL_PREFIX', '/_protected_audio/')
+
+    response = client.get(f'{url}/stream', headers={'Range': 'bytes=0-3'})
+
+    assert response.status_code == 200   # nginx answers the Range itself
+    assert response.headers['X-Accel-Redirect'] == f'/_protected_audio/{path.parent.name}/{FILENAME}'
+    assert 'X-Sendfile' not in response.headers
+    assert response.headers['Content-Type'] == 'audio/wav'
+    assert response.headers['Accept-Ranges'] == 'bytes'
+    assert response.get_data() == b''
+
+
+def test_x_sendfile_names_the_absolute_path(library, monkeypatch):
+    client, url, path = library
+    monkeypatch.setitem(storyteller.app.config, 'AUDIO_OFFLOAD', 'x-sendfile')
+
+    response = client.get(f'{url}/download')
+
+    assert response.headers['X-Sendfile'] == str(path)
+    assert 'X-Accel-Redirect' not in response.headers
+    assert response.headers['Content-Disposition'] == 'attachment; filename="The Lost Mine.wav"'
+    assert response.get_data() == b''
+
+
+@pytest.mark.parametrize('mode', ['', 'bogus'])
+def test_without_offload_the_app_sends_the_file(library, monkeypatch, mode):
+    client, url, _path = library
+    monkeypatch.setitem(storyteller.app.config, 'AUDIO_OFFLOAD', mode)
+
+    response = client.get(f'{url}/stream')
+    assert response.status_code == 200
+    assert 'X-Accel-Redirect' not in response.headers
+    assert 'X-Sendfile' not in response.headers
+    assert response.get_data() == b'RIFF-library-audio'
+
+    partial = client.get(f'{url}/stream', headers={'Range': 'bytes=5-11'})
+    assert partial.status_code == 206
+    assert partial.get_data() == b'library'
+
+
+def test_files_outside_the_offload_root_are_sent_by_the_app(library, monkeypatch, tmp_path):
+    client, url, _path = library
+    monkeypatch.setitem(storyteller.app.config, 'AUDIO_OFFLOAD', 'x-accel')
+    monkeypatch.setitem(storyteller.app.config, 'AUDIO_DIR', str(tmp_path / 'elsewhere'))
+
+    response = client.get(f'{url}/stream')
+
+    assert 'X-Accel-Redirect' not in response.headers
+    assert response.get_data() == b'RIFF-library-audio'
+
+
+def test_offload_keeps_the_storage_key_layout(library, monkeypatch):
+    _client, _url, path = library
+    monkeypatch.setitem(storyteller.app.config, 'AUDIO_OFFLOAD', 'x-accel')
+    monkeypatch.setitem(storyteller.app.config, 'AUDIO_ACCEL_PREFIX', '/internal')
+
+    with storyteller.app.test_request_context():
+        response = storyteller.send_audio_file(storage_key(path.parent.name, FILENAME))
+
+    assert response.headers['X-Accel-Redirect'] == f'/internal/{path.parent.name}/{FILENAME}'
@@ -0,0 +1,94 @@
+from unittest import mock
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+from bson import ObjectId
+
+import app as storyteller
+from services.audio_urls import AudioUrlSigner
+
+FILENAME = 'a1b2c3d4-0000-4000-8000-000000000006.wav'
+
+
+def test_signer_round_trip_and_expiry_windows():
+    signer = AudioUrlSigner('secret', ttl=600, granularity=100)
+    expires = signer.expiry(now=1050)
+    assert expires == 1100 + 600
+    assert signer.expiry(now=1099) == expires   # same window, same URL
+
+    sig = signer.signature('u', 'a', 'f.wav', expires)
+    assert signer.verify('u', 'a', 'f.wav', expires, sig, now=1050)
+    assert signer.verify('u', 'a', 'f.wav', str(expires), sig, now=expires)
+    assert not signer.verify('u', 'a', 'f.wav', expires, sig, now=expires + 1)
+    assert not signer.verify('u', 'a', 'f.wav', 'soon', sig, now=1050)
+    assert not signer.verify('u', 'a', 'f.wav', expires, None, now=1050)
+    assert not AudioUrlSigner('other').verify('u', 'a', 'f.wav', expires, sig, now=1050)
+
+
+@pytest.fixture
+def signed(tmp_path, monkeypatch):
+    """A stored file and a signed URL for it; get_db must never be used."""
+    monkeypatch.setattr(storyteller, 'get_db', mock.Mock(side_effect=AssertionError('database used')))
+    monkeypatch.setattr(storyteller.audio_storage, 'root', str(tmp_path))
+    user_id, audio_id = str(ObjectId()), str(ObjectId())
+    (tmp_path / user_id).mkdir()
+    (tmp_path / user_id / FILENAME).write_bytes(b'RIFF-signed-audio')
+    with storyteller.app.test_request_context():
+        url = storyteller.signed_audio_url(user_id, audio_id, FILENAME)
+    parts = urlsplit(url)
+    query = {k: v[0] for k, v in parse_qs(parts.query).items()}
+    return storyteller.app.test_client(), parts.path, query, (user_id, audio_id)
+
+
+def get(client, path, query):
+    return client.get(path, query_string=query)
+
+
+def test_valid_signature_streams_without_a_session(signed):
+    client, path, query, _ids = signed
+
+    response = get(client, path, query)
+
+    assert response.status_code == 200
+    assert response.get_data() == b'RIFF-signed-audio'
+    assert response.cache_control.private
+    assert 0 < response.cache_control.max_age <= 3600
+
+
+@pytest.mark.parametrize('part', ['user_id', 'audio_id', 'filename'])
+def test_tampered_path_is_forbidden(signed, part):
+    client, path, query, (user_id, audio_id) = signed
+    replacement = {
+        'user_id': (user_id, str(ObjectId())),
+        'audio_id': (audio_id, str(ObjectId())),
+        'filename': (FILENAME, FILENAME.replace('0006', '0007')),
+    }[part]
+
+    assert get(client, path.replace(*replacement), query).status_code == 403
+
+
+def test_tampered_signature_or_expiry_is_forbidden(signed):
+    client, path, query, _ids = signed
+    flipped = ('A' if query['sig'][0] != 'A' else 'B') + query['sig'][1:]
+
+    assert get(client, path, dict(query, sig=flipped)).status_code == 403
+    assert get(client, path, dict(query, expires=str(int(query['expires']) + 3600))).status_code == 403
+    assert get(client, path, {'expires': query['expires']}).status_code == 403
+
+
+def test_expired_url_is_forbidden(signed, monkeypatch):
+    client, path, query, _ids = signed
+    monkeypatch.setattr(storyteller.time, 'time', lambda: int(query['expires']) + 1)
+
+    assert get(client, path, query).status_code == 403
+
+
+@pytest.mark.parametrize('filename', ['..%2F..%2Fapp.py', 'notes.txt', 'A1B2C3D4-0000-4000-8000-000000000006.wav'])
+def test_non_uuid_filename_is_rejected_before_verifying(signed, filename):
+    client, path, query, (user_id, audio_id) = signed
+    with storyteller.app.test_request_context():
+        sig = storyteller.audio_url_signer.signature(user_id, audio_id, filename, query['expires'])
+
+    response = get(client, path.replace(FILENAME, filename), dict(query, sig=sig))
+
+    assert response.status_code in (400, 404)
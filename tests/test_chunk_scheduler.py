@@ -0,0 +1,241 @@
+import threading
+import time
+
+import pytest
+
+from services.chunk_scheduler import ChunkScheduler
+from services.concurrency_controller import AimdController
+from services.tts_client import TTSApiError
+
+
+class TooLong(Exception):
+    pass
+
+
+class Recorder:
+    """TTS stand-in that logs (start time, text) and rejects long texts."""
+
+    def __init__(self, max_len=None):
+        self.max_len = max_len
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def __call__(self, text):
+        with self.lock:
+            self.calls.append((time.monotonic(), text))
+        if self.max_len is not None and len(text) > self.max_len:
+            raise TooLong(text)
+        return text.upper()
+
+
+def halve(text, error, depth):
+    if not isinstance(error, TooLong) or depth >= 3:
+        return None
+    words = text.split(' ')
+    if len(words) < 2:
+        return None
+    return [' '.join(words[:len(words) // 2]), ' '.join(words[len(words) // 2:])]
+
+
+@pytest.fixture
+def scheduler():
+    return ChunkScheduler(max_workers=4, retry_delay=0.01)
+
+
+def test_split_pieces_are_joined_back_in_place(scheduler):
+    fn = Recorder(max_len=12)
+    chunks = ['one two', 'three four five six seven eight', 'nine']
+    progress = []
+
+    results = scheduler.run(
+        'job', 'cat', min_interval=0.0, weight=1.0, fn=fn, chunks=chunks,
+        progress_callback=lambda done, total: progress.append((done, total)),
+        split=halve, join=' | '.join,
+    )
+
+    assert results[0] == 'ONE TWO'
+    assert results[1].replace(' | ', ' ') == 'THREE FOUR FIVE SIX SEVEN EIGHT'
+    assert ' | ' in results[1]
+    assert results[2] == 'NINE'
+    assert sorted(progress)[-1] == (3, 3)
+    assert all(total == 3 for _, total in progress)
+
+
+def test_split_pieces_keep_the_category_pacing(scheduler):
+    fn = Recorder(max_len=8)
+    interval = 0.05
+
+    scheduler.run(
+        'job', 'cat', min_interval=interval, weight=1.0, fn=fn,
+        chunks=['alpha beta gamma delta', 'epsilon'], split=halve, join=''.join,
+    )
+
+    starts = sorted(t for t, _ in fn.calls)
+    assert len(starts) > 3   # the long chunk was re-split at least once
+    gaps = [b - a for a, b in zip(starts, starts[1:])]
+    assert min(gaps) >= interval * 0.9
+    assert scheduler.stats()['cat']['requests'] == len(fn.calls)
+
+
+def test_chunk_that_cannot_be_split_fails_the_job(scheduler):
+    fn = Recorder(max_len=3)
+    with pytest.raises(RuntimeError, match='chunk 2 of 2'):
+        scheduler.run(
+            'job', 'cat', min_interval=0.0, weight=1.0, fn=fn,
+            chunks=['ok', 'unsplittable'], split=halve, join=''.join,
+        )
+
+
+def run_jobs(scheduler, jobs, interval):
+    """Run (job_id, weight, chunk count) jobs together; return the call order by job."""
+    order, lock = [], threading.Lock()
+
+    def fn(text):
+        with lock:
+            order.append(text.split(':')[0])
+        return text
+
+    threads = []
+    for job_id, weight, count in jobs:
+        chunks = [f'{job_id}:{i}' for i in range(count)]
+        thread = threading.Thread(target=scheduler.run, args=(job_id, 'cat', interval, weight, fn, chunks))
+        thread.start()
+        threads.append(thread)
+        time.sleep(interval / 4)
+    for thread in threads:
+        thread.join(timeout=10)
+    return order
+
+
+def test_wfq_shares_requests_by_weight():
+    scheduler = ChunkScheduler(max_workers=2, short_job_chunks=0)
+
+    order = run_jobs(scheduler, [('heavy', 2.0, 40), ('light', 1.0, 40)], interval=0.01)
+
+    assert len(order) == 80
+    window = order[:30]   # while both jobs still have chunks
+    assert 17 <= window.count('heavy') <= 23
+
+
+def test_short_job_is_not_stuck_behind_a_long_one():
+    scheduler = ChunkScheduler(max_workers=2, short_job_chunks=10)
+
+    order = run_jobs(scheduler, [('long', 1.0, 60), ('short', 1.0, 3)], interval=0.01)
+
+    first_short = order.index('short')
+    last_short = len(order) - 1 - order[::-1].index('short')
+    assert first_short < 5
+    assert last_short - first_short < 8
+
+
+class Latencies:
+    """TTS stand-in whose n-th call for a text sleeps/raises as scripted.
+
+    `script[text]` lists (seconds, outcome) per call; an Exception outcome
+    is raised, anything else returned.  Unscripted calls take `default`.
+    """
+
+    def __init__(self, script=None, default=0.005):
+        self.script = script or {}
+        self.default = default
+        self.calls = {}
+        self.finished = threading.Semaphore(0)
+        self.lock = threading.Lock()
+
+    def __call__(self, text):
+        with self.lock:
+            n = self.calls[text] = self.calls.get(text, 0) + 1
+        steps = self.script.get(text, [])
+        seconds, outcome = steps[n - 1] if n <= len(steps) else (self.default, f'{text}#{n}')
+        try:
+            time.sleep(seconds)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+        finally:
+            self.finished.release()
+
+    def wait_for(self, count, timeout=5):
+        for _ in range(count):
+            assert self.finished.acquire(timeout=timeout)
+
+
+class CountingController(AimdController):
+    def __init__(self):
+        super().__init__(initial=8, max_limit=8)
+        self.successes = 0
+
+    def on_success(self, key, latency):
+        self.successes += 1
+        super().on_success(key, latency)
+
+
+def hedging_scheduler(ratio=1.0, controller=None):
+    scheduler = ChunkScheduler(max_workers=8, retry_delay=0.01, hedge_ratio=ratio,
+                               hedge_min_samples=5, controller=controller)
+    warmup = Latencies()
+    scheduler.run('warmup', 'cat', 0.0, 1.0, warmup, [f'w{i}' for i in range(10)])
+    return scheduler
+
+
+def test_no_hedges_before_enough_latency_samples():
+    scheduler = ChunkScheduler(max_workers=4, hedge_ratio=1.0, hedge_min_samples=50)
+    fn = Latencies({'slow': [(0.1, 'SLOW')]})
+
+    assert scheduler.run('job', 'cat', 0.0, 1.0, fn, ['a', 'slow']) == ['a#1', 'SLOW']
+    assert fn.calls['slow'] == 1
+    assert scheduler.stats()['cat']['hedges'] == 0
+
+
+def test_request_past_p95_is_hedged_and_first_success_wins():
+    controller = CountingController()
+    scheduler = hedging_scheduler(controller=controller)
+    before = controller.successes
+    hedged_before = dict(scheduler.stats()['cat'])   # the warm-up may hedge too
+    progress = []
+    fn = Latencies({'slow': [(0.4, 'LATE PRIMARY'), (0.01, 'HEDGE')]})
+
+    started = time.monotonic()
+    results = scheduler.run('job', 'cat', 0.0, 1.0, fn, ['slow'],
+                            progress_callback=lambda done, total: progress.append(done))
+    assert time.monotonic() - started < 0.3
+    assert results == ['HEDGE']
+
+    fn.wait_for(2)   # let the losing primary finish
+    time.sleep(0.02)
+    stats = scheduler.stats()['cat']
+    assert stats['hedges'] - hedged_before['hedges'] == 1
+    assert stats['hedge_wins'] - hedged_before['hedge_wins'] == 1
+    assert progress == [1]
+    assert controller.successes - before == 1
+
+
+def test_failed_primary_does_not_fail_the_chunk_while_its_hedge_runs():
+    scheduler = hedging_scheduler()
+    fn = Latencies({'slow': [(0.15, TTSApiError('bad gateway', 502)), (0.3, 'HEDGE')]})
+
+    assert scheduler.run('job', 'cat', 0.0, 1.0, fn, ['slow']) == ['HEDGE']
+    assert fn.calls['slow'] == 2   # no retry was queued
+
+
+def test_losing_primary_that_fails_late_leaves_the_result_alone():
+    controller = CountingController()
+    scheduler = hedging_scheduler(controller=controller)
+    before = controller.successes
+    fn = Latencies({'slow': [(0.3, TTSApiError('bad gateway', 502)), (0.01, 'HEDGE')]})
+
+    assert scheduler.run('job', 'cat', 0.0, 1.0, fn, ['slow', 'next']) == ['HEDGE', 'next#1']
+    fn.wait_for(3)
+    time.sleep(0.02)
+    assert fn.calls == {'slow': 2, 'next': 1}
+    assert controller.successes - before == 2
+
+
+def test_hedges_are_limited_by_the_token_bucket():
+    scheduler = hedging_scheduler(ratio=0.1)
+    fn = Latencies({f's{i}': [(0.1, f'S{i}')] for i in range(20)}, default=0.1)
+
+    scheduler.run('job', 'cat', 0.0, 1.0, fn, [f's{i}' for i in range(20)])
+
+    stats = scheduler.stats()['cat']
+    assert 1 <= stats['hedges'] <= int(0.1 * stats['requests'])
@@ -0,0 +1,138 @@
+import pytest
+
+from services import concurrency_controller
+from services.chunk_scheduler import ChunkScheduler
+from services.concurrency_controller import OVERLOAD_STATUSES, AimdController
+from services.tts_client import TTSApiError
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(concurrency_controller.time, 'monotonic', clock)
+    return clock
+
+
+def test_success_grows_the_limit_additively(clock):
+    controller = AimdController(initial=2, max_limit=100, increase=1.0)
+
+    # increase / limit per success: about +1 per round trip of `limit` requests
+    for _ in range(2):
+        controller.on_success('cat', 0.5)
+    assert controller.limit('cat') == 2
+    assert controller._limits['cat'].limit == pytest.approx(2 + 1 / 2 + 1 / 2.5)
+
+    for _ in range(20):
+        controller.on_success('cat', 0.5)
+    assert 6 <= controller.limit('cat') <= 7
+
+
+def test_overload_cuts_the_limit_multiplicatively(clock):
+    controller = AimdController(initial=8, decrease=0.5)
+
+    controller.on_overload('cat')
+    assert controller.limit('cat') == 4
+    clock.now += 10
+    controller.on_overload('cat')
+    assert controller.limit('cat') == 2
+
+
+def test_overloads_within_one_baseline_latency_count_once(clock):
+    controller = AimdController(initial=8, max_limit=8, decrease=0.5)
+    controller.on_success('cat', 2.0)   # baseline latency of 2 s
+
+    controller.on_overload('cat')
+    controller.on_overload('cat')
+    assert controller.limit('cat') == 4
+    clock.now += 2.5
+    controller.on_overload('cat')
+    assert controller.limit('cat') == 2
+
+
+def test_limit_stays_between_floor_and_ceiling(clock):
+    controller = AimdController(initial=3, min_limit=2, max_limit=5)
+
+    for _ in range(500):
+        controller.on_success('cat', 0.1)
+    assert controller.limit('cat') == 5
+
+    for _ in range(10):
+        clock.now += 10
+        controller.on_overload('cat')
+    assert controller.limit('cat') == 2
+
+
+def test_latency_spike_after_warmup_counts_as_overload(clock):
+    controller = AimdController(initial=4, max_limit=4, latency_spike=3.0)
+    for _ in range(AimdController.WARMUP_SAMPLES):
+        controller.on_success('cat', 1.0)
+    clock.now += 10
+
+    controller.on_success('cat', 5.0)
+
+    assert controller.limit('cat') == 2
+    assert controller.snapshot()['cat']['latency_spikes'] == 1
+
+
+def test_categories_keep_separate_limits(clock):
+    controller = AimdController(initial=8)
+
+    controller.on_overload('studio')
+    controller.on_success('standard', 0.2)
+
+    assert controller.limit('studio') == 4
+    assert controller.limit('standard') == 8
+    assert controller.limit('gemini') == 8
+
+
+class RecordingController(AimdController):
+    def __init__(self):
+        super().__init__(initial=4)
+        self.events = []
+
+    def on_success(self, key, latency):
+        self.events.append(('success', key))
+        super().on_success(key, latency)
+
+    def on_overload(self, key):
+        self.events.append(('overload', key))
+        super().on_overload(key)
+
+
+@pytest.mark.parametrize('status', OVERLOAD_STATUSES)
+def test_scheduler_reports_upstream_overload_to_the_controller(status):
+    controller = RecordingController()
+    scheduler = ChunkScheduler(max_workers=2, retry_delay=0.001, controller=controller)
+    failures = []
+
+    def fn(text):
+        if not failures:
+            failures.append(text)
+            raise TTSApiError('busy', status)
+        return text
+
+    assert scheduler.run('job', 'cat', 0.0, 1.0, fn, ['one']) == ['one']
+    assert controller.events == [('overload', 'cat'), ('success', 'cat')]
+
+
+def test_scheduler_does_not_treat_other_errors_as_overload():
+    controller = RecordingController()
+    scheduler = ChunkScheduler(max_workers=2, retry_delay=0.001, controller=controller)
+    failures = []
+
+    def fn(text):
+        if not failures:
+            failures.append(text)
+            raise TTSApiError('bad request', 400)
+        return text
+
+    scheduler.run('job', 'cat', 0.0, 1.0, fn, ['one'])
+    assert controller.events == [('success', 'cat')]
@@ -0,0 +1,129 @@
+from unittest import mock
+
+import pytest
+
+from services import credential_pool, tts_client
+from services.credential_pool import CredentialPool
+from services.tts_client import TTSApiError, TTSClient
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(credential_pool.time, 'monotonic', clock)
+    return clock
+
+
+def test_from_env_splits_and_deduplicates_keys(monkeypatch):
+    monkeypatch.setenv('TEST_TTS_KEYS', ' alpha-0001, beta-0002 ,alpha-0001,,')
+    assert CredentialPool.from_env('TEST_TTS_KEYS').keys == ['alpha-0001', 'beta-0002']
+    monkeypatch.delenv('TEST_TTS_KEYS')
+    assert len(CredentialPool.from_env('TEST_TTS_KEYS')) == 0
+
+
+def test_acquire_rotates_to_the_key_with_most_headroom(clock):
+    pool = CredentialPool(['key-a', 'key-b', 'key-c'], rpm_limits={'studio': 10})
+
+    picked = [pool.acquire('studio') for _ in range(6)]
+
+    assert sorted(picked) == ['key-a', 'key-a', 'key-b', 'key-b', 'key-c', 'key-c']
+
+
+def test_windows_are_per_category_and_expire_after_a_minute(clock):
+    pool = CredentialPool(['key-a', 'key-b'], rpm_limits={'studio': 10, 'standard': 100})
+    for _ in range(3):
+        clock.now += 1
+        pool._window('key-a', 'studio', clock.now).append(clock.now)
+
+    # key-a's studio requests do not count against standard
+    assert pool.acquire('studio') == 'key-b'
+    assert pool.snapshot()['…ey-a']['requests_last_minute'] == {'studio': 3}
+
+    clock.now += CredentialPool.WINDOW_SECONDS
+    assert len(pool._window('key-a', 'studio', clock.now)) == 0
+
+
+def test_quota_error_quarantines_the_key_for_that_category_only(clock):
+    pool = CredentialPool(['key-a', 'key-b'])
+
+    pool.report('key-a', 'studio', 429)
+
+    assert pool.available('studio') == 1
+    assert pool.available('standard') == 2
+    assert {pool.acquire('studio') for _ in range(4)} == {'key-b'}
+    clock.now += CredentialPool.QUOTA_QUARANTINE_SECONDS + 1
+    assert pool.available('studio') == 2
+
+
+@pytest.mark.parametrize('status, message', [(401, ''), (403, ''), (400, 'API key not valid.')])
+def test_auth_error_quarantines_the_key_for_every_category(clock, status, message):
+    pool = CredentialPool(['key-a', 'key-b'])
+
+    pool.report('key-a', 'studio', status, message)
+
+    assert pool.available('studio') == pool.available('gemini') == 1
+    clock.now += CredentialPool.QUOTA_QUARANTINE_SECONDS + 1
+    assert pool.available('gemini') == 1
+    clock.now += CredentialPool.AUTH_QUARANTINE_SECONDS
+    assert pool.available('gemini') == 2
+
+
+@pytest.mark.parametrize('status', [400, 500, 503])
+def test_other_errors_do_not_quarantine(clock, status):
+    pool = CredentialPool(['key-a', 'key-b'])
+    pool.report('key-a', 'studio', status, 'Input is too long.')
+    assert pool.available('studio') == 2
+
+
+def test_single_key_is_still_used_while_quarantined(clock):
+    pool = CredentialPool(['only-key'])
+
+    pool.report('only-key', 'studio', 429)
+
+    assert pool.available('studio') == 0
+    assert pool.acquire('studio') == 'only-key'
+
+
+def test_all_keys_quarantined_falls_back_to_the_first_to_recover(clock):
+    pool = CredentialPool(['key-a', 'key-b'])
+    pool.report('key-a', 'studio', 403)     # out for 10 minutes
+    pool.report('key-b', 'studio', 429)     # out for one minute
+
+    assert pool.acquire('studio') == 'key-b'
+
+
+def test_acquire_without_keys_fails():
+    with pytest.raises(RuntimeError):
+        CredentialPool([]).acquire('studio')
+
+
+def test_quota_response_from_the_api_rotates_the_next_request(clock, monkeypatch):
+    pool = CredentialPool(['key-a', 'key-b'])
+    sent_with = []
+
+    def post(url, params, json, timeout):
+        sent_with.append(params['key'])
+        if params['key'] == 'key-a':
+            return mock.Mock(status_code=429, text='Too Many Requests',
+                             json=mock.Mock(side_effect=ValueError('not JSON')))
+        return mock.Mock(status_code=200, json=mock.Mock(return_value={'audioContent': 'UklGRg=='}))
+
+    monkeypatch.setattr(tts_client.requests, 'post', post)
+    client = TTSClient(voice_name='en-US-Studio-Q', credentials=pool, category='studio')
+
+    with pytest.raises(TTSApiError):
+        client.synthesize_chunk('<speak>Hi.</speak>')
+    for _ in range(3):
+        assert client.synthesize_chunk('<speak>Hi.</speak>') == b'RIFF'
+
+    assert sent_with == ['key-a', 'key-b', 'key-b', 'key-b']
+    assert pool.available('studio') == 1
+    assert pool.available('standard') == 2
@@ -0,0 +1,82 @@
+from unittest import mock
+
+import pytest
+from bson import ObjectId
+
+import app as storyteller
+
+
+@pytest.fixture
+def user(monkeypatch):
+    db = mock.MagicMock()
+    user_id = ObjectId()
+    doc = {'_id': user_id, 'email': 'gm@example.com', 'tier': 'bard', 'collection_versions': {}}
+    db.users.find_one.return_value = doc
+
+    def update_one(query, update):
+        # Apply the $inc so the next request's user doc sees the new version
+        for field, step in update.get('$inc', {}).items():
+            _, name = field.split('.')
+            doc['collection_versions'][name] = doc['collection_versions'].get(name, 0) + step
+    db.users.update_one.side_effect = update_one
+    monkeypatch.setattr(storyteller, 'get_db', lambda: db)
+    client = storyteller.app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = str(user_id)
+    return db, client
+
+
+@pytest.mark.parametrize('url', ['/api/voices', '/api/presets', '/api/texts', '/api/library'])
+def test_list_endpoints_answer_a_matching_etag_with_304(user, url):
+    _db, client = user
+
+    first = client.get(url)
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+    assert etag
+    assert first.headers['Cache-Control'] == 'private, no-cache'
+
+    again = client.get(url, headers={'If-None-Match': etag})
+    assert again.status_code == 304
+    assert again.get_data() == b''
+
+    stale = client.get(url, headers={'If-None-Match': '"something-else"'})
+    assert stale.status_code == 200
+
+
+def test_304_skips_the_collection_query(user):
+    db, client = user
+    etag = client.get('/api/texts').headers['ETag']
+    db.source_texts.find.reset_mock()
+
+    assert client.get('/api/texts', headers={'If-None-Match': etag}).status_code == 304
+    db.source_texts.find.assert_not_called()
+
+
+@pytest.mark.parametrize('name', ['presets', 'texts', 'library'])
+def test_a_write_changes_the_collection_etag(user, name):
+    _db, client = user
+    url = f'/api/{name}'
+    etag = client.get(url).headers['ETag']
+
+    with storyteller.app.app_context():
+        storyteller.bump_collection_version(ObjectId(), name)
+
+    changed = client.get(url, headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != etag
+
+
+def test_creating_a_preset_invalidates_the_presets_etag(user):
+    db, client = user
+    db.voice_presets.find_one.return_value = None
+    db.voice_presets.insert_one.return_value.inserted_id = ObjectId()
+    voice = sorted(storyteller.get_allowed_voice_names_for_tier('bard'))[0]
+    etag = client.get('/api/presets').headers['ETag']
+    texts_etag = client.get('/api/texts').headers['ETag']
+
+    created = client.post('/api/presets', json={'name': 'Narrator', 'voice_name': voice})
+    assert created.status_code == 201
+
+    assert client.get('/api/presets', headers={'If-None-Match': etag}).status_code == 200
+    assert client.get('/api/texts', headers={'If-None-Match': texts_etag}).status_code == 304
@@ -0,0 +1,203 @@
+import hashlib
+import os
+import random
+import time
+import uuid
+from unittest import mock
+
+import pytest
+from bson import ObjectId
+
+import app as storyteller
+from services.text_chunker import TextChunker, chunk_hash
+from services.wav_concatenator import wav_header
+
+MAX_BYTES = 700   # small chunks, so a short text spans many of them
+VOICE_PARAMS = {'voice_name': storyteller.DEFAULT_VOICE, 'speaking_rate': 1.0, 'pitch': 0.0}
+
+
+class FakeTTS:
+    """Stand-in TTS client whose audio depends only on the text it is sent."""
+
+    calls = []
+
+    def __init__(self, **kwargs):
+        pass
+
+    def synthesize_chunk(self, text):
+        self.calls.append(text)
+        digest = hashlib.sha256(text.encode()).digest()
+        pcm = (digest * 64)[:2 * (400 + len(text) % 300)]
+        return wav_header(len(pcm)) + pcm
+
+
+@pytest.fixture
+def db(monkeypatch, tmp_path):
+    db = mock.MagicMock()
+    db.users.update_one.return_value.matched_count = 1
+    monkeypatch.setattr(storyteller, 'get_db', lambda: db)
+    monkeypatch.setattr(storyteller, 'TTSClient', FakeTTS)
+    monkeypatch.setattr(storyteller, 'get_chunk_delay', lambda *args, **kwargs: 0)
+    monkeypatch.setattr(storyteller.Config, 'TTS_MAX_BYTES_PER_REQUEST', MAX_BYTES)
+    monkeypatch.setattr(storyteller.audio_storage, 'root', str(tmp_path))
+    FakeTTS.calls = []
+    return db
+
+
+def make_paragraphs(count=60, seed=7):
+    rng = random.Random(seed)
+    words = 'the a dragon sword tavern wizard went into dark forest and found ancient ruins'.split()
+    return [' '.join(rng.choice(words) for _ in range(rng.randint(10, 60))) + '.' for _ in range(count)]
+
+
+def render(db, chunks, previous=None, user_id=None):
+    """Run one job to completion; return (job, audio document, audio bytes)."""
+    user_id = user_id or ObjectId()
+    voice_params = dict(VOICE_PARAMS)
+    if previous is not None:
+        hashes = storyteller.reusable_chunk_hashes(previous)
+        voice_params['previous_audio_id'] = str(previous['_id'])
+        voice_params['reuse_chunks'] = [i for i, c in enumerate(chunks) if chunk_hash(c) in hashes]
+        db.audio_files.find_one.return_value = previous
+
+    job_id = str(uuid.uuid4())
+    db.audio_files.insert_one.reset_mock()
+    db.audio_files.insert_one.return_value.inserted_id = ObjectId()
+    storyteller.job_store.create(job_id, {
+        'status': 'queued', 'user_id': str(user_id), 'tier': 'bard',
+        'total_chunks': len(chunks), 'completed_chunks': 0, 'created_at': time.time(),
+    })
+    storyteller.process_tts_job(job_id, chunks, voice_params)
+
+    job = storyteller.job_store.get(job_id)
+    if job['status'] != 'complete':
+        return job, None, None
+    doc = dict(db.audio_files.insert_one.call_args[0][0], _id=ObjectId())
+    with open(storyteller.audio_storage.local_path(job['output_path']), 'rb') as f:
+        return job, doc, f.read()
+
+
+def usage_charges(db):
+    """Characters added to monthly usage through db.users.update_one."""
+    return [
+        value
+        for (_query, update), _ in db.users.update_one.call_args_list
+        for field, value in update.get('$inc', {}).items()
+        if field.startswith('usage.')
+    ]
+
+
+def edited(paragraphs):
+    changed = list(paragraphs)
+    changed.insert(30, 'An inserted paragraph about a goblin who stole the lantern.')
+    return TextChunker(MAX_BYTES).chunk_stable('\n\n'.join(changed))
+
+
+def test_rerender_splices_unchanged_chunks_byte_for_byte(db):
+    paragraphs = make_paragraphs()
+    _, first, _ = render(db, TextChunker(MAX_BYTES).chunk_stable('\n\n'.join(paragraphs)))
+    chunks = edited(paragraphs)
+
+    FakeTTS.calls = []
+    _, spliced, spliced_audio = render(db, chunks, previous=first, user_id=first['user_id'])
+    reused = len(chunks) - len(FakeTTS.calls)
+    assert reused > len(chunks) // 2
+
+    _, full, full_audio = render(db, chunks)
+    assert spliced_audio == full_audio
+    assert spliced['chunk_index'] == full['chunk_index']
+    assert spliced['duration_seconds'] == full['duration_seconds']
+    assert usage_charges(db) == []
+
+
+def test_unreadable_previous_audio_is_charged_before_rendering(db):
+    paragraphs = make_paragraphs()
+    _, first, _ = render(db, TextChunker(MAX_BYTES).chunk_stable('\n\n'.join(paragraphs)))
+    os.remove(storyteller.audio_storage.local_path(
+        storyteller.storage_key(first['user_id'], first['filename'])
+    ))
+    chunks = edited(paragraphs)
+    hashes = storyteller.reusable_chunk_hashes(first)
+
+    FakeTTS.calls = []
+    job, _, _ = render(db, chunks, previous=first, user_id=first['user_id'])
+    assert job['status'] == 'complete'
+    assert len(FakeTTS.calls) == len(chunks)
+
+    assert usage_charges(db) == [sum(len(c) for c in chunks if chunk_hash(c) in hashes)]
+
+
+def test_unreadable_previous_audio_over_the_limit_fails_the_job(db):
+    db.audio_files.find_one.return_value = None   # previous audio deleted
+    db.users.update_one.return_value.matched_count = 0
+    voice_params = dict(VOICE_PARAMS, previous_audio_id=str(ObjectId()), reuse_chunks=[0, 1])
+    job_id = str(uuid.uuid4())
+    storyteller.job_store.create(job_id, {
+        'status': 'queued', 'user_id': str(ObjectId()), 'tier': 'bard',
+        'total_chunks': 3, 'completed_chunks': 2, 'created_at': time.time(),
+    })
+
+    storyteller.process_tts_job(job_id, ['One.', 'Two.', 'Three.'], voice_params)
+
+    job = storyteller.job_store.get(job_id)
+    assert job['status'] == 'error'
+    assert 'monthly character limit' in job['error']
+    assert FakeTTS.calls == []
+    db.audio_files.insert_one.assert_not_called()
+
+
+def test_synthesize_charges_only_the_chunks_the_job_will_not_reuse(db, monkeypatch):
+    paragraphs = make_paragraphs()
+    _, first, _ = render(db, TextChunker(MAX_BYTES).chunk_stable('\n\n'.join(paragraphs)))
+    user = {'_id': first['user_id'], 'email': 'gm@example.com', 'tier': 'bard', 'usage': {}}
+    db.users.find_one.return_value = user
+    db.source_texts.find_one.return_value = {'_id': ObjectId(), 'user_id': user['_id']}
+    db.audio_files.find_one.return_value = first
+    dispatched = []
+    monkeypatch.setattr(storyteller, 'dispatch_job', lambda *args: dispatched.append(args) or 0)
+
+    changed = list(paragraphs)
+    changed.insert(30, 'An inserted paragraph about a goblin who stole the lantern.')
+    client = storyteller.app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = str(user['_id'])
+    response = client.post('/api/synthesize', data={
+        'text': '\n\n'.join(changed),
+        'source_text_id': str(ObjectId()),
+        'voice_name': VOICE_PARAMS['voice_name'],
+        'speaking_rate': '1.0', 'pitch': '0.0', 'audio_format': 'wav',
+    })
+
+    assert response.status_code == 200, response.get_json()
+    _job_id, _record, chunks, voice_params, _estimate = dispatched[0]
+    reuse = voice_params['reuse_chunks']
+    assert response.get_json()['reused_chunks'] == len(reuse) > 0
+    assert voice_params['previous_audio_id'] == str(first['_id'])
+
+    assert usage_charges(db) == [sum(len(c) for i, c in enumerate(chunks) if i not in reuse)]
+
+
+@pytest.mark.parametrize('saved', [True, False])
+def test_only_saved_texts_get_content_defined_chunks(db, monkeypatch, saved):
+    user = {'_id': ObjectId(), 'email': 'gm@example.com', 'tier': 'bard', 'usage': {}}
+    db.users.find_one.return_value = user
+    db.source_texts.find_one.return_value = {'_id': ObjectId(), 'user_id': user['_id']}
+    db.audio_files.find_one.return_value = None
+    dispatched = []
+    monkeypatch.setattr(storyteller, 'dispatch_job', lambda *args: dispatched.append(args) or 1)
+    text = '\n\n'.join(make_paragraphs())
+
+    client = storyteller.app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = str(user['_id'])
+    form = {'text': text, 'voice_name': VOICE_PARAMS['voice_name'],
+            'speaking_rate': '1.0', 'pitch': '0.0', 'audio_format': 'wav'}
+    if saved:
+        form['source_text_id'] = str(ObjectId())
+    assert client.post('/api/synthesize', data=form).status_code == 200
+
+    clean = storyteller.MarkdownProcessor().process(text)
+    chunker = TextChunker(MAX_BYTES)
+    expected = chunker.chunk_stable(clean) if saved else chunker.chunk(clean)
+    assert dispatched[0][2] == expected
+    assert chunker.chunk_stable(clean) != chunker.chunk(clean)
@@ -0,0 +1,64 @@
+from unittest import mock
+
+import pytest
+from bson import ObjectId
+
+import app as storyteller
+from services.job_executor import BoundedJobExecutor
+
+VOICE = storyteller.DEFAULT_VOICE
+
+
+@pytest.fixture
+def client(monkeypatch):
+    db = mock.MagicMock()
+    user_id = ObjectId()
+    db.users.find_one.return_value = {'_id': user_id, 'email': 'gm@example.com', 'tier': 'bard', 'usage': {}}
+    db.source_texts.insert_one.return_value.inserted_id = ObjectId()
+    monkeypatch.setattr(storyteller, 'get_db', lambda: db)
+    monkeypatch.setattr(storyteller, 'job_store', storyteller.MemoryJobStore())
+    client = storyteller.app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = str(user_id)
+    client.db = db
+    return client
+
+
+def synthesize(client, text='The party enters the tavern.'):
+    return client.post('/api/synthesize', data={
+        'text': text, 'voice_name': VOICE, 'speaking_rate': '1.0', 'pitch': '0.0',
+        'audio_format': 'wav', 'save_text': '1', 'text_title': 'Session notes',
+    })
+
+
+def test_full_executor_refuses_before_saving_anything(client, monkeypatch):
+    monkeypatch.setattr(storyteller, 'job_executor', BoundedJobExecutor(max_workers=1, max_queued=0))
+
+    response = synthesize(client)
+
+    assert response.status_code == 503
+    assert int(response.headers['Retry-After']) > 0
+    client.db.source_texts.insert_one.assert_not_called()
+    client.db.users.update_one.assert_not_called()
+    assert storyteller.job_store._jobs == {}
+
+
+def test_executor_filling_up_after_the_check_leaves_no_job_behind(client, monkeypatch):
+    executor = BoundedJobExecutor(max_workers=1, max_queued=0)
+    monkeypatch.setattr(executor, 'check_capacity', lambda: None)
+    monkeypatch.setattr(storyteller, 'job_executor', executor)
+
+    assert synthesize(client).status_code == 503
+    assert storyteller.job_store._jobs == {}
+
+
+def test_queue_position_means_the_same_in_synthesize_and_status(client, monkeypatch):
+    # No worker threads, so every job stays queued
+    executor = BoundedJobExecutor(max_workers=0, max_queued=10)
+    monkeypatch.setattr(storyteller, 'job_executor', executor)
+
+    for expected in range(1, storyteller.MAX_CONCURRENT_JOBS_PER_IP + 1):
+        accepted = synthesize(client).get_json()
+        assert accepted['queue_position'] == expected
+        status = client.get(f"/api/status/{accepted['job_id']}").get_json()
+        assert status['queue_position'] == expected
@@ -0,0 +1,42 @@
+import time
+
+from services.job_store import SqliteJobQueue
+
+
+def make_queue(tmp_path, *job_ids):
+    queue = SqliteJobQueue(str(tmp_path / 'jobs.sqlite3'))
+    for i, job_id in enumerate(job_ids):
+        queue.create(job_id, {'status': 'queued', 'created_at': time.time() + i},
+                     payload={'text_chunks': ['Hello.'], 'voice_params': {}})
+    return queue
+
+
+def test_claim_takes_jobs_oldest_first(tmp_path):
+    queue = make_queue(tmp_path, 'a', 'b')
+    assert queue.claim(1) == 'a'
+    assert queue.get('a')['status'] == 'processing'
+    assert queue.position('b') == 1
+    assert queue.claim(1) == 'b'
+    assert queue.claim(1) is None
+
+
+def test_requeued_crash_suspect_is_only_claimed_on_request(tmp_path):
+    queue = make_queue(tmp_path, 'a', 'b')
+    assert queue.claim(1) == 'a'
+    queue.requeue('a', crashed=True)
+
+    job = queue.get('a')
+    assert job['status'] == 'queued' and job['crashed'] is True
+    assert queue.get_payload('a') is not None
+    assert queue.claim(1, include_crashed=False) == 'b'
+    assert queue.claim(1, include_crashed=False) is None
+    assert queue.claim(1) == 'a'
+
+
+def test_requeue_leaves_finished_jobs_alone(tmp_path):
+    queue = make_queue(tmp_path, 'a')
+    queue.claim(1)
+    queue.update('a', status='complete')
+    queue.requeue('a', crashed=True)
+    assert queue.get('a')['status'] == 'complete'
+    assert 'crashed' not in queue.get('a')
@@ -0,0 +1,135 @@
+import gzip
+import zlib
+from unittest import mock
+
+import pytest
+from bson import ObjectId
+from werkzeug.http import parse_accept_header
+from werkzeug.wrappers import Response
+
+import app as storyteller
+from services import response_compressor
+from services.response_compressor import ResponseCompressor
+
+BODY = b'{"voices": [' + b'{"name": "en-US-Studio-Q"}, ' * 200 + b'{}]}'
+
+
+def accept(header):
+    return parse_accept_header(header)
+
+
+def json_response(body=BODY):
+    return Response(body, mimetype='application/json')
+
+
+def test_small_bodies_pass_through_untouched():
+    response = ResponseCompressor(min_size=1024).compress(json_response(b'{"ok": true}'), accept('gzip'))
+
+    assert response.get_data() == b'{"ok": true}'
+    assert 'Content-Encoding' not in response.headers
+    assert 'Accept-Encoding' in response.vary
+
+
+@pytest.mark.parametrize('mimetype', ['audio/wav', 'audio/ogg', 'application/zip', 'application/octet-stream'])
+def test_binary_responses_are_not_compressed(mimetype):
+    response = Response(BODY, mimetype=mimetype)
+
+    ResponseCompressor().compress(response, accept('gzip'))
+
+    assert response.get_data() == BODY
+    assert 'Content-Encoding' not in response.headers
+    assert 'Accept-Encoding' not in response.vary
+
+
+def test_streamed_and_passthrough_responses_are_not_compressed():
+    pieces = iter([BODY[:100], BODY[100:]])
+    streamed = Response(pieces, mimetype='application/json')
+    ResponseCompressor().compress(streamed, accept('gzip'))
+    assert 'Content-Encoding' not in streamed.headers
+    assert b''.join(streamed.response) == BODY
+
+    passthrough = json_response()
+    passthrough.direct_passthrough = True
+    ResponseCompressor().compress(passthrough, accept('gzip'))
+    assert 'Content-Encoding' not in passthrough.headers
+
+
+def test_error_and_already_encoded_responses_are_left_alone():
+    not_found = Response(BODY, status=404, mimetype='application/json')
+    ResponseCompressor().compress(not_found, accept('gzip'))
+    assert 'Content-Encoding' not in not_found.headers
+
+    encoded = json_response(gzip.compress(BODY))
+    encoded.headers['Content-Encoding'] = 'gzip'
+    ResponseCompressor().compress(encoded, accept('deflate'))
+    assert gzip.decompress(encoded.get_data()) == BODY
+
+
+@pytest.mark.parametrize('header, expected', [
+    ('gzip, deflate, br', 'br'),
+    ('deflate, gzip', 'gzip'),
+    ('br;q=0, gzip', 'gzip'),
+    ('deflate', 'deflate'),
+    ('identity', None),
+    ('', None),
+])
+def test_negotiation_prefers_br_then_gzip_then_deflate(monkeypatch, header, expected):
+    monkeypatch.setattr(response_compressor, 'brotli', mock.Mock())
+
+    assert ResponseCompressor().choose_encoding(accept(header)) == expected
+
+
+def test_without_brotli_installed_br_is_never_chosen(monkeypatch):
+    monkeypatch.setattr(response_compressor, 'brotli', None)
+
+    assert ResponseCompressor().choose_encoding(accept('br, deflate')) == 'deflate'
+
+
+@pytest.mark.parametrize('header, decode', [('gzip', gzip.decompress), ('deflate', zlib.decompress)])
+def test_compressed_body_round_trips_and_varies_on_accept_encoding(monkeypatch, header, decode):
+    monkeypatch.setattr(response_compressor, 'brotli', None)
+    response = ResponseCompressor().compress(json_response(), accept(header))
+
+    assert response.headers['Content-Encoding'] == header
+    assert decode(response.get_data()) == BODY
+    assert len(response.get_data()) < len(BODY)
+    assert 'Accept-Encoding' in response.vary
+
+
+def test_strong_etag_becomes_weak_once_compressed():
+    response = json_response()
+    response.set_etag('voices-v1')
+
+    ResponseCompressor().compress(response, accept('gzip'))
+
+    assert response.get_etag() == ('voices-v1', True)
+
+
+def test_cache_key_reuses_the_compressed_bytes(monkeypatch):
+    compressor = ResponseCompressor()
+    encode = mock.Mock(wraps=compressor._encode)
+    monkeypatch.setattr(compressor, '_encode', encode)
+
+    first = compressor.compress(json_response(), accept('gzip'), cache_key='catalog').get_data()
+    second = compressor.compress(json_response(), accept('gzip'), cache_key='catalog').get_data()
+
+    assert first == second
+    assert encode.call_count == 1
+
+
+def test_compressed_catalog_still_answers_if_none_match_with_304(monkeypatch):
+    db = mock.MagicMock()
+    user_id = ObjectId()
+    db.users.find_one.return_value = {'_id': user_id, 'email': 'gm@example.com', 'tier': 'bard'}
+    monkeypatch.setattr(storyteller, 'get_db', lambda: db)
+    client = storyteller.app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = str(user_id)
+
+    first = client.get('/api/voices', headers={'Accept-Encoding': 'gzip'})
+    assert first.headers['Content-Encoding'] == 'gzip'
+    etag = first.headers['ETag']
+    assert etag.startswith('W/')
+
+    again = client.get('/api/voices', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+    assert again.status_code == 304
@@ -0,0 +1,99 @@
+import gzip
+import hashlib
+import re
+
+import pytest
+from flask import url_for
+
+import app as storyteller
+from services.static_assets import AssetManifest
+
+JS = b'console.log("storyteller");\n' * 50
+
+
+@pytest.fixture
+def manifest(tmp_path):
+    (tmp_path / 'js').mkdir()
+    (tmp_path / 'js' / 'app.js').write_bytes(JS)
+    (tmp_path / 'samples').mkdir()
+    (tmp_path / 'samples' / 'Kore.wav').write_bytes(b'RIFF')
+    return AssetManifest(str(tmp_path))
+
+
+def test_manifest_fingerprints_only_css_and_js(manifest):
+    digest = hashlib.sha256(JS).hexdigest()[:AssetManifest.HASH_LENGTH]
+
+    assert manifest.fingerprint('js/app.js') == f'js/app.{digest}.js'
+    assert manifest.fingerprint('samples/Kore.wav') == 'samples/Kore.wav'
+    asset = manifest.resolve(f'js/app.{digest}.js')
+    assert asset.filename == 'js/app.js'
+    assert manifest.resolve('js/app.js') is None
+
+
+def test_fingerprint_changes_with_the_content(manifest, tmp_path):
+    before = manifest.fingerprint('js/app.js')
+    (tmp_path / 'js' / 'app.js').write_bytes(JS + b'// changed\n')
+
+    manifest.build()
+
+    assert manifest.fingerprint('js/app.js') != before
+    assert manifest.resolve(before) is None
+
+
+def test_variant_follows_accept_encoding(manifest):
+    asset = manifest.resolve(manifest.fingerprint('js/app.js'))
+    asset.variants['br'] = b'brotli-bytes'   # as if brotli were installed
+
+    assert manifest.choose_variant(asset, {'br': 1, 'gzip': 1}) == ('br', b'brotli-bytes')
+    encoding, body = manifest.choose_variant(asset, {'br': 0, 'gzip': 1})
+    assert encoding == 'gzip' and gzip.decompress(body) == JS
+    assert manifest.choose_variant(asset, {'br': 0, 'gzip': 0}) == (None, JS)
+
+
+@pytest.fixture
+def client():
+    return storyteller.app.test_client()
+
+
+def fingerprinted_url(filename):
+    with storyteller.app.test_request_context():
+        return url_for('static', filename=filename)
+
+
+def test_url_for_emits_the_fingerprinted_name():
+    url = fingerprinted_url('js/app.js')
+
+    assert re.fullmatch(r'/static/js/app\.[0-9a-f]{12}\.js', url)
+    assert fingerprinted_url('samples/manifest.json') == '/static/samples/manifest.json'
+
+
+def test_fingerprinted_asset_is_immutable_and_precompressed(client):
+    url = fingerprinted_url('js/app.js')
+    with open(storyteller.app.static_folder + '/js/app.js', 'rb') as f:
+        source = f.read()
+
+    plain = client.get(url, headers={'Accept-Encoding': 'identity'})
+    assert plain.status_code == 200
+    assert plain.headers['Cache-Control'] == 'public, max-age=31536000, immutable'
+    assert plain.get_data() == source
+    assert 'Content-Encoding' not in plain.headers
+    assert 'Accept-Encoding' in plain.headers['Vary']
+
+    zipped = client.get(url, headers={'Accept-Encoding': 'gzip'})
+    assert zipped.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(zipped.get_data()) == source
+
+    assert client.get(url, headers={'If-None-Match': plain.headers['ETag']}).status_code == 304
+
+
+def test_stale_fingerprint_is_not_found(client):
+    assert client.get('/static/js/app.000000000000.js').status_code == 404
+
+
+def test_unfingerprinted_samples_get_a_one_day_cache(client):
+    response = client.get('/static/samples/manifest.json')
+
+    assert response.status_code == 200
+    assert response.cache_control.public
+    assert response.cache_control.max_age == storyteller.SAMPLE_MAX_AGE
+    assert 'immutable' not in response.headers['Cache-Control']
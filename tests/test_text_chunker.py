@@ -0,0 +1,37 @@
+import random
+
+from services.text_chunker import TextChunker, chunk_hash
+
+
+def make_text(paragraphs=240, seed=3):
+    rng = random.Random(seed)
+    words = 'the a dragon sword tavern wizard went into dark forest and found ancient ruins'.split()
+    return [' '.join(rng.choice(words) for _ in range(rng.randint(10, 150))) + '.' for _ in range(paragraphs)]
+
+
+def test_chunks_fit_the_request_limit_and_keep_every_word():
+    chunker = TextChunker(max_bytes=4800)
+    paragraphs = make_text()
+    chunks = chunker.chunk_stable('\n\n'.join(paragraphs))
+    assert all(len(c.encode('utf-8')) <= chunker.effective_max for c in chunks)
+    assert ' '.join(chunks).split() == ' '.join(paragraphs).split()
+
+
+def test_short_text_is_chunked_like_chunk():
+    chunker = TextChunker(max_bytes=4800)
+    text = '\n\n'.join(make_text(paragraphs=10))
+    assert chunker.chunk_stable(text) == chunker.chunk(text)
+
+
+def test_inserting_a_paragraph_only_changes_nearby_chunks():
+    chunker = TextChunker(max_bytes=4800)
+    paragraphs = make_text()
+    before = chunker.chunk_stable('\n\n'.join(paragraphs))
+    paragraphs.insert(100, 'An inserted paragraph about a goblin who stole the lantern. ' * 5)
+    after = chunker.chunk_stable('\n\n'.join(paragraphs))
+
+    unchanged = {chunk_hash(c) for c in before}
+    changed = [c for c in after if chunk_hash(c) not in unchanged]
+    assert len(before) >= 25
+    assert len(changed) <= 2 * TextChunker.ANCHOR_SPACING_CHUNKS
+
@@ -0,0 +1,51 @@
+from unittest import mock
+
+import pytest
+
+from services import gemini_tts_client, tts_client
+from services.credential_pool import CredentialPool
+from services.gemini_tts_client import GeminiTTSClient
+from services.tts_client import TTSApiError, TTSClient
+
+
+def response(status_code, json_body=None, text=''):
+    resp = mock.Mock(status_code=status_code, text=text)
+    if json_body is None:
+        resp.json.side_effect = ValueError('No JSON object could be decoded')
+    else:
+        resp.json.return_value = json_body
+    return resp
+
+
+def make_client(engine, credentials):
+    if engine == 'gemini':
+        return GeminiTTSClient(voice_name='Kore', credentials=credentials, category='gemini')
+    return TTSClient(voice_name='en-US-Standard-A', credentials=credentials, category='standard')
+
+
+@pytest.mark.parametrize('engine', ['cloud', 'gemini'])
+@pytest.mark.parametrize('status', [429, 503])
+def test_non_json_overload_reaches_the_overload_path(monkeypatch, engine, status):
+    module = gemini_tts_client if engine == 'gemini' else tts_client
+    html = '<html><body><h1>503 Service Temporarily Unavailable</h1></body></html>' * 10
+    monkeypatch.setattr(module.requests, 'post', lambda *args, **kwargs: response(status, text=html))
+    credentials = mock.Mock(wraps=CredentialPool(['key-one']))
+
+    with pytest.raises(TTSApiError) as raised:
+        make_client(engine, credentials).synthesize_chunk('Hello there.')
+
+    assert raised.value.status_code == status
+    assert raised.value.detail == html[:200]
+    credentials.report.assert_called_once_with('key-one', mock.ANY, status, html[:200])
+
+
+@pytest.mark.parametrize('engine', ['cloud', 'gemini'])
+def test_json_error_message_is_kept(monkeypatch, engine):
+    module = gemini_tts_client if engine == 'gemini' else tts_client
+    body = {'error': {'code': 400, 'message': 'Input is too long.'}}
+    monkeypatch.setattr(module.requests, 'post', lambda *args, **kwargs: response(400, body, text='{...}'))
+
+    with pytest.raises(TTSApiError) as raised:
+        make_client(engine, CredentialPool(['key-one'])).synthesize_chunk('Hello there.')
+
+    assert raised.value.detail == 'Input is too long.'
@@ -0,0 +1,42 @@
+from unittest import mock
+
+import pytest
+from bson import ObjectId
+
+import app as storyteller
+from voice_registry import TIER_CONFIG
+
+
+@pytest.fixture
+def user(monkeypatch):
+    db = mock.MagicMock()
+    user = {'_id': ObjectId(), 'email': 'gm@example.com', 'tier': 'bard', 'usage': {},
+            'collection_versions': {'library': 4}}
+    db.users.find_one.side_effect = lambda *args, **kwargs: dict(user)
+    db.audio_files.aggregate.side_effect = lambda *args: iter([{'bytes': 1234, 'files': 2}])
+    monkeypatch.setattr(storyteller, 'get_db', lambda: db)
+    client = storyteller.app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = str(user['_id'])
+    return db, user, client
+
+
+def test_usage_reuses_storage_totals_until_the_library_changes(user):
+    db, doc, client = user
+
+    first = client.get('/api/usage').get_json()
+    assert (first['storage_bytes'], first['storage_files']) == (1234, 2)
+    (_query, update), _ = db.users.update_one.call_args
+    doc.update(update['$set'])
+    assert doc['library_storage']['version'] == 4
+
+    client.get('/api/usage')
+    assert db.audio_files.aggregate.call_count == 1
+
+    doc['collection_versions']['library'] = 5
+    client.get('/api/usage')
+    assert db.audio_files.aggregate.call_count == 2
+
+
+def test_no_tier_changes_the_library_format_by_default():
+    assert all(tier.get('audio_format') is None for tier in TIER_CONFIG.values())
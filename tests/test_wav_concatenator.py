@@ -0,0 +1,65 @@
+import io
+import struct
+
+import pytest
+
+from services import wav_concatenator
+from services.wav_concatenator import WavConcatenator, read_wav_header, wav_header
+
+
+def segment(pcm, extra_chunk=b''):
+    # An optional chunk goes between 'fmt ' and 'data', as some encoders add
+    header = bytearray(wav_header(len(pcm)))
+    header[36:36] = extra_chunk
+    struct.pack_into('<I', header, 4, 36 + len(extra_chunk) + len(pcm))
+    return bytes(header) + pcm
+
+
+def test_riff_join_keeps_the_first_header_and_all_audio():
+    extra = b'LIST' + struct.pack('<I', 4) + b'INFO'
+    parts = [bytes([i]) * (200 + 2 * i) for i in range(3)]
+
+    joined = WavConcatenator().concatenate([segment(parts[0], extra), segment(parts[1]), segment(parts[2])])
+
+    info = read_wav_header(io.BytesIO(joined))
+    assert not info.rf64
+    assert info.data_size == sum(map(len, parts))
+    assert joined[info.data_offset:] == b''.join(parts)
+    assert extra in joined[:info.data_offset]
+    assert struct.unpack_from('<I', joined, 4)[0] == len(joined) - 8
+
+
+def test_join_past_the_riff_limit_writes_rf64(monkeypatch):
+    # Lower the 32-bit limit so a few hundred bytes exercise the > 4 GB path
+    monkeypatch.setattr(wav_concatenator, 'RIFF_SIZE_LIMIT', 500)
+    parts = [bytes([i]) * 300 for i in range(3)]
+
+    joined = WavConcatenator().concatenate([segment(p) for p in parts])
+
+    assert joined[:4] == b'RF64'
+    assert joined[12:16] == b'ds64'
+    info = read_wav_header(io.BytesIO(joined))
+    assert info.rf64
+    assert (info.sample_rate, info.channels, info.bits_per_sample) == (24000, 1, 16)
+    assert info.data_size == 900
+    assert joined[info.data_offset:] == b''.join(parts)
+
+    riff_size, data_size, samples, _table = wav_concatenator._DS64.unpack_from(joined, 20)
+    assert (riff_size, data_size, samples) == (len(joined) - 8, 900, 450)
+
+
+@pytest.mark.parametrize('data_size', [1000, 0x1_0000_0000])
+def test_wav_header_round_trips_through_the_reader(data_size):
+    header = wav_header(data_size, sample_rate=48000, bits_per_sample=16, channels=2)
+
+    info = read_wav_header(io.BytesIO(header))
+
+    assert info.rf64 == (data_size > 0xFFFFFFFF - 36)
+    assert info.data_offset == len(header)
+    assert info.data_size == data_size
+    assert (info.sample_rate, info.channels, info.block_align) == (48000, 2, 4)
+
+
+def test_reader_rejects_files_that_are_not_wav():
+    with pytest.raises(ValueError):
+        read_wav_header(io.BytesIO(b'OggS' + bytes(40)))
@@ -0,0 +1,172 @@
+import io
+import struct
+from unittest import mock
+
+import pytest
+from bson import ObjectId
+
+import app as storyteller
+from services import waveform_peaks
+from services.audio_storage import storage_key
+from services.wav_concatenator import wav_header
+from services.waveform_peaks import (
+    PeakBuilder, peaks_from_file, peaks_from_segments, peaks_path_for, read_peaks,
+)
+
+SAMPLE_RATE = 400   # 20 samples per peak at the default 20 peaks/second
+
+
+def pcm(samples):
+    return struct.pack(f'<{len(samples)}h', *samples)
+
+
+def ramp_buckets(count, partial=0):
+    """Samples whose n-th bucket runs from -256*n to +256*n, then `partial` extra samples."""
+    samples = []
+    for n in range(count):
+        samples += [-256 * n] + [0] * 18 + [256 * n]
+    return samples + [1024] * partial
+
+
+def expected_pairs(count):
+    return [v for n in range(count) for v in (-n, n)]
+
+
+def test_sidecar_layout_round_trips_through_read_peaks():
+    builder = PeakBuilder(SAMPLE_RATE)
+    builder.feed(pcm(ramp_buckets(5, partial=3)))
+    out = io.BytesIO()
+    builder.write(out)
+    data = out.getvalue()
+
+    assert data[:4] == b'PEAK'
+    assert struct.unpack_from('<III', data, 4) == (SAMPLE_RATE, 20, 6)
+    assert len(data) == 16 + 6 * 2
+    sample_rate, samples_per_peak, pairs = read_peaks(data)
+    assert (sample_rate, samples_per_peak) == (SAMPLE_RATE, 20)
+    assert pairs.tolist() == expected_pairs(5) + [4, 4]   # the partial bucket is flushed
+
+
+def test_pcm_can_be_fed_in_pieces_of_any_length():
+    data = pcm(ramp_buckets(8))
+    builder = PeakBuilder(SAMPLE_RATE)
+    for start in range(0, len(data), 7):   # odd sizes split samples across calls
+        builder.feed(data[start:start + 7])
+
+    assert builder.finish().tolist() == expected_pairs(8)
+
+
+def test_array_fallback_matches_numpy(monkeypatch):
+    pytest.importorskip('numpy')
+    data = pcm(ramp_buckets(8, partial=5))
+    with_numpy = PeakBuilder(SAMPLE_RATE)
+    with_numpy.feed(data)
+    monkeypatch.setattr(waveform_peaks, 'np', None)
+    fallback = PeakBuilder(SAMPLE_RATE)
+    fallback.feed(data)
+
+    assert with_numpy.finish() == fallback.finish()
+
+
+def test_file_and_segment_peaks_agree(tmp_path):
+    first, second = pcm(ramp_buckets(3)), pcm(ramp_buckets(4))
+    path = tmp_path / 'joined.wav'
+    path.write_bytes(wav_header(len(first + second), sample_rate=SAMPLE_RATE) + first + second)
+
+    from_segments = peaks_from_segments([
+        wav_header(len(first), sample_rate=SAMPLE_RATE) + first,
+        wav_header(len(second), sample_rate=SAMPLE_RATE) + second,
+    ])
+    from_file = peaks_from_file(str(path))
+
+    assert from_file.finish() == from_segments.finish()
+    assert from_file.finish().tolist() == expected_pairs(3) + expected_pairs(4)
+
+
+@pytest.mark.parametrize('data', [b'PEAK', b'NOPE' + bytes(12)])
+def test_read_peaks_rejects_other_data(data):
+    with pytest.raises(ValueError):
+        read_peaks(data)
+
+
+def test_peaks_path_replaces_the_audio_extension():
+    assert peaks_path_for('u/a1b2.wav') == 'u/a1b2.peaks'
+
+
+@pytest.fixture
+def local_storage(tmp_path, monkeypatch):
+    monkeypatch.setattr(storyteller.audio_storage, 'root', str(tmp_path))
+    return storyteller.audio_storage
+
+
+def store_wav(storage, key, samples):
+    data = pcm(samples)
+    with storage.writer(key) as f:
+        f.write(wav_header(len(data), sample_rate=SAMPLE_RATE) + data)
+
+
+def test_peaks_endpoint_serves_the_sidecar(local_storage, monkeypatch):
+    db = mock.MagicMock()
+    user_id, audio_id = ObjectId(), ObjectId()
+    filename = 'a1b2c3d4-0000-4000-8000-000000000020.wav'
+    db.users.find_one.return_value = {'_id': user_id, 'email': 'gm@example.com', 'tier': 'bard'}
+    db.audio_files.find_one.return_value = {
+        '_id': audio_id, 'user_id': user_id, 'filename': filename, 'audio_format': 'wav',
+    }
+    monkeypatch.setattr(storyteller, 'get_db', lambda: db)
+    client = storyteller.app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = str(user_id)
+    url = f'/api/library/{audio_id}/peaks'
+    store_wav(local_storage, storage_key(user_id, filename), ramp_buckets(4))
+
+    missing = client.get(url)
+    assert missing.status_code == 404
+    assert 'Waveform' in missing.get_json()['error']
+
+    builder = PeakBuilder(SAMPLE_RATE)
+    builder.feed(pcm(ramp_buckets(4)))
+    with local_storage.writer(peaks_path_for(storage_key(user_id, filename))) as f:
+        builder.write(f)
+
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.get_json() == {
+        'sample_rate': SAMPLE_RATE, 'samples_per_peak': 20, 'peaks': expected_pairs(4),
+    }
+
+
+def test_backfill_builds_missing_sidecars_only(local_storage, monkeypatch):
+    user_id = ObjectId()
+    names = [f'a1b2c3d4-0000-4000-8000-00000000003{i}.wav' for i in range(4)]
+    keys = [storage_key(user_id, name) for name in names]
+    store_wav(local_storage, keys[0], ramp_buckets(3))          # built
+    store_wav(local_storage, keys[1], ramp_buckets(3))          # already has peaks
+    with local_storage.writer(peaks_path_for(keys[1])) as f:
+        f.write(b'existing')
+    # keys[2] has no file on disk: skipped
+    with local_storage.writer(keys[3]) as f:                     # not a WAV: failed
+        f.write(b'OggS' + bytes(60))
+    db = mock.MagicMock()
+    db.audio_files.find.return_value = [
+        {'user_id': user_id, 'filename': name} for name in names
+    ] + [{'user_id': user_id, 'filename': '../escape.wav'}]
+    monkeypatch.setattr(storyteller, 'get_db', lambda: db)
+
+    result = storyteller.app.test_cli_runner().invoke(args=['backfill-peaks'])
+
+    assert result.exit_code == 0, result.output
+    assert 'Peaks built: 1, skipped: 2, failed: 1.' in result.output
+    _, _, pairs = read_peaks(local_storage.read_bytes(peaks_path_for(keys[0])))
+    assert pairs.tolist() == expected_pairs(3)
+    assert local_storage.read_bytes(peaks_path_for(keys[1])) == b'existing'
+    assert not local_storage.exists(peaks_path_for(keys[3]))
+
+
+def test_backfill_needs_local_storage(monkeypatch):
+    monkeypatch.setattr(storyteller, 'audio_storage', mock.Mock())
+
+    result = storyteller.app.test_cli_runner().invoke(args=['backfill-peaks'])
+
+    assert result.exit_code != 0
+    assert 'AUDIO_STORAGE=local' in result.output
@@ -10,6 +10,10 @@ Supports two TTS engines:
   - gemini     → Gemini TTS via generativelanguage.googleapis.com (text input, PCM output)
 """
 
+import hashlib
+import json
+from collections import namedtuple
+
 VOICE_CATEGORIES = [
     {"id": "gemini",    "label": "Gemini",         "description": "Next-gen Gemini TTS with natural expression", "engine": "gemini"},
     {"id": "chirp3hd",  "label": "Chirp 3: HD",    "description": "Latest generation, most natural",             "engine": "cloud_tts"},
@@ -147,6 +151,14 @@ DEFAULT_VOICE = "en-US-Wavenet-D"
 
 STUDIO_CHAR_MULTIPLIER = 5  # 1 Studio char costs 5× standard chars
 
+# 'schedule_weight' is the tier's share of upstream TTS capacity when jobs
+# compete for the same voice category (see services/chunk_scheduler.py).
+# 'audio_format' is the tier's default library format (None = the
+# TTS_AUDIO_FORMAT setting); users may still pick one per request.  A
+# non-WAV default changes what existing users get back and turns off
+# incremental re-rendering for them (only WAV can be spliced), so every
+# tier leaves it unset and a compressed format stays opt-in.
+
 TIER_CONFIG = {
     'free': {
         'label': 'Free',
@@ -155,6 +167,8 @@ TIER_CONFIG = {
         'allowed_voices': {'en-US-Standard-A'},  # Only Adam
         'commercial': False,
         'default_voice': 'en-US-Standard-A',
+        'schedule_weight': 1,
+        'audio_format': None,
     },
     'adventurer': {
         'label': 'The Adventurer',
@@ -162,6 +176,8 @@ TIER_CONFIG = {
         'categories': {'standard', 'wavenet'},
         'commercial': False,
         'default_voice': 'en-US-Wavenet-D',
+        'schedule_weight': 2,
+        'audio_format': None,
     },
     'scribe': {
         'label': 'The Scribe',
@@ -169,6 +185,8 @@ TIER_CONFIG = {
         'categories': {'standard', 'wavenet', 'neural2', 'specialty'},
         'commercial': False,
         'default_voice': 'en-US-Wavenet-D',
+        'schedule_weight': 3,
+        'audio_format': None,
     },
     'bard': {
         'label': 'The Bard',
@@ -176,6 +194,8 @@ TIER_CONFIG = {
         'categories': {'standard', 'wavenet', 'neural2', 'specialty', 'chirphd', 'chirp3hd', 'gemini'},
         'commercial': False,
         'default_voice': 'en-US-Wavenet-D',
+        'schedule_weight': 4,
+        'audio_format': None,
     },
     'archmage': {
         'label': 'The Archmage',
@@ -183,6 +203,8 @@ TIER_CONFIG = {
         'categories': {'standard', 'wavenet', 'neural2', 'specialty', 'chirphd', 'chirp3hd', 'studio', 'gemini'},
         'commercial': True,
         'default_voice': 'en-US-Wavenet-D',
+        'schedule_weight': 6,
+        'audio_format': None,
     },
     'deity': {
         'label': 'The Deity',
@@ -190,6 +212,8 @@ TIER_CONFIG = {
         'categories': {'standard', 'wavenet', 'neural2', 'specialty', 'chirphd', 'chirp3hd', 'studio', 'gemini'},
         'commercial': True,
         'default_voice': 'en-US-Wavenet-D',
+        'schedule_weight': 8,
+        'audio_format': None,
     },
     'owner': {
         'label': 'Owner',
@@ -197,6 +221,8 @@ TIER_CONFIG = {
         'categories': {'standard', 'wavenet', 'neural2', 'specialty', 'chirphd', 'chirp3hd', 'studio', 'gemini'},
         'commercial': True,
         'default_voice': 'en-US-Wavenet-D',
+        'schedule_weight': 8,
+        'audio_format': None,
     },
 }
 
@@ -360,14 +386,6 @@ def get_mood_by_id(mood_id):
     return _MOOD_BY_ID.get(mood_id)
 
 
-def get_moods_for_tier(tier):
-    """Return (moods_list, custom_mood_allowed) for the given tier."""
-    cfg = MOOD_TIER_CONFIG.get(tier, MOOD_TIER_CONFIG['free'])
-    allowed = cfg['allowed_moods']
-    moods = [m for m in MOODS if m['id'] in allowed]
-    return moods, cfg['custom_mood']
-
-
 def validate_mood_for_tier(tier, mood_id=None, custom_prompt=None):
     """Return the validated systemInstruction text, or None.
 
@@ -407,15 +425,16 @@ CATEGORY_RATE_LIMITS = {
 }
 
 
-def get_chunk_delay(voice_name):
+def get_chunk_delay(voice_name, quota_fraction=0.8):
     """Return the delay in seconds between TTS API calls for this voice.
 
-    Targets 80% of the quota to leave headroom for concurrent users
-    sharing the same project quota.
+    Targets 80% of the quota by default to leave headroom for concurrent
+    users sharing the same project quota.  With adaptive concurrency the
+    scheduler finds that headroom itself, so it paces at the full quota.
     """
     cat = get_voice_category(voice_name)
     rpm = CATEGORY_RATE_LIMITS.get(cat, 1000)
-    safe_rpm = rpm * 0.8
+    safe_rpm = rpm * quota_fraction
     return 60.0 / safe_rpm
 
 
@@ -474,24 +493,69 @@ def calculate_char_cost(char_count, voice_name):
     return char_count
 
 
-def get_voices_for_tier(tier):
-    """Return (voices, categories, default_voice) for the given tier."""
-    cfg = get_tier_config(tier)
-    allowed = cfg.get('allowed_voices')
-    if allowed:
-        tier_voices = [v for v in VOICES if v['api_name'] in allowed]
-        tier_cats = [c for c in VOICE_CATEGORIES if c['id'] in {v['category'] for v in tier_voices}]
-    else:
-        allowed_cats = cfg['categories']
-        tier_voices = [v for v in VOICES if v['category'] in allowed_cats]
-        tier_cats = [c for c in VOICE_CATEGORIES if c['id'] in allowed_cats]
-    return tier_voices, tier_cats, cfg['default_voice']
+def get_allowed_voice_names_for_tier(tier):
+    """Return the frozenset of allowed voice api_names for the given tier."""
+    return get_tier_catalog(tier).allowed_voice_names
 
 
-def get_allowed_voice_names_for_tier(tier):
-    """Return set of allowed voice api_names for the given tier."""
+# ── Precomputed per-tier catalogs ────────────────────────────────
+#
+# VOICES, VOICE_CATEGORIES, MOODS and the tier configs are static, so every
+# per-tier view of them is built once at import.  Tier and voice checks are
+# then O(1) lookups, and /api/voices serves pre-serialized bytes.
+
+TierCatalog = namedtuple('TierCatalog', [
+    'allowed_voice_names',   # frozenset of api_names
+    'voices',                # tuple of voice dicts, registry order
+    'categories',            # tuple of category dicts, registry order
+    'default_voice',
+    'moods',                 # tuple of mood dicts
+    'custom_mood_allowed',
+    'voices_json',           # serialized /api/voices payload (bytes)
+    'etag',
+])
+
+
+def _build_tier_catalog(tier):
     cfg = get_tier_config(tier)
     allowed = cfg.get('allowed_voices')
     if allowed:
-        return set(allowed)
-    return {v['api_name'] for v in VOICES if v['category'] in cfg['categories']}
+        voices = tuple(v for v in VOICES if v['api_name'] in allowed)
+        cat_ids = {v['category'] for v in voices}
+    else:
+        cat_ids = cfg['categories']
+        voices = tuple(v for v in VOICES if v['category'] in cat_ids)
+    categories = tuple(c for c in VOICE_CATEGORIES if c['id'] in cat_ids)
+
+    mood_cfg = MOOD_TIER_CONFIG.get(tier, MOOD_TIER_CONFIG['free'])
+    moods = tuple(m for m in MOODS if m['id'] in mood_cfg['allowed_moods'])
+
+    payload = {
+        'categories': categories,
+        'voices': voices,
+        'default': cfg['default_voice'],
+        'tier': tier,
+        'moods': moods,
+        'custom_mood_allowed': mood_cfg['custom_mood'],
+    }
+    voices_json = json.dumps(payload, sort_keys=True, separators=(',', ':')).encode('utf-8')
+    digest = hashlib.sha256(voices_json).hexdigest()[:16]
+
+    return TierCatalog(
+        allowed_voice_names=frozenset(v['api_name'] for v in voices),
+        voices=voices,
+        categories=categories,
+        default_voice=cfg['default_voice'],
+        moods=moods,
+        custom_mood_allowed=mood_cfg['custom_mood'],
+        voices_json=voices_json,
+        etag=f'voices-{tier}-{digest}',
+    )
+
+
+_TIER_CATALOGS = {tier: _build_tier_catalog(tier) for tier in TIER_CONFIG}
+
+
+def get_tier_catalog(tier):
+    """Return the precomputed TierCatalog, defaulting to free."""
+    return _TIER_CATALOGS.get(tier) or _TIER_CATALOGS['free']